@@ -1,16 +1,31 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, stream_with_context
 from flask_cors import CORS
 import ollama
 import sys
 import json
+import math
 import os
 from pathlib import Path
 import time
+import uuid
 import requests
 
+import config
+from metrics import metrics
+from llm.breaker import CircuitOpenError
+from llm.pool import BackendPool, PoolEmbeddings
+from llm.images import ImageError, ImagePreprocessor, PIL_AVAILABLE
+from llm.router import ModelRouter
+from llm.streaming import ChatStream, client_disconnected
+from llm.warmup import ModelWarmer
+from llm.prompt import PromptBuilder, RECALL_TEMPLATE, summary_request
+from llm.cache_warmer import CacheWarmer
+from rag.cache import AnswerCache
+from memory.sessions import SessionStore
+
 # Import des modules RAG et memory (avec gestion d'erreur)
 try:
-    from rag.retriever import RagRetriever
+    from rag.retriever import RagRetriever, MIN_RELEVANCE
     from rag.vector_db import VectorDB
     from rag.loader import DocumentLoader
     from memory.manager import MemoryManager
@@ -32,6 +47,77 @@ memory_manager = None
 document_loader = None
 rag_initialized = False
 
+# Contexte RAG injecté dans le prompt: au plus RAG_MAX_CHUNKS chunks,
+# dans la limite de RAG_CONTEXT_TOKENS tokens estimés
+RAG_MAX_CHUNKS = 3
+RAG_CONTEXT_TOKENS = 900
+
+# Assemblage du prompt dans num_ctx, en réservant num_predict pour la réponse
+prompt_builder = PromptBuilder(num_ctx=config.NUM_CTX, num_predict=config.NUM_PREDICT)
+
+# Historique par session (tours précédents rejoués en tête de prompt), en
+# mémoire; MemoryManager le reconstruit depuis le journal au démarrage
+SESSION_HISTORY_TURNS = 6
+session_store = SessionStore(max_sessions=1000, max_turns=SESSION_HISTORY_TURNS, idle_ttl=3600)
+
+# Réponses aux premières questions d'une conversation, préchauffées au
+# démarrage à partir des questions fréquentes du journal
+answer_cache = AnswerCache(max_entries=config.ANSWER_CACHE_SIZE, ttl=config.ANSWER_CACHE_TTL)
+cache_warmer = CacheWarmer(
+    budget_seconds=config.CACHE_WARMUP_BUDGET,
+    max_questions=config.CACHE_WARMUP_QUESTIONS
+)
+
+# Pools de serveurs Ollama (génération, embeddings): chaque serveur a son
+# disjoncteur, les requêtes vont au moins chargé des serveurs sains; quand
+# aucun n'est sain, elles échouent tout de suite au lieu d'attendre leurs
+# timeouts
+chat_pool = BackendPool(
+    "chat",
+    config.OLLAMA_CHAT_HOSTS,
+    failure_threshold=config.BREAKER_FAILURES,
+    reset_timeout=config.BREAKER_RESET_SECONDS,
+    inventory_ttl=config.MODEL_INVENTORY_TTL
+)
+embed_pool = BackendPool(
+    "embedding",
+    config.OLLAMA_EMBED_HOSTS,
+    failure_threshold=config.BREAKER_FAILURES,
+    reset_timeout=config.BREAKER_RESET_SECONDS,
+    inventory_ttl=config.MODEL_INVENTORY_TTL
+)
+
+# Routage des modèles: texte rapide pour le RAG, llava pour les images
+model_router = ModelRouter(
+    chat_pool,
+    chat_model=config.CHAT_MODEL,
+    vision_model=config.VISION_MODEL
+)
+
+# Préchargement des modèles sur chaque serveur et maintien en mémoire (keep_alive)
+model_warmer = ModelWarmer(
+    {'chat': chat_pool, 'embedding': embed_pool},
+    keep_alive=config.OLLAMA_KEEP_ALIVE,
+    refresh_interval=config.WARMUP_REFRESH_INTERVAL
+)
+
+# Images réduites à la résolution utile de llava et réencodées sans
+# métadonnées avant l'envoi à Ollama
+image_preprocessor = ImagePreprocessor(
+    max_side=config.IMAGE_MAX_SIDE,
+    max_bytes=config.IMAGE_MAX_BYTES,
+    quality=config.IMAGE_JPEG_QUALITY
+)
+if not PIL_AVAILABLE:
+    print("⚠️  Pillow non installé: images transmises sans réduction (pip install Pillow)")
+
+# Corps de /api/chat refusé (413) avant lecture du JSON au-delà d'une
+# image maximale en base64, plus une marge pour le reste du message
+MAX_CHAT_BODY_BYTES = config.IMAGE_MAX_BYTES * 4 // 3 + 1024 * 1024
+
+# Taille maximale d'un lot pour /api/search/batch
+MAX_BATCH_QUERIES = 500
+
 def test_ollama_connection():
     """Test de connexion Ollama amélioré avec retry et API REST"""
     max_retries = 3
@@ -41,15 +127,9 @@ def test_ollama_connection():
         try:
             print(f"🔍 Test de connexion à Ollama (tentative {attempt + 1}/{max_retries})...")
             
-            # Test avec API REST directement (plus fiable)
-            response = requests.get("http://localhost:11434/api/tags", timeout=10)
-            
-            if response.status_code != 200:
-                raise Exception(f"Ollama API HTTP {response.status_code}")
-            
-            data = response.json()
-            models = data.get('models', [])
-            model_names = [model.get('name', '') for model in models]
+            # Test avec API REST directement (plus fiable): inventaire de
+            # tous les serveurs sains du pool de génération
+            model_names = chat_pool.models(force=True)
             
             print(f"✅ Modèles disponibles: {model_names}")
             
@@ -64,6 +144,10 @@ def test_ollama_connection():
             print(f"✅ Modèles llava disponibles: {llava_models}")
             return True, llava_models
             
+        except CircuitOpenError as e:
+            # Panne déjà détectée: inutile de réessayer
+            print(f"❌ {e}")
+            return False, []
         except requests.exceptions.ConnectionError:
             print(f"❌ Tentative {attempt + 1} échouée: Ollama service non accessible")
         except requests.exceptions.Timeout:
@@ -82,37 +166,28 @@ def test_ollama_connection():
 def get_best_llava_model():
     """Trouve le meilleur modèle llava disponible"""
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if response.status_code != 200:
-            return None
-            
-        data = response.json()
-        model_names = [model.get('name', '') for model in data.get('models', [])]
-        
-        # Priorités des modèles llava (du meilleur au moins bon)
-        preferred_models = [
-            'llava:latest',
-            'llava:13b',
-            'llava:7b',
-            'llava:34b',
-            'llava'
-        ]
-        
-        for preferred in preferred_models:
-            for available in model_names:
-                if preferred.lower() == available.lower():
-                    return available
-        
-        # Fallback: n'importe quel modèle contenant "llava"
-        for available in model_names:
-            if 'llava' in available.lower():
-                return available
-                
-        return None
+        return model_router.best_llava_model()
     except Exception as e:
         print(f"Erreur get_best_llava_model: {e}")
         return None
 
+def start_model_warmup():
+    """Précharge les modèles chat, vision et embedding en tâche de fond"""
+    try:
+        text_route = model_router.route(has_image=False)
+        models = {
+            text_route['model']: 'chat',
+            model_router.best_llava_model(): 'chat',
+            config.EMBEDDING_MODEL: 'embedding'
+        }
+    except Exception as e:
+        print(f"⚠️ Préchargement impossible (inventaire des modèles): {e}")
+        return False
+
+    model_warmer.start(models)
+    print(f"🔥 Préchargement lancé: {', '.join(m for m in models if m)}")
+    return True
+
 def initialize_rag_system():
     """Initialise le système RAG si possible"""
     global rag_retriever, memory_manager, document_loader, rag_initialized
@@ -145,7 +220,12 @@ def initialize_rag_system():
         
         # Initialiser les composants (même sans documents)
         try:
-            vector_db = VectorDB()
+            vector_db = VectorDB(embeddings=PoolEmbeddings(
+                embed_pool,
+                config.EMBEDDING_MODEL,
+                hedge_ms=config.EMBED_HEDGE_MS,
+                keep_alive=config.OLLAMA_KEEP_ALIVE
+            ))
             # Charger les documents seulement s'ils existent
             if docs_info['supported_files'] > 0:
                 vector_db.initialize()
@@ -153,11 +233,29 @@ def initialize_rag_system():
             else:
                 print("✅ Base vectorielle initialisée (vide)")
             
-            rag_retriever = RagRetriever()
-            memory_manager = MemoryManager()
+            rag_retriever = RagRetriever(vector_db)
+            if memory_manager:
+                memory_manager.close()
+            memory_manager = MemoryManager(
+                sessions=session_store,
+                batch_size=config.LOG_BATCH_SIZE,
+                flush_interval=config.LOG_FLUSH_INTERVAL,
+                fsync=config.LOG_FSYNC,
+                backend=config.MEMORY_BACKEND,
+                rotate_bytes=config.LOG_ROTATE_BYTES,
+                rotate_age=config.LOG_ROTATE_SECONDS or None,
+                embed_documents=vector_db.embeddings.embed_documents if config.RECALL_MAX_RESULTS > 0 else None,
+                embedding_model=getattr(vector_db.embeddings, 'model', None),
+                summarize=summarize_session if config.SUMMARY_BATCH_TURNS > 0 else None,
+                summary_batch_turns=config.SUMMARY_BATCH_TURNS
+            )
+            restored = memory_manager.restore_sessions()
+            if restored:
+                print(f"💬 {restored} tours de conversation restaurés depuis le journal")
             
             rag_initialized = True
             print("✅ Système RAG initialisé!")
+            start_cache_warmup()
             return True
             
         except Exception as e:
@@ -169,6 +267,123 @@ def initialize_rag_system():
         print(f"❌ Erreur RAG: {e}")
         return False
 
+def current_index_version():
+    """Version de l'index vectoriel (clé des caches de réponses)"""
+    return rag_retriever.vector_db.index_version if rag_retriever else None
+
+def warm_retrieval(question):
+    """Met en cache la recherche d'une question fréquente (mêmes paramètres que chat)"""
+    if rag_retriever:
+        rag_retriever.search_documents(question, k=RAG_MAX_CHUNKS)
+
+def warm_answer(question):
+    """Génère la réponse d'une question fréquente et la met en cache"""
+    model = model_router.route(has_image=False)['model']
+    if not model:
+        raise Exception("aucun modèle texte disponible")
+    answer_cache.sync_version(current_index_version())
+    key = answer_cache.make_key(question, model, answer_cache.index_version)
+    prompt_plan, rag_used = enhance_prompt_with_rag(question)
+    response = chat_pool.request(
+        "POST",
+        "/api/chat",
+        model=model,
+        json=chat_payload(model, prompt_plan['messages']),
+        timeout=60
+    )
+    if response.status_code != 200:
+        raise Exception(f"Ollama API HTTP {response.status_code}")
+    answer = response.json().get('message', {}).get('content', '').strip()
+    if answer:
+        answer_cache.put(key, answer, rag_used=rag_used, warmed=True)
+
+def start_cache_warmup():
+    """Préchauffe les caches de recherche et de réponses en tâche de fond"""
+    if not memory_manager:
+        return False
+    since = time.time() - config.CACHE_WARMUP_DAYS * 86400 if config.CACHE_WARMUP_DAYS > 0 else None
+    started = cache_warmer.start(
+        lambda limit: memory_manager.frequent_questions(limit, start=since),
+        warm_retrieval,
+        warm_answer if answer_cache.enabled else None
+    )
+    if started:
+        print(f"🔥 Préchauffage des caches lancé ({config.CACHE_WARMUP_QUESTIONS} questions, "
+              f"budget {config.CACHE_WARMUP_BUDGET:.0f} s)")
+    return started
+
+def summarize_session(summary, turns):
+    """Fond des tours anciens dans le résumé d'une session (thread du résumeur)"""
+    model = model_router.route(has_image=False)['model']
+    if not model:
+        raise Exception("aucun modèle texte disponible")
+    payload = chat_payload(model, summary_request(summary, turns))
+    payload["options"].update({"temperature": 0.2, "num_predict": config.SUMMARY_MAX_TOKENS})
+    response = chat_pool.request("POST", "/api/chat", model=model, json=payload, timeout=120)
+    if response.status_code != 200:
+        raise Exception(f"Ollama API HTTP {response.status_code}")
+    metrics.incr("summaries.generated")
+    return response.json().get('message', {}).get('content', '')
+
+def ollama_unavailable(retry_after):
+    """Réponse 503 immédiate pendant une panne d'Ollama (circuit ouvert)"""
+    metrics.incr("ollama.breaker.rejected")
+    response = jsonify({
+        'error': 'Ollama est momentanément indisponible (panne détectée). Réessayez dans quelques secondes.',
+        'retry_after': round(retry_after, 1)
+    })
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, 503
+
+# Durée maximale d'une génération de chat (secondes): délai de chaque
+# lecture pour requests et durée totale du streaming (ChatStream)
+GENERATION_TIMEOUT = 60
+
+def record_cancellation(tokens_generated):
+    """Génération abandonnée (client déconnecté): compte les tokens épargnés
+
+    Estimation haute: le reste du budget num_predict, que le modèle aurait
+    pu générer.
+    """
+    tokens_saved = max(0, config.NUM_PREDICT - tokens_generated)
+    metrics.incr("generation.cancelled")
+    metrics.incr("generation.tokens_saved", tokens_saved)
+    print(f"✂️ Client déconnecté: génération interrompue après {tokens_generated} tokens "
+          f"(~{tokens_saved} épargnés)")
+
+def client_gone():
+    """Réponse à un client déjà déconnecté (jamais lue, 499 dans les logs)"""
+    return jsonify({'error': 'Client déconnecté: génération interrompue'}), 499
+
+def chat_payload(model, messages):
+    """Payload /api/chat d'Ollama (requêtes et préchauffage)"""
+    return {
+        "model": model,
+        "messages": messages,
+        "stream": False,
+        "keep_alive": config.OLLAMA_KEEP_ALIVE,
+        "options": {
+            "temperature": 0.7,
+            "num_predict": config.NUM_PREDICT,
+            "num_ctx": config.NUM_CTX
+        }
+    }
+
+def record_conversation(session_id, user_message, bot_response, metadata):
+    """Enregistre un tour dans le journal (et la session), ou dans la seule session sans RAG"""
+    if not memory_manager and user_message:
+        session_store.append(session_id, user_message, bot_response)
+    if memory_manager:
+        try:
+            metadata = dict(metadata, session_id=session_id)
+            memory_manager.add_conversation(
+                user_message=user_message,
+                bot_response=bot_response,
+                metadata=metadata
+            )
+        except Exception as e:
+            print(f"⚠️  Erreur sauvegarde mémoire: {e}")
+
 def test_model_response(model_name):
     """Test si un modèle répond correctement via API REST"""
     try:
@@ -183,8 +398,10 @@ def test_model_response(model_name):
             "options": {"temperature": 0.1, "num_predict": 10}
         }
         
-        response = requests.post(
-            "http://localhost:11434/api/chat",
+        response = chat_pool.request(
+            "POST",
+            "/api/chat",
+            model=model_name,
             json=payload,
             timeout=20
         )
@@ -202,26 +419,46 @@ def test_model_response(model_name):
         print(f"❌ Erreur test modèle {model_name}: {e}")
         return False
 
-def enhance_prompt_with_rag(user_message):
-    """Enrichit le prompt avec le contexte RAG"""
-    if not rag_initialized or not rag_retriever or not user_message.strip():
-        return user_message, False
-    
-    try:
-        context = rag_retriever.search(user_message, k=3)
-        if context.strip():
-            enhanced_prompt = f"""Contexte basé sur les documents disponibles:
-{context}
+def enhance_prompt_with_rag(user_message, history=None, session_id=None, summary=None):
+    """Enrichit le prompt avec le contexte RAG, dans le budget de tokens
 
-Question de l'utilisateur: {user_message}
+    Les chunks des documents passent en premier, suivis des réponses passées
+    à des questions proches (hors session courante, déjà dans l'historique).
+    Retourne le plan du PromptBuilder (messages ordonnés pour le cache de
+    prompt, tokens estimés, chunks retenus) et un booléen indiquant si du
+    contexte a été ajouté.
+    """
+    chunks = []
+    if rag_initialized and rag_retriever and user_message.strip():
+        try:
+            docs = rag_retriever.search_documents(user_message, k=RAG_MAX_CHUNKS)
+            chunks = [doc.page_content for doc in docs if doc.page_content.strip()]
+        except Exception as e:
+            print(f"⚠️  Erreur recherche RAG: {e}")
 
-Réponds en utilisant prioritairement les informations du contexte fourni."""
-            return enhanced_prompt, True
-        else:
-            return user_message, False
-    except Exception as e:
-        print(f"⚠️  Erreur recherche RAG: {e}")
-        return user_message, False
+        if memory_manager and config.RECALL_MAX_RESULTS > 0:
+            try:
+                recalled = memory_manager.recall_conversations(
+                    rag_retriever.embed_query(user_message),
+                    k=config.RECALL_MAX_RESULTS,
+                    min_score=config.RECALL_MIN_SCORE,
+                    exclude_session=session_id
+                )
+                chunks += [RECALL_TEMPLATE.format(**pair) for pair in recalled]
+                if recalled:
+                    metrics.incr("recall.hits")
+                    metrics.observe("recall.results", len(recalled))
+            except Exception as e:
+                print(f"⚠️  Erreur rappel des conversations: {e}")
+
+    plan = prompt_builder.build(
+        user_message,
+        chunks,
+        history=history,
+        max_context_tokens=RAG_CONTEXT_TOKENS,
+        summary=summary
+    )
+    return plan, plan['chunks_used'] > 0
 
 @app.route('/')
 def serve_html():
@@ -259,6 +496,10 @@ def status():
                 'files_by_type': docs_info.get('files_by_type', {}),
                 'supported_extensions': document_loader.get_supported_extensions() if document_loader else ['.pdf']
             },
+            'retrieval_cache': rag_retriever.cache_stats() if rag_retriever else None,
+            'model_warmup': model_warmer.stats(),
+            'cache_warmup': cache_warmer.stats(),
+            'ollama_pools': {'chat': chat_pool.stats(), 'embedding': embed_pool.stats()},
             'server_info': {
                 'python_version': sys.version,
                 'working_directory': str(Path.cwd())
@@ -275,6 +516,29 @@ def status():
             'error': str(e)
         }), 503
 
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métriques du serveur: routage, latences par route, caches"""
+    snapshot = metrics.snapshot()
+    snapshot['routing'] = {
+        'chat_model': config.CHAT_MODEL,
+        'vision_model': config.VISION_MODEL
+    }
+    snapshot['warmup'] = model_warmer.stats()
+    snapshot['ollama_pools'] = {'chat': chat_pool.stats(), 'embedding': embed_pool.stats()}
+    snapshot['prompt'] = prompt_builder.stats()
+    snapshot['sessions'] = session_store.stats()
+    if memory_manager:
+        snapshot['conversation_log'] = memory_manager.writer_stats()
+        snapshot['conversation_storage'] = memory_manager.storage_stats()
+        snapshot['conversation_recall'] = memory_manager.recall_stats()
+        snapshot['session_summaries'] = memory_manager.summarizer_stats()
+    if rag_retriever:
+        snapshot['retrieval_cache'] = rag_retriever.cache_stats()
+    snapshot['answer_cache'] = answer_cache.stats()
+    snapshot['cache_warmup'] = cache_warmer.stats()
+    return jsonify(snapshot)
+
 @app.route('/api/test', methods=['GET'])
 def test_endpoint():
     """Endpoint de test basique"""
@@ -303,18 +567,146 @@ def initialize_rag_endpoint():
         "documents_info": docs_info
     })
 
+@app.route('/api/index/stats', methods=['GET'])
+def index_stats():
+    """Introspection de la base vectorielle (comptes, dimension, tailles, version)"""
+    if not rag_initialized or not rag_retriever:
+        return jsonify({'error': 'Système RAG non initialisé'}), 503
+
+    stats = rag_retriever.vector_db.get_stats()
+    stats['retrieval_cache'] = rag_retriever.cache_stats()
+    return jsonify(stats)
+
+@app.route('/api/search', methods=['POST'])
+def search_endpoint():
+    """Recherche RAG directe, avec filtres de métadonnées optionnels"""
+    if not rag_initialized or not rag_retriever:
+        return jsonify({'error': 'Système RAG non initialisé'}), 503
+
+    data = request.json
+    if not data:
+        return jsonify({'error': 'Données JSON manquantes'}), 400
+
+    query = data.get('query', '').strip()
+    if not query:
+        return jsonify({'error': 'Paramètre query requis'}), 400
+
+    filters = data.get('filters')
+    if filters is not None and not isinstance(filters, dict):
+        return jsonify({'error': 'filters doit être un objet {champ: valeur}'}), 400
+
+    try:
+        k = int(data.get('k', 3))
+        routing = bool(data.get('routing', True))
+        min_relevance = float(data.get('min_relevance', MIN_RELEVANCE))
+        results = rag_retriever.retrieve(
+            query,
+            k=k,
+            filters=filters,
+            routing=routing,
+            min_relevance=min_relevance,
+            token_budget=data.get('token_budget')
+        )
+
+        applied_filters = filters
+        if filters is None and routing:
+            applied_filters = rag_retriever.route(query)
+
+        return jsonify({
+            'query': query,
+            'filters': applied_filters,
+            'results': [
+                {'content': doc.page_content, 'metadata': doc.metadata, 'score': score}
+                for doc, score in results
+            ]
+        })
+    except Exception as e:
+        print(f"❌ Erreur recherche: {e}")
+        return jsonify({'error': f'Erreur recherche: {e}'}), 500
+
+@app.route('/api/search/batch', methods=['POST'])
+def search_batch_endpoint():
+    """Recherche RAG groupée (évaluation, préchauffage du cache)"""
+    if not rag_initialized or not rag_retriever:
+        return jsonify({'error': 'Système RAG non initialisé'}), 503
+
+    data = request.json
+    if not data:
+        return jsonify({'error': 'Données JSON manquantes'}), 400
+
+    queries = data.get('queries')
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': 'Paramètre queries (liste) requis'}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({'error': f'Maximum {MAX_BATCH_QUERIES} requêtes par lot'}), 400
+    if not all(isinstance(q, str) for q in queries):
+        return jsonify({'error': 'queries doit contenir des chaînes'}), 400
+
+    filters = data.get('filters')
+    if filters is not None and not isinstance(filters, dict):
+        return jsonify({'error': 'filters doit être un objet {champ: valeur}'}), 400
+
+    try:
+        k = int(data.get('k', 3))
+        start_time = time.time()
+        batch_results = rag_retriever.search_batch(
+            queries,
+            k=k,
+            filters=filters,
+            routing=bool(data.get('routing', True)),
+            min_relevance=float(data.get('min_relevance', MIN_RELEVANCE)),
+            token_budget=data.get('token_budget')
+        )
+
+        return jsonify({
+            'count': len(queries),
+            'elapsed_ms': round((time.time() - start_time) * 1000, 1),
+            'results': [
+                {
+                    'query': query,
+                    'results': [
+                        {'content': doc.page_content, 'metadata': doc.metadata, 'score': score}
+                        for doc, score in results
+                    ]
+                }
+                for query, results in zip(queries, batch_results)
+            ]
+        })
+    except Exception as e:
+        print(f"❌ Erreur recherche groupée: {e}")
+        return jsonify({'error': f'Erreur recherche: {e}'}), 500
+
 @app.route('/api/chat', methods=['POST'])
 def chat():
     try:
         print(f"📨 Nouvelle requête chat")
         
-        # Validation des données
+        # Validation des données (taille vérifiée avant de lire le JSON;
+        # sans Content-Length, envoi chunked, elle ne pourrait pas l'être)
+        if request.content_length is None:
+            return jsonify({'error': 'En-tête Content-Length requis'}), 411
+        if request.content_length > MAX_CHAT_BODY_BYTES:
+            metrics.incr("image.rejected")
+            return jsonify({
+                'error': f'Requête trop volumineuse (image max {config.IMAGE_MAX_BYTES // (1024 * 1024)} Mo)'
+            }), 413
         data = request.json
         if not data:
             return jsonify({'error': 'Données JSON manquantes'}), 400
             
         user_message = data.get('message', '').strip()
         image_b64 = data.get('image')
+        # Le frontend envoie les pièces jointes dans `file`, avec leur type
+        if not image_b64 and str(data.get('fileType') or '').startswith('image/'):
+            image_b64 = data.get('file')
+        # Réponse en streaming (NDJSON, un fragment par ligne) ou JSON unique
+        stream_mode = bool(data.get('stream'))
+        # "cache": false contourne le cache de réponses, "prompt_cache": false
+        # celui de prompt d'Ollama (tests de charge, mesure de l'économie)
+        use_answer_cache = data.get('cache', True) is not False
+        use_prompt_cache = data.get('prompt_cache', True) is not False
+        # Identifiant de conversation: fourni par le client ou créé ici
+        session_id = str(data.get('session_id') or uuid.uuid4().hex)[:128]
         
         if not user_message and not image_b64:
             return jsonify({'error': 'Message ou image requis'}), 400
@@ -322,67 +714,155 @@ def chat():
         print(f"💬 Message: '{user_message[:50]}{'...' if len(user_message) > 50 else ''}'")
         print(f"🖼️  Image: {'Oui' if image_b64 else 'Non'}")
 
-        # Trouver le meilleur modèle llava disponible
-        model_to_use = get_best_llava_model()
+        # Image décodée une fois, réduite et réencodée avant tout le reste
+        image_report = None
+        if image_b64:
+            try:
+                image_b64, image_report = image_preprocessor.process(image_b64)
+            except ImageError as e:
+                metrics.incr("image.rejected")
+                return jsonify({'error': str(e)}), e.status
+            metrics.observe("image.preprocess_ms", image_report['ms'])
+            metrics.observe("image.bytes_in", image_report['bytes_in'])
+            metrics.observe("image.bytes_out", image_report['bytes_out'])
+            metrics.incr("image.bytes_saved", image_report['bytes_saved'])
+            if image_report['processed']:
+                print(f"🖼️  Image {image_report['size_in']} → {image_report['size_out']}, "
+                      f"{image_report['bytes_in'] // 1024} → {image_report['bytes_out'] // 1024} Ko "
+                      f"en {image_report['ms']:.0f} ms")
+
+        # Routage: modèle texte pour les questions, llava pour les images
+        request_start = time.time()
+        try:
+            routing = model_router.route(has_image=bool(image_b64))
+        except CircuitOpenError as e:
+            return ollama_unavailable(e.retry_after)
+        except requests.exceptions.RequestException as e:
+            # Inventaire injoignable: Ollama est en panne, pas le modèle absent
+            print(f"❌ Connexion Ollama impossible (routage): {e}")
+            return jsonify({
+                'error': 'Impossible de se connecter à Ollama. Vérifiez qu\'Ollama est démarré: ollama serve'
+            }), 503
+        except Exception as e:
+            print(f"Erreur routage modèle: {e}")
+            routing = {'route': 'vision' if image_b64 else 'text', 'model': None, 'fallback': False}
+
+        model_to_use = routing['model']
+        route = routing['route']
         if not model_to_use:
+            metrics.incr(f"route.{route}.unavailable")
             return jsonify({
                 'error': 'Aucun modèle llava disponible. Vérifiez: ollama list | grep llava'
             }), 503
 
-        print(f"🎯 Utilisation du modèle: {model_to_use}")
+        metrics.incr(f"route.{route}")
+        if routing['fallback']:
+            metrics.incr(f"route.{route}.fallback")
+            print(f"⚠️ Modèle texte {config.CHAT_MODEL} absent, repli sur {model_to_use}")
+
+        print(f"🎯 Route {route} → modèle: {model_to_use}")
 
-        # Test rapide du modèle avant utilisation
-        if not test_model_response(model_to_use):
+        # Première question d'une conversation déjà répondue (cache préchauffé
+        # ou requête récente): ni recherche ni génération
+        # Tours en attente de résumé compris (le budget du prompt tronque)
+        history = session_store.turns(session_id, include_pending=True)
+        summary = session_store.summary(session_id)
+        answer_key = None
+        if (user_message and not image_b64 and not history and not summary
+                and use_answer_cache and answer_cache.enabled):
+            answer_cache.sync_version(current_index_version())
+            answer_key = answer_cache.make_key(user_message, model_to_use, answer_cache.index_version)
+            cached = answer_cache.get(answer_key)
+            if cached:
+                metrics.incr("answer_cache.hits")
+                metrics.observe(f"chat.{route}.latency_ms", (time.time() - request_start) * 1000)
+                print(f"⚡ Réponse servie depuis le cache ({len(cached['answer'])} caractères)")
+                record_conversation(session_id, user_message, cached['answer'], {
+                    "rag_used": cached.get('rag_used', False),
+                    "has_image": False,
+                    "model": model_to_use,
+                    "route": route,
+                    "cached": True
+                })
+                body = {
+                    'response': cached['answer'],
+                    'status': 'success',
+                    'model_used': model_to_use,
+                    'route': route,
+                    'rag_used': cached.get('rag_used', False),
+                    'prompt_tokens': None,
+                    'cached': True,
+                    'session_id': session_id
+                }
+                if stream_mode:
+                    return Response(json.dumps(dict(body, done=True), ensure_ascii=False) + "\n",
+                                    mimetype="application/x-ndjson")
+                return jsonify(body)
+            metrics.incr("answer_cache.misses")
+
+        # Panne d'Ollama en cours: échec immédiat (les réponses en cache
+        # ci-dessus restent servies)
+        try:
+            chat_pool.check()
+        except CircuitOpenError as e:
+            return ollama_unavailable(e.retry_after)
+
+        # Test rapide du modèle avant utilisation (inutile s'il est déjà chargé)
+        if not model_warmer.is_warm(model_to_use) and not test_model_response(model_to_use):
             return jsonify({
                 'error': f'Le modèle {model_to_use} ne répond pas correctement. Redémarrez Ollama.'
             }), 503
 
         # Enrichissement avec RAG (seulement pour les messages texte sans image)
+        # Préambule et historique en tête (préfixe stable réutilisé par le
+        # cache de prompt d'Ollama), contexte RAG et question en dernier
         rag_used = False
         if user_message and not image_b64:
-            enhanced_message, rag_used = enhance_prompt_with_rag(user_message)
+            prompt_plan, rag_used = enhance_prompt_with_rag(user_message, history, session_id, summary)
             if rag_used:
-                print("📚 Message enrichi avec RAG")
+                print(f"📚 Message enrichi avec RAG ({prompt_plan['chunks_used']} chunks, "
+                      f"~{prompt_plan['estimated_tokens']}/{prompt_plan['budget']} tokens)")
         else:
-            enhanced_message = user_message or "Décris cette image en détail"
+            prompt_plan = prompt_builder.build(
+                user_message or "Décris cette image en détail",
+                history=history,
+                summary=summary
+            )
 
         # Préparation du payload pour API REST
-        payload = {
-            "model": model_to_use,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": enhanced_message
-                }
-            ],
-            "stream": False,
-            "options": {
-                "temperature": 0.7,
-                "num_predict": 512,
-                "num_ctx": 2048
-            }
-        }
+        payload = chat_payload(model_to_use, prompt_plan['messages'])
+        if not use_prompt_cache:
+            # Préfixe unique: aucun token du prompt n'est repris du cache
+            first = payload["messages"][0]
+            payload["messages"][0] = dict(first, content=f"[{uuid.uuid4().hex}]\n{first['content']}")
+        # Réponse d'Ollama lue en streaming: la génération peut être
+        # abandonnée dès que le client se déconnecte
+        payload["stream"] = True
         
         if image_b64:
-            payload["messages"][0]["images"] = [image_b64]
+            payload["messages"][-1]["images"] = [image_b64]
 
-        print("🤖 Appel à Ollama via API REST...")
-        
-        try:
-            response = requests.post(
-                "http://localhost:11434/api/chat",
-                json=payload,
-                timeout=60
-            )
-            
-            if response.status_code != 200:
-                error_detail = response.text[:300] if response.text else "Pas de détails"
-                raise Exception(f"Ollama API HTTP {response.status_code}: {error_detail}")
-            
-            result = response.json()
-            
-            if 'message' not in result or 'content' not in result['message']:
-                raise Exception("Réponse Ollama invalide - structure inattendue")
+        def finish(generation):
+            """Métriques, cache et journal d'une génération terminée; corps de la réponse"""
+            result = generation.result
+            metrics.observe(f"chat.{route}.generation_ms", (time.time() - generation_start) * 1000)
+
+            if model_warmer.record_timing(model_to_use, result, generation.response.backend):
+                metrics.incr("ollama.cold_loads")
+                metrics.incr(f"ollama.cold_loads.{model_to_use}")
+            metrics.observe("ollama.load_ms", (result.get('load_duration') or 0) / 1e6)
+
+            prompt_tokens = result.get('prompt_eval_count')
+            if prompt_tokens:
+                # Sans cache de prompt: base réelle de l'économie du préfixe
+                suffix = "" if use_prompt_cache else "_uncached"
+                metrics.observe(f"chat.{route}.prompt_tokens{suffix}", prompt_tokens)
+                metrics.observe(f"chat.{route}.prompt_eval_ms{suffix}", (result.get('prompt_eval_duration') or 0) / 1e6)
+                usage = prompt_builder.record_usage(prompt_plan['estimated_tokens'], prompt_tokens,
+                                                    uncached=not use_prompt_cache)
+                if usage['overflow']:
+                    metrics.incr("prompt.overflows")
+                    print(f"⚠️ Prompt de {prompt_tokens} tokens: fenêtre num_ctx={config.NUM_CTX} saturée")
             
             bot_response = result['message']['content'].strip()
             
@@ -390,41 +870,107 @@ def chat():
                 bot_response = "Désolé, je n'ai pas pu générer une réponse appropriée."
             
             print(f"✅ Réponse générée: {len(bot_response)} caractères")
+            metrics.observe(f"chat.{route}.latency_ms", (time.time() - request_start) * 1000)
             
-            # Sauvegarder dans la mémoire si disponible
-            if memory_manager:
-                try:
-                    memory_manager.add_conversation(
-                        user_message=user_message,
-                        bot_response=bot_response,
-                        metadata={
-                            "rag_used": rag_used,
-                            "has_image": bool(image_b64),
-                            "model": model_to_use
-                        }
-                    )
-                except Exception as e:
-                    print(f"⚠️  Erreur sauvegarde mémoire: {e}")
+            if answer_key:
+                answer_cache.put(answer_key, bot_response, rag_used=rag_used)
+
+            # Sauvegarder dans la mémoire si disponible (met aussi à jour la session)
+            record_conversation(session_id, user_message, bot_response, {
+                "rag_used": rag_used,
+                "has_image": bool(image_b64),
+                "model": model_to_use,
+                "route": route
+            })
             
-            return jsonify({
+            return {
                 'response': bot_response,
                 'status': 'success',
                 'model_used': model_to_use,
-                'rag_used': rag_used
-            })
+                'route': route,
+                'rag_used': rag_used,
+                'prompt_tokens': prompt_tokens,
+                'cached': False,
+                'image': image_report,
+                'session_id': session_id
+            }
+
+        def events(generation):
+            """Réponse NDJSON: un fragment par ligne, puis le résultat final"""
+            try:
+                for content in generation:
+                    yield json.dumps({'token': content}, ensure_ascii=False) + "\n"
+                yield json.dumps(dict(finish(generation), done=True), ensure_ascii=False) + "\n"
+            except GeneratorExit:
+                # Écriture impossible: le client s'est déconnecté
+                if generation.result is None:
+                    generation.cancel()
+                    record_cancellation(generation.tokens)
+                raise
+            except Exception as e:
+                print(f"❌ Erreur Ollama pendant le streaming: {e}")
+                model_warmer.mark_failed(model_to_use)
+                yield json.dumps({'error': f'Erreur Ollama: {e}', 'done': True}, ensure_ascii=False) + "\n"
+
+        print("🤖 Appel à Ollama via API REST...")
+        
+        try:
+            generation_start = time.time()
+            # Client parti pendant la recherche: rien à générer
+            if client_disconnected(request.environ):
+                record_cancellation(0)
+                return client_gone()
+
+            # Même serveur que les tours précédents de la session tant qu'il
+            # n'est pas surchargé (cache de prompt d'Ollama)
+            response = chat_pool.request(
+                "POST",
+                "/api/chat",
+                model=model_to_use,
+                affinity=session_id,
+                json=payload,
+                timeout=GENERATION_TIMEOUT,
+                stream=True
+            )
+            
+            if response.status_code != 200:
+                error_detail = response.text[:300] if response.text else "Pas de détails"
+                response.close()
+                raise Exception(f"Ollama API HTTP {response.status_code}: {error_detail}")
             
+            generation = ChatStream(
+                response,
+                timeout=GENERATION_TIMEOUT,
+                on_failure=lambda error: chat_pool.record_failure(response.backend, error)
+            )
+            if stream_mode:
+                return Response(stream_with_context(events(generation)), mimetype="application/x-ndjson")
+
+            # Test de déconnexion non bloquant à chaque fragment reçu
+            for _ in generation:
+                if client_disconnected(request.environ):
+                    generation.cancel()
+                    record_cancellation(generation.tokens)
+                    return client_gone()
+
+            return jsonify(finish(generation))
+            
+        except CircuitOpenError as e:
+            return ollama_unavailable(e.retry_after)
         except requests.exceptions.Timeout:
-            print("❌ Timeout Ollama (>60s)")
+            print(f"❌ Timeout Ollama (>{GENERATION_TIMEOUT:.0f}s)")
             return jsonify({
                 'error': 'Timeout: La génération a pris trop de temps. Essayez avec un message plus court.'
             }), 503
         except requests.exceptions.ConnectionError:
             print("❌ Connexion Ollama impossible")
+            model_warmer.mark_failed(model_to_use)
             return jsonify({
                 'error': 'Impossible de se connecter à Ollama. Vérifiez qu\'Ollama est démarré: ollama serve'
             }), 503
         except Exception as e:
             print(f"❌ Erreur Ollama détaillée: {e}")
+            model_warmer.mark_failed(model_to_use)
             error_msg = str(e)
             
             if "connection" in error_msg.lower():
@@ -448,13 +994,17 @@ def chat():
 
 @app.route('/api/debug/ollama', methods=['GET'])
 def debug_ollama():
-    """Endpoint de debug pour Ollama"""
+    """Endpoint de debug pour Ollama (appels directs au premier serveur du
+    pool de génération, hors disjoncteur)"""
     try:
-        debug_info = {}
+        debug_info = {
+            'ollama_url': chat_pool.url,
+            'pools': {'chat': chat_pool.stats(), 'embedding': embed_pool.stats()}
+        }
         
         # Test connexion basique
         try:
-            response = requests.get("http://localhost:11434/api/version", timeout=5)
+            response = requests.get(f"{chat_pool.url}/api/version", timeout=5)
             if response.status_code == 200:
                 debug_info['ollama_version'] = response.json()
                 debug_info['ollama_accessible'] = True
@@ -467,7 +1017,7 @@ def debug_ollama():
         
         # Liste des modèles
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=10)
+            response = requests.get(f"{chat_pool.url}/api/tags", timeout=10)
             if response.status_code == 200:
                 models_data = response.json()
                 debug_info['models'] = models_data.get('models', [])
@@ -492,7 +1042,7 @@ def debug_ollama():
                 }
                 
                 response = requests.post(
-                    "http://localhost:11434/api/chat",
+                    f"{chat_pool.url}/api/chat",
                     json=payload,
                     timeout=15
                 )
@@ -520,43 +1070,52 @@ def debug_ollama():
         return jsonify({'debug_error': str(e)}), 500
 
 if __name__ == '__main__':
-    print("🔧 Tests de démarrage...")
+    # debug=True relance le script dans un processus enfant (rechargement
+    # automatique): tests et tâches de fond (préchargement, résumés,
+    # rappel) seulement dans le processus qui sert les requêtes
+    debug = True
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        print("🔧 Tests de démarrage...")
     
-    # Test Ollama au démarrage
-    ollama_ok, llava_models = test_ollama_connection()
+        # Test Ollama au démarrage
+        ollama_ok, llava_models = test_ollama_connection()
     
-    if ollama_ok and llava_models:
-        print(f"✅ Ollama opérationnel avec {len(llava_models)} modèles llava!")
+        if ollama_ok and llava_models:
+            print(f"✅ Ollama opérationnel avec {len(llava_models)} modèles llava!")
         
-        # Test rapide du premier modèle
-        if test_model_response(llava_models[0]):
-            print("✅ Modèle testé et fonctionnel!")
+            # Test rapide du premier modèle
+            if test_model_response(llava_models[0]):
+                print("✅ Modèle testé et fonctionnel!")
+            else:
+                print("⚠️ Problème avec le modèle - le chatbot peut dysfonctionner")
         else:
-            print("⚠️ Problème avec le modèle - le chatbot peut dysfonctionner")
-    else:
-        print("❌ Problèmes Ollama critiques détectés!")
-        print("💡 Solutions possibles:")
-        print("   1. Vérifiez qu'Ollama est démarré: ollama serve")
-        print("   2. Installez llava: ollama pull llava:latest")
-        print("   3. Redémarrez Ollama si nécessaire")
-        print("   4. Testez manuellement: ollama run llava:latest 'hello'")
+            print("❌ Problèmes Ollama critiques détectés!")
+            print("💡 Solutions possibles:")
+            print("   1. Vérifiez qu'Ollama est démarré: ollama serve")
+            print("   2. Installez llava: ollama pull llava:latest")
+            print("   3. Redémarrez Ollama si nécessaire")
+            print("   4. Testez manuellement: ollama run llava:latest 'hello'")
     
-    # Tentative d'initialisation RAG
-    rag_ok = initialize_rag_system()
-    if rag_ok:
-        print("✅ Système RAG opérationnel!")
-    else:
-        print("⚠️  RAG non initialisé (fonctionnement en mode simple)")
+        # Préchargement des modèles (évite le chargement à froid au premier message)
+        if ollama_ok:
+            start_model_warmup()
+    
+        # Tentative d'initialisation RAG
+        rag_ok = initialize_rag_system()
+        if rag_ok:
+            print("✅ Système RAG opérationnel!")
+        else:
+            print("⚠️  RAG non initialisé (fonctionnement en mode simple)")
     
-    print("\n🌐 Serveur Flask démarré sur:")
-    print("   - Frontend: http://localhost:5000")
-    print("   - API Test: http://localhost:5000/api/test")
-    print("   - API Status: http://localhost:5000/api/status")
-    print("   - Debug Ollama: http://localhost:5000/api/debug/ollama")
-    print("\n🔧 Pour déboguer:")
-    print("   1. Testez: http://localhost:5000/api/test")
-    print("   2. Status: http://localhost:5000/api/status")  
-    print("   3. Debug Ollama: http://localhost:5000/api/debug/ollama")
-    print("   4. Si problèmes: Vérifiez les logs ci-dessus")
+        print("\n🌐 Serveur Flask démarré sur:")
+        print("   - Frontend: http://localhost:5000")
+        print("   - API Test: http://localhost:5000/api/test")
+        print("   - API Status: http://localhost:5000/api/status")
+        print("   - Debug Ollama: http://localhost:5000/api/debug/ollama")
+        print("\n🔧 Pour déboguer:")
+        print("   1. Testez: http://localhost:5000/api/test")
+        print("   2. Status: http://localhost:5000/api/status")  
+        print("   3. Debug Ollama: http://localhost:5000/api/debug/ollama")
+        print("   4. Si problèmes: Vérifiez les logs ci-dessus")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=debug)
\ No newline at end of file
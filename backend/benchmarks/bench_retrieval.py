@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark qualité/latence de la recherche RAG sur le corpus UMI
+
+Lancer depuis le dossier backend/ :
+    python -m benchmarks.bench_retrieval --output resultats.json
+
+Par défaut, l'index est construit dans un dossier temporaire avec des
+embeddings locaux déterministes (HashingEmbeddings): aucun Ollama requis et
+deux exécutions sur le même code donnent les mêmes scores. Le rapport JSON
+(recall@k, MRR, latences p50/p95/p99, temps de construction) permet de
+comparer deux réglages de découpage, d'embedding ou d'index.
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from rag.embeddings import HashingEmbeddings
+from rag.loader import DocumentLoader
+from rag.retriever import RagRetriever
+from rag.vector_db import VectorDB
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_QUESTIONS = BENCH_DIR / "retrieval_questions.json"
+DEFAULT_DOCUMENTS = BENCH_DIR.parent.parent / "data" / "documents"
+
+
+def log(message):
+    """Messages de progression sur stderr (stdout est réservé au JSON)"""
+    print(message, file=sys.stderr)
+
+
+def percentile(values, pct):
+    """Percentile par rang le plus proche"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def is_relevant(doc, expected):
+    """Un chunk est pertinent s'il provient du bon document (et de la bonne page si précisée)"""
+    if doc.metadata.get("source_file") != expected["source_file"]:
+        return False
+    pages = expected.get("pages") or []
+    return not pages or doc.metadata.get("page") in pages
+
+
+def build_index(documents_dir, persist_dir, embeddings, chunk_size, chunk_overlap):
+    """Construit l'index et retourne (VectorDB, nombre de chunks, durée en secondes)"""
+    loader = DocumentLoader(str(documents_dir), chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        vector_db = VectorDB(persist_dir=str(persist_dir), embeddings=embeddings)
+        start = time.perf_counter()
+        documents, _, _ = loader.load_documents()
+        vector_db.add_documents(documents)
+        build_seconds = time.perf_counter() - start
+
+    return vector_db, len(documents), build_seconds
+
+
+def run_questions(retriever, questions, ks, repeat, retrieve_options):
+    """Exécute les questions et calcule recall@k, MRR et latences"""
+    max_k = max(ks)
+    latencies_ms = []
+    doc_hits = {k: 0 for k in ks}
+    page_hits = {k: 0 for k in ks}
+    reciprocal_ranks = []
+    per_question = []
+
+    for item in questions:
+        results = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results = retriever.retrieve(item["question"], k=max_k, **retrieve_options)
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        docs = [doc for doc, _ in results]
+        doc_ranks = [i for i, doc in enumerate(docs, 1) if doc.metadata.get("source_file") == item["source_file"]]
+        page_ranks = [i for i, doc in enumerate(docs, 1) if is_relevant(doc, item)]
+
+        for k in ks:
+            if doc_ranks and doc_ranks[0] <= k:
+                doc_hits[k] += 1
+            if page_ranks and page_ranks[0] <= k:
+                page_hits[k] += 1
+        reciprocal_ranks.append(1.0 / page_ranks[0] if page_ranks else 0.0)
+
+        per_question.append({
+            "id": item["id"],
+            "first_relevant_rank": page_ranks[0] if page_ranks else None,
+            "retrieved": [
+                {
+                    "source_file": doc.metadata.get("source_file"),
+                    "page": doc.metadata.get("page"),
+                    "score": round(score, 4)
+                }
+                for doc, score in results
+            ]
+        })
+
+    total = len(questions) or 1
+    return {
+        "recall_at_k": {str(k): round(page_hits[k] / total, 4) for k in ks},
+        "document_recall_at_k": {str(k): round(doc_hits[k] / total, 4) for k in ks},
+        "mrr": round(sum(reciprocal_ranks) / total, 4),
+        "latency_ms": {
+            "p50": round(percentile(latencies_ms, 50), 3),
+            "p95": round(percentile(latencies_ms, 95), 3),
+            "p99": round(percentile(latencies_ms, 99), 3),
+            "mean": round(sum(latencies_ms) / len(latencies_ms), 3),
+            "samples": len(latencies_ms)
+        },
+        "questions": per_question
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark de la recherche RAG sur data/documents")
+    parser.add_argument("--questions", default=str(DEFAULT_QUESTIONS), help="Fichier JSON des questions de référence")
+    parser.add_argument("--documents", default=str(DEFAULT_DOCUMENTS), help="Dossier des documents à indexer")
+    parser.add_argument("--embeddings", choices=["hashing", "ollama"], default="hashing",
+                        help="hashing: local et déterministe (défaut); ollama: nomic-embed-text réel")
+    parser.add_argument("--dimension", type=int, default=384, help="Dimension des embeddings locaux")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5], help="Valeurs de k pour recall@k")
+    parser.add_argument("--min-relevance", type=float, default=0.0,
+                        help="Seuil de pertinence (0 pour mesurer le classement brut)")
+    parser.add_argument("--no-routing", action="store_true", help="Désactive le routage par filière")
+    parser.add_argument("--repeat", type=int, default=3, help="Répétitions par question pour les latences")
+    parser.add_argument("--cache", action="store_true", help="Active le cache de résultats (désactivé par défaut)")
+    parser.add_argument("--output", help="Écrit le rapport JSON dans ce fichier (sinon sur stdout)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    with open(args.questions, "r", encoding="utf-8") as f:
+        questions = json.load(f)["questions"]
+
+    if args.embeddings == "hashing":
+        embeddings = HashingEmbeddings(dimension=args.dimension)
+    else:
+        embeddings = None  # OllamaEmbeddings par défaut de VectorDB
+
+    with tempfile.TemporaryDirectory(prefix="umi-bench-") as persist_dir:
+        log(f"🏗️ Construction de l'index ({args.embeddings}) dans {persist_dir}...")
+        vector_db, chunk_count, build_seconds = build_index(
+            args.documents, persist_dir, embeddings, args.chunk_size, args.chunk_overlap
+        )
+        log(f"✅ {chunk_count} chunks indexés en {build_seconds:.2f}s")
+
+        retriever = RagRetriever(vector_db, cache_size=512 if args.cache else 0)
+        log(f"🔍 {len(questions)} questions x {args.repeat} répétitions...")
+        metrics = run_questions(
+            retriever,
+            questions,
+            sorted(set(args.k)),
+            args.repeat,
+            {"min_relevance": args.min_relevance, "routing": not args.no_routing}
+        )
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "embeddings": getattr(vector_db.embeddings, "model", args.embeddings),
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "min_relevance": args.min_relevance,
+            "routing": not args.no_routing,
+            "cache": args.cache,
+            "repeat": args.repeat,
+            "questions_file": str(args.questions),
+            "python": platform.python_version()
+        },
+        "index": {
+            "chunks": chunk_count,
+            "build_seconds": round(build_seconds, 3)
+        },
+        **metrics
+    }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        log(f"📄 Rapport écrit dans {args.output}")
+    else:
+        print(output)
+
+    log(f"📊 recall@k={report['recall_at_k']} MRR={report['mrr']} "
+        f"p50={report['latency_ms']['p50']}ms p95={report['latency_ms']['p95']}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Serveur Ollama factice pour les tests de charge sur une machine sans GPU
+
+Lancer depuis le dossier backend/ (Ollama réel arrêté, même port) :
+    python -m benchmarks.fake_ollama --port 11434 --tokens-per-second 25
+
+Émule /api/tags, /api/version, /api/chat, /api/generate, /api/embeddings et
+/api/embed avec des débits de tokens et des latences configurables, ainsi que
+les champs de timing d'Ollama (load_duration, prompt_eval_count,
+prompt_eval_duration, eval_count, eval_duration). Comme Ollama, le préfixe
+commun avec le prompt précédent du même modèle n'est pas réévalué ni compté
+dans prompt_eval_count (cache de prompt). Les embeddings sont produits par
+HashingEmbeddings: déterministes et utilisables par le RAG.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from rag.embeddings import HashingEmbeddings
+
+WORDS = (
+    "L'université Moulay Ismaïl propose des formations en licence, master, "
+    "cycle ingénieur et DUT avec des modules semestriels validés par contrôle "
+    "continu et rattrapage selon le descriptif de la filière."
+).split()
+
+
+class FakeOllama:
+    """État partagé du serveur factice: modèles chargés, slots de génération, compteurs"""
+
+    def __init__(self, args):
+        self.args = args
+        self.models = args.models
+        self.embeddings = HashingEmbeddings(dimension=args.embedding_dimension)
+        self.slots = threading.BoundedSemaphore(args.parallel)
+        self.loaded = {}
+        self.prompts = {}
+        self.lock = threading.Lock()
+        self.random = random.Random(args.seed)
+        self.counters = {'chat': 0, 'generate': 0, 'embed': 0, 'errors': 0, 'cancelled': 0}
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def resolve(self, model):
+        """Nom de modèle complet (Ollama accepte "llava" pour "llava:latest")"""
+        if model and ":" not in model:
+            model = f"{model}:latest"
+        return model if model in self.models else None
+
+    def cached_tokens(self, model, text):
+        """Tokens du préfixe commun avec le dernier prompt de `model` (cache KV)"""
+        with self.lock:
+            previous = self.prompts.get(model, "")
+            self.prompts[model] = text
+        if self.args.no_prompt_cache:
+            return 0
+        common = 0
+        for a, b in zip(previous, text):
+            if a != b:
+                break
+            common += 1
+        return common // 4
+
+    def should_fail(self):
+        with self.lock:
+            return self.random.random() < self.args.error_rate
+
+    def load_model(self, model, keep_alive=None):
+        """Simule le chargement à froid et retourne load_duration (ns)"""
+        now = time.time()
+        with self.lock:
+            expires = self.loaded.get(model)
+            cold = expires is None or expires < now
+            ttl = self._keep_alive_seconds(keep_alive)
+            self.loaded[model] = float("inf") if ttl < 0 else now + ttl
+
+        if cold and self.args.load_ms:
+            time.sleep(self.args.load_ms / 1000)
+            return int(self.args.load_ms * 1e6)
+        return int(0.5 * 1e6)
+
+    def _keep_alive_seconds(self, keep_alive):
+        if keep_alive is None:
+            return self.args.keep_alive
+        if isinstance(keep_alive, (int, float)):
+            return keep_alive
+        value = str(keep_alive).strip()
+        units = {'s': 1, 'm': 60, 'h': 3600}
+        if value and value[-1] in units:
+            return float(value[:-1]) * units[value[-1]]
+        return float(value)
+
+    def jitter(self, seconds):
+        if not self.args.jitter:
+            return seconds
+        with self.lock:
+            return max(0.0, seconds * (1 + self.random.uniform(-self.args.jitter, self.args.jitter)))
+
+
+def render_prompt(messages):
+    """Texte du prompt tel que le gabarit de chat le présenterait au modèle"""
+    return "".join(f"<|{m.get('role', 'user')}|>{m.get('content', '')}\n" for m in messages)
+
+
+def estimate_prompt_tokens(messages):
+    text = render_prompt(messages)
+    images = sum(len(m.get('images') or []) for m in messages)
+    # llava encode une image en ~576 tokens
+    return max(1, len(text) // 4) + images * 576
+
+
+class Handler(BaseHTTPRequestHandler):
+    server_version = "FakeOllama/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def state(self) -> FakeOllama:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.state.args.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({'models': [
+                {'name': name, 'model': name, 'size': 4 * 1024 ** 3, 'details': {'family': name.split(':')[0]}}
+                for name in self.state.models
+            ]})
+        elif self.path == "/api/version":
+            self._send_json({'version': 'fake-0.0.0'})
+        elif self.path == "/api/ps":
+            now = time.time()
+            with self.state.lock:
+                loaded = [name for name, expires in self.state.loaded.items() if expires >= now]
+            self._send_json({'models': [{'name': name, 'model': name} for name in loaded]})
+        elif self.path == "/stats":
+            with self.state.lock:
+                self._send_json(dict(self.state.counters))
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        try:
+            payload = self._read_json()
+        except json.JSONDecodeError:
+            self._send_json({'error': 'invalid JSON'}, 400)
+            return
+
+        if self.path == "/api/chat":
+            self.state.count('chat')
+            self._generate(payload, payload.get('messages') or [], chat=True)
+        elif self.path == "/api/generate":
+            self.state.count('generate')
+            messages = [{'content': payload.get('prompt', ''), 'images': payload.get('images')}]
+            self._generate(payload, messages, chat=False)
+        elif self.path in ("/api/embeddings", "/api/embed"):
+            self.state.count('embed')
+            self._embed(payload, legacy=self.path == "/api/embeddings")
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def _embed(self, payload, legacy):
+        model = self.state.resolve(payload.get('model'))
+        if not model:
+            self._send_json({'error': f"model '{payload.get('model')}' not found"}, 404)
+            return
+
+        load_ns = self.state.load_model(model, payload.get('keep_alive'))
+        if legacy:
+            inputs = [payload.get('prompt', '')]
+        else:
+            inputs = payload.get('input', '')
+            inputs = inputs if isinstance(inputs, list) else [inputs]
+
+        time.sleep(self.state.jitter(self.state.args.embed_ms / 1000 * max(1, len(inputs))))
+        vectors = self.state.embeddings.embed_documents(inputs)
+
+        if legacy:
+            self._send_json({'embedding': vectors[0]})
+        else:
+            self._send_json({'model': model, 'embeddings': vectors, 'load_duration': load_ns})
+
+    def _generate(self, payload, messages, chat):
+        args = self.state.args
+        model = self.state.resolve(payload.get('model'))
+        if not model:
+            self._send_json({'error': f"model '{payload.get('model')}' not found"}, 404)
+            return
+        if self.state.should_fail():
+            self.state.count('errors')
+            self._send_json({'error': 'simulated failure'}, 500)
+            return
+
+        options = payload.get('options') or {}
+        stream = payload.get('stream', True)
+        start = time.time()
+
+        with self.state.slots:
+            load_ns = self.state.load_model(model, payload.get('keep_alive'))
+
+            # Requête vide (préchargement): aucun token généré
+            if not chat and not payload.get('prompt'):
+                self._send_json(self._final(model, chat, "", start, load_ns, 0, 0, 0))
+                return
+
+            prompt_tokens = estimate_prompt_tokens(messages)
+            prompt_tokens = max(1, prompt_tokens - self.state.cached_tokens(model, render_prompt(messages)))
+            prompt_seconds = self.state.jitter(args.latency_ms / 1000 + prompt_tokens / args.prompt_tokens_per_second)
+            time.sleep(prompt_seconds)
+
+            num_predict = options.get('num_predict', args.num_predict)
+            if num_predict is None or num_predict < 0:
+                num_predict = args.num_predict
+            tokens = min(num_predict, args.num_predict)
+            token_delay = 1.0 / args.tokens_per_second
+
+            words = [WORDS[i % len(WORDS)] for i in range(tokens)]
+            eval_start = time.time()
+
+            if not stream:
+                time.sleep(self.state.jitter(token_delay * tokens))
+                eval_ns = int((time.time() - eval_start) * 1e9)
+                self._send_json(self._final(
+                    model, chat, " ".join(words), start, load_ns, prompt_tokens, int(prompt_seconds * 1e9), tokens, eval_ns
+                ))
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for word in words:
+                    time.sleep(self.state.jitter(token_delay))
+                    self._write_chunk(self._chunk(model, chat, word + " "))
+                eval_ns = int((time.time() - eval_start) * 1e9)
+                self._write_chunk(self._final(
+                    model, chat, "", start, load_ns, prompt_tokens, int(prompt_seconds * 1e9), tokens, eval_ns
+                ))
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                # Le client a fermé la connexion: la génération s'arrête comme chez Ollama
+                self.state.count('cancelled')
+                self.close_connection = True
+
+    def _write_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    @staticmethod
+    def _chunk(model, chat, text):
+        chunk = {'model': model, 'created_at': time.strftime("%Y-%m-%dT%H:%M:%SZ"), 'done': False}
+        if chat:
+            chunk['message'] = {'role': 'assistant', 'content': text}
+        else:
+            chunk['response'] = text
+        return chunk
+
+    def _final(self, model, chat, text, start, load_ns, prompt_tokens, prompt_ns, eval_count, eval_ns=0):
+        final = self._chunk(model, chat, text)
+        final.update({
+            'done': True,
+            'done_reason': 'stop' if eval_count else 'load',
+            'total_duration': int((time.time() - start) * 1e9),
+            'load_duration': load_ns,
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': prompt_ns,
+            'eval_count': eval_count,
+            'eval_duration': eval_ns
+        })
+        return final
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serveur Ollama factice (tests de charge)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--models", nargs="+", default=["llava:latest", "llama3.2:latest", "nomic-embed-text:latest"])
+    parser.add_argument("--tokens-per-second", type=float, default=25.0, help="Débit de génération par requête")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=400.0, help="Débit d'évaluation du prompt")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latence fixe avant le premier token")
+    parser.add_argument("--load-ms", type=float, default=2000.0, help="Durée d'un chargement à froid de modèle")
+    parser.add_argument("--keep-alive", type=float, default=300.0, help="Durée de rétention d'un modèle (s), -1 = infini")
+    parser.add_argument("--embed-ms", type=float, default=15.0, help="Latence par texte embeddé")
+    parser.add_argument("--embedding-dimension", type=int, default=768)
+    parser.add_argument("--num-predict", type=int, default=128, help="Tokens générés au maximum par réponse")
+    parser.add_argument("--parallel", type=int, default=1, help="Générations simultanées (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Variation relative aléatoire des délais")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de générations en erreur 500")
+    parser.add_argument("--no-prompt-cache", action="store_true", help="Réévalue tout le prompt à chaque requête")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    # Le serveur Ollama réel stocke les modèles avec leur tag
+    args.models = [m if ":" in m else f"{m}:latest" for m in args.models]
+
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+    server.state = FakeOllama(args)
+
+    print(f"🤖 Ollama factice sur http://{args.host}:{args.port}")
+    print(f"   Modèles: {', '.join(args.models)}")
+    print(f"   {args.tokens_per_second} tokens/s, {args.parallel} génération(s) en parallèle, "
+          f"chargement à froid {args.load_ms:.0f}ms")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Arrêt du serveur factice")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
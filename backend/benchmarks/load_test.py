@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Générateur de charge pour /api/chat
+
+Lancer depuis le dossier backend/, avec le serveur Flask démarré et de
+préférence le serveur Ollama factice (benchmarks.fake_ollama) :
+    python -m benchmarks.load_test --concurrency 8 --requests 200
+    python -m benchmarks.load_test --rate 2 --duration 60 --concurrency 16
+    python -m benchmarks.load_test --stream --concurrency 4 --requests 50
+    python -m benchmarks.load_test --no-cache --concurrency 8 --requests 200
+    python -m benchmarks.load_test --no-cache --prompt-baseline --requests 50
+
+Deux modes :
+- boucle fermée (par défaut) : `--concurrency` clients envoient une requête
+  dès que la précédente est terminée ;
+- boucle ouverte (`--rate`) : arrivées de Poisson à débit fixe, la latence
+  est mesurée depuis l'instant d'arrivée prévu (file d'attente comprise).
+
+Le rapport JSON donne débit, TTFT, latences p50/p95/p99, taux d'erreur
+et part des réponses servies par le cache de réponses du serveur; les
+questions de référence se répétant, `--no-cache` le contourne pour
+mesurer la génération. `--prompt-baseline` rejoue ensuite la même charge
+sans cache de prompt d'Ollama (prompt entier évalué) et compare les
+prompt_eval_count réels: économie due à la réutilisation du préfixe.
+"""
+
+import argparse
+import json
+import math
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+BENCH_DIR = Path(__file__).resolve().parent
+DEFAULT_QUESTIONS = BENCH_DIR / "retrieval_questions.json"
+
+
+def log(message):
+    print(message, file=sys.stderr)
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values):
+    if not values:
+        return None
+    return {
+        'p50': round(percentile(values, 50), 2),
+        'p95': round(percentile(values, 95), 2),
+        'p99': round(percentile(values, 99), 2),
+        'mean': round(sum(values) / len(values), 2),
+        'max': round(max(values), 2)
+    }
+
+
+def load_questions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [q["question"] for q in data["questions"]]
+
+
+def final_message(body: bytes, stream: bool) -> dict:
+    """Résultat final de /api/chat: le JSON, ou la dernière ligne NDJSON"""
+    try:
+        if stream:
+            lines = [line for line in body.splitlines() if line.strip()]
+            return json.loads(lines[-1]) if lines else {}
+        return json.loads(body)
+    except (ValueError, IndexError):
+        return {}
+
+
+def send_chat(session, url, message, stream, timeout, scheduled_at, use_cache=True, prompt_cache=True):
+    """Envoie une requête et mesure TTFT (premier octet du corps) et latence totale
+
+    Sans streaming côté serveur, le premier octet arrive avec la réponse
+    complète: TTFT et latence sont alors confondus.
+    """
+    payload = {'message': message}
+    if stream:
+        payload['stream'] = True
+    if not use_cache:
+        payload['cache'] = False
+    if not prompt_cache:
+        payload['prompt_cache'] = False
+
+    result = {'status': None, 'error': None, 'ttft_ms': None, 'latency_ms': None, 'bytes': 0,
+              'cached': False, 'prompt_tokens': None}
+    try:
+        with session.post(url, json=payload, stream=True, timeout=timeout) as response:
+            result['status'] = response.status_code
+            body = bytearray()
+            for chunk in response.iter_content(chunk_size=None):
+                if chunk and result['ttft_ms'] is None:
+                    result['ttft_ms'] = (time.perf_counter() - scheduled_at) * 1000
+                result['bytes'] += len(chunk)
+                body += chunk
+            if response.status_code != 200:
+                result['error'] = f"HTTP {response.status_code}"
+            else:
+                # En streaming, une erreur serveur arrive en HTTP 200 dans la dernière ligne
+                final = final_message(bytes(body), stream)
+                if final.get('error'):
+                    result['error'] = 'stream_error' if stream else 'server_error'
+                elif stream and not final.get('done'):
+                    result['error'] = 'stream_incomplete'
+                result['cached'] = bool(final.get('cached'))
+                result['prompt_tokens'] = final.get('prompt_tokens')
+    except requests.exceptions.Timeout:
+        result['error'] = 'timeout'
+    except requests.exceptions.ConnectionError:
+        result['error'] = 'connection'
+    except Exception as e:
+        result['error'] = type(e).__name__
+
+    result['latency_ms'] = (time.perf_counter() - scheduled_at) * 1000
+    return result
+
+
+def request_options(args) -> dict:
+    return {'use_cache': not args.no_cache, 'prompt_cache': not getattr(args, 'no_prompt_cache', False)}
+
+
+def run_closed_loop(args, url, questions):
+    """`concurrency` clients en boucle jusqu'au nombre de requêtes ou à la durée"""
+    results = []
+    lock = threading.Lock()
+    counter = {'sent': 0}
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    def worker(worker_id):
+        session = requests.Session()
+        rng = random.Random(args.seed + worker_id)
+        while True:
+            with lock:
+                if args.requests and counter['sent'] >= args.requests:
+                    return
+                counter['sent'] += 1
+            if deadline and time.perf_counter() >= deadline:
+                return
+            result = send_chat(session, url, rng.choice(questions), args.stream, args.timeout,
+                               time.perf_counter(), **request_options(args))
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_open_loop(args, url, questions):
+    """Arrivées de Poisson à `rate` req/s, servies par au plus `concurrency` clients"""
+    rng = random.Random(args.seed)
+    local = threading.local()
+    futures = []
+
+    def task(message, scheduled_at):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        return send_chat(local.session, url, message, args.stream, args.timeout, scheduled_at,
+                         **request_options(args))
+
+    start = time.perf_counter()
+    next_arrival = start
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        while True:
+            if args.requests and len(futures) >= args.requests:
+                break
+            if args.duration and next_arrival - start >= args.duration:
+                break
+            delay = next_arrival - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(task, rng.choice(questions), next_arrival))
+            next_arrival += rng.expovariate(args.rate)
+
+    return [future.result() for future in futures]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Test de charge de /api/chat")
+    parser.add_argument("--url", default="http://localhost:5000", help="URL du serveur Flask")
+    parser.add_argument("--concurrency", type=int, default=4, help="Clients simultanés (ou taille du pool en mode --rate)")
+    parser.add_argument("--rate", type=float, help="Débit d'arrivée (req/s) - active la boucle ouverte")
+    parser.add_argument("--requests", type=int, help="Nombre total de requêtes")
+    parser.add_argument("--duration", type=float, help="Durée du test en secondes")
+    parser.add_argument("--stream", action="store_true", help="Demande une réponse en streaming (si disponible)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Contourne le cache de réponses du serveur (mesure la génération)")
+    parser.add_argument("--prompt-baseline", action="store_true",
+                        help="Rejoue la charge sans cache de prompt et compare les tokens évalués")
+    parser.add_argument("--questions", default=str(DEFAULT_QUESTIONS), help="Fichier JSON des questions")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Écrit le rapport JSON dans ce fichier (sinon sur stdout)")
+    args = parser.parse_args()
+    if not args.requests and not args.duration:
+        args.requests = 50
+    return args
+
+
+def run(args, url, questions):
+    if args.rate:
+        return run_open_loop(args, url, questions)
+    return run_closed_loop(args, url, questions)
+
+
+def mean_prompt_tokens(results):
+    """Moyenne des prompt_eval_count (réponses générées, hors cache de réponses)"""
+    counts = [r['prompt_tokens'] for r in results if not r['error'] and r['prompt_tokens']]
+    return round(statistics.mean(counts), 1) if counts else None
+
+
+def main():
+    args = parse_args()
+    url = args.url.rstrip("/") + "/api/chat"
+    questions = load_questions(args.questions)
+
+    mode = f"boucle ouverte {args.rate} req/s" if args.rate else f"boucle fermée x{args.concurrency}"
+    log(f"🚀 Charge sur {url} ({mode}, stream={args.stream})...")
+
+    start = time.perf_counter()
+    results = run(args, url, questions)
+    elapsed = time.perf_counter() - start
+
+    baseline = None
+    if args.prompt_baseline:
+        # Même charge (même graine), prompt entier évalué; cache de réponses
+        # contourné, sinon rempli par la première passe
+        log("🔁 Seconde passe sans cache de prompt (base de comparaison)...")
+        baseline = run(argparse.Namespace(**dict(vars(args), no_cache=True, no_prompt_cache=True)), url, questions)
+
+    ok = [r for r in results if not r['error']]
+    errors = {}
+    for r in results:
+        if r['error']:
+            errors[r['error']] = errors.get(r['error'], 0) + 1
+
+    report = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'config': {
+            'url': url,
+            'mode': 'open' if args.rate else 'closed',
+            'rate': args.rate,
+            'concurrency': args.concurrency,
+            'stream': args.stream,
+            'answer_cache': not args.no_cache,
+            'requests': args.requests,
+            'duration': args.duration
+        },
+        'elapsed_s': round(elapsed, 2),
+        'requests': len(results),
+        'succeeded': len(ok),
+        'error_rate': round(1 - len(ok) / len(results), 4) if results else 0.0,
+        'errors': errors,
+        'throughput_rps': round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        'cached': sum(1 for r in ok if r['cached']),
+        'cached_share': round(sum(1 for r in ok if r['cached']) / len(ok), 4) if ok else 0.0,
+        'prompt_tokens_mean': mean_prompt_tokens(results),
+        'ttft_ms': summarize([r['ttft_ms'] for r in ok if r['ttft_ms'] is not None]),
+        'latency_ms': summarize([r['latency_ms'] for r in ok])
+    }
+    if baseline is not None:
+        uncached = mean_prompt_tokens(baseline)
+        report['prompt_baseline'] = {
+            'prompt_tokens_mean': uncached,
+            'errors': sum(1 for r in baseline if r['error']),
+            'ttft_ms': summarize([r['ttft_ms'] for r in baseline if not r['error'] and r['ttft_ms'] is not None]),
+            'prompt_eval_saved_ratio': round(
+                1 - report['prompt_tokens_mean'] / uncached, 4
+            ) if uncached and report['prompt_tokens_mean'] else None
+        }
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        log(f"📄 Rapport écrit dans {args.output}")
+    else:
+        print(output)
+
+    latency = report['latency_ms'] or {}
+    log(f"📊 {report['succeeded']}/{report['requests']} OK, {report['throughput_rps']} req/s, "
+        f"p50={latency.get('p50')}ms p99={latency.get('p99')}ms, erreurs={errors}")
+    if report['cached']:
+        log(f"⚡ {report['cached_share']:.0%} des réponses servies par le cache "
+            f"(--no-cache pour mesurer la génération)")
+
+
+if __name__ == "__main__":
+    main()
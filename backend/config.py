@@ -0,0 +1,105 @@
+"""
+Configuration du backend (variables d'environnement ou fichier .env)
+"""
+
+import os
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+def _hosts(value):
+    """Liste d'URL séparées par des virgules"""
+    return [host.strip().rstrip("/") for host in value.split(",") if host.strip()]
+
+
+# Serveur Ollama par défaut, et pools de serveurs pour la génération et
+# pour les embeddings (URL séparées par des virgules, défaut: OLLAMA_HOST)
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+OLLAMA_CHAT_HOSTS = _hosts(os.getenv("OLLAMA_CHAT_HOSTS", "")) or [OLLAMA_HOST]
+OLLAMA_EMBED_HOSTS = _hosts(os.getenv("OLLAMA_EMBED_HOSTS", "")) or [OLLAMA_HOST]
+
+# Embedding des requêtes doublé sur un second serveur s'il n'a pas répondu
+# après ce délai (millisecondes, 0 = désactivé)
+EMBED_HEDGE_MS = float(os.getenv("EMBED_HEDGE_MS", "0"))
+
+# Modèle texte rapide pour les questions sans image (RAG)
+CHAT_MODEL = os.getenv("CHAT_MODEL", "llama3.2")
+
+# Modèle vision, réservé aux requêtes avec image
+VISION_MODEL = os.getenv("VISION_MODEL", "llava:latest")
+
+# Durée de validité de l'inventaire des modèles (/api/tags) en secondes
+MODEL_INVENTORY_TTL = float(os.getenv("MODEL_INVENTORY_TTL", "30"))
+
+# Modèle d'embedding (préchargé au démarrage)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+
+
+def _keep_alive(value):
+    """keep_alive Ollama: durée ("30m", "24h") ou nombre de secondes (-1 = permanent)"""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+# Durée de maintien en mémoire des modèles côté Ollama
+OLLAMA_KEEP_ALIVE = _keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
+
+# Intervalle de vérification des modèles chargés (tâche de fond), en secondes
+WARMUP_REFRESH_INTERVAL = float(os.getenv("WARMUP_REFRESH_INTERVAL", "60"))
+
+# Fenêtre de contexte et sortie réservée pour la génération (options Ollama)
+NUM_CTX = int(os.getenv("NUM_CTX", "2048"))
+NUM_PREDICT = int(os.getenv("NUM_PREDICT", "512"))
+
+# Journal des conversations: écriture différée par lots, fsync "always",
+# "interval" ou "never"
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "64"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "1.0"))
+LOG_FSYNC = os.getenv("LOG_FSYNC", "interval")
+
+# Stockage du journal des conversations: "jsonl" (conversations.json) ou
+# "sqlite" (conversations.db, WAL, import automatique du JSONL existant)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "jsonl")
+
+# Rotation du journal JSONL en segments gzip: taille (octets) et âge
+# (secondes, 0 = pas de rotation par âge)
+LOG_ROTATE_BYTES = int(os.getenv("LOG_ROTATE_BYTES", str(16 * 1024 * 1024)))
+LOG_ROTATE_SECONDS = float(os.getenv("LOG_ROTATE_SECONDS", "604800"))
+
+# Cache des réponses aux premières questions d'une conversation (secondes,
+# 0 = désactivé) et préchauffage au démarrage depuis les questions
+# fréquentes du journal (nombre de questions, budget en secondes, période
+# minée en jours)
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "256"))
+CACHE_WARMUP_QUESTIONS = int(os.getenv("CACHE_WARMUP_QUESTIONS", "20"))
+CACHE_WARMUP_BUDGET = float(os.getenv("CACHE_WARMUP_BUDGET", "120"))
+CACHE_WARMUP_DAYS = float(os.getenv("CACHE_WARMUP_DAYS", "30"))
+
+# Rappel sémantique des conversations passées: au plus RECALL_MAX_RESULTS
+# paires question/réponse (0 = désactivé) de similarité >= RECALL_MIN_SCORE
+# ajoutées au contexte du prompt
+RECALL_MAX_RESULTS = int(os.getenv("RECALL_MAX_RESULTS", "2"))
+RECALL_MIN_SCORE = float(os.getenv("RECALL_MIN_SCORE", "0.85"))
+
+# Résumé glissant des sessions longues: tours sortis de la fenêtre par
+# résumé (0 = désactivé) et longueur maximale du résumé en tokens
+SUMMARY_BATCH_TURNS = int(os.getenv("SUMMARY_BATCH_TURNS", "3"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_TOKENS", "200"))
+
+# Disjoncteur de chaque serveur Ollama: échecs consécutifs avant
+# ouverture, puis intervalle (secondes) entre deux sondes de fond
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "15"))
+
+# Images envoyées à llava: côté le plus long après réduction (pixels),
+# taille maximale acceptée (octets, avant base64) et qualité JPEG du
+# réencodage
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", "672"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
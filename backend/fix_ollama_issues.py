@@ -10,6 +10,8 @@ import requests
 import sys
 import os
 
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+
 def print_step(message, status="INFO"):
     symbols = {"INFO": "ℹ️", "OK": "✅", "ERROR": "❌", "WARNING": "⚠️"}
     print(f"{symbols.get(status)} {message}")
@@ -91,7 +93,7 @@ def start_ollama():
         # Vérifier que le service répond
         for attempt in range(5):
             try:
-                response = requests.get("http://localhost:11434/api/version", timeout=3)
+                response = requests.get(f"{OLLAMA_HOST}/api/version", timeout=3)
                 if response.status_code == 200:
                     version_info = response.json()
                     print_step(f"Ollama démarré - Version: {version_info.get('version', 'N/A')}", "OK")
@@ -115,7 +117,7 @@ def check_llava_model():
     print_step("Vérification du modèle LLaVA", "INFO")
     
     try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=10)
+        response = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=10)
         if response.status_code == 200:
             data = response.json()
             models = data.get('models', [])
@@ -166,7 +168,7 @@ def test_llava_generation():
     
     try:
         # Récupérer le premier modèle LLaVA disponible
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
+        response = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=5)
         data = response.json()
         models = [m['name'] for m in data.get('models', []) if 'llava' in m['name'].lower()]
         
@@ -185,7 +187,7 @@ def test_llava_generation():
         }
         
         response = requests.post(
-            "http://localhost:11434/api/chat",
+            f"{OLLAMA_HOST}/api/chat",
             json=payload,
             timeout=20
         )
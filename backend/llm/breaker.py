@@ -0,0 +1,159 @@
+import threading
+import time
+
+import requests
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Appel refusé sans contacter le serveur: le circuit est ouvert"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} indisponible (circuit ouvert, nouvel essai dans {retry_after:.0f} s)")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Disjoncteur autour des appels à un serveur (Ollama)
+
+    Après `failure_threshold` échecs consécutifs (connexion refusée, timeout,
+    HTTP 5xx), le circuit s'ouvre: les appels échouent immédiatement avec
+    CircuitOpenError au lieu d'attendre leurs timeouts. Un thread de fond
+    sonde alors le serveur (`probe`) toutes les `reset_timeout` secondes
+    (état half_open pendant la sonde) et referme le circuit dès qu'elle
+    réussit; aucune requête utilisateur ne sert de sonde.
+    """
+
+    def __init__(self, name: str, probe, failure_threshold: int = 3, reset_timeout: float = 15.0):
+        self.name = name
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._failures = 0
+        self._opened_at = None
+        self._prober = None
+        self._stats = {
+            'opens': 0,
+            'rejected': 0,
+            'failures': 0,
+            'probes': 0,
+            'last_error': None,
+            'last_opened_at': None,
+            'last_closed_at': None
+        }
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def is_open(self) -> bool:
+        return self.state != STATE_CLOSED
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - time.time())
+
+    def check(self):
+        """Lève CircuitOpenError si le circuit n'est pas fermé"""
+        with self._lock:
+            if self._state == STATE_CLOSED:
+                return
+            self._stats['rejected'] += 1
+        raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self, error):
+        with self._lock:
+            self._failures += 1
+            self._stats['failures'] += 1
+            self._stats['last_error'] = str(error)[:200]
+            if self._state != STATE_CLOSED or self._failures < self.failure_threshold:
+                return
+            self._open()
+        print(f"🔌 Circuit {self.name} ouvert après {self.failure_threshold} échecs: {error}")
+
+    def _open(self):
+        self._state = STATE_OPEN
+        self._opened_at = time.time()
+        self._stats['opens'] += 1
+        self._stats['last_opened_at'] = self._opened_at
+        if not (self._prober and self._prober.is_alive()):
+            self._prober = threading.Thread(target=self._probe_loop, daemon=True, name=f"{self.name}-probe")
+            self._prober.start()
+
+    def _probe_loop(self):
+        while True:
+            time.sleep(self.retry_after())
+            with self._lock:
+                self._state = STATE_HALF_OPEN
+                self._stats['probes'] += 1
+            try:
+                self.probe()
+            except Exception as e:
+                with self._lock:
+                    self._state = STATE_OPEN
+                    self._opened_at = time.time()
+                    self._stats['last_error'] = str(e)[:200]
+                continue
+            with self._lock:
+                self._state = STATE_CLOSED
+                self._failures = 0
+                self._opened_at = None
+                self._stats['last_closed_at'] = time.time()
+            print(f"🔌 Circuit {self.name} refermé (serveur de nouveau joignable)")
+            return
+
+    def call(self, fn, *args, **kwargs):
+        """Appelle fn via le disjoncteur: toute exception compte comme un échec"""
+        self.check()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """requests.request via le disjoncteur (même signature)
+
+        Seuls les échecs du serveur comptent: connexion, timeout et HTTP 5xx.
+        Les réponses 4xx (modèle absent, requête invalide) sont retournées
+        telles quelles.
+        """
+        self.check()
+        try:
+            response = requests.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            self.record_failure(e)
+            raise
+        if response.status_code >= 500:
+            self.record_failure(f"HTTP {response.status_code}")
+        else:
+            self.record_success()
+        return response
+
+    def stats(self) -> dict:
+        retry_after = self.retry_after()
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'failure_threshold': self.failure_threshold,
+                'reset_timeout': self.reset_timeout,
+                'retry_after': round(retry_after, 1) if self._state != STATE_CLOSED else None
+            })
+        return stats
+
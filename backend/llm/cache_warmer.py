@@ -0,0 +1,120 @@
+import threading
+import time
+
+
+class CacheWarmer:
+    """Préchauffage des caches à partir des questions fréquentes du journal
+
+    En tâche de fond, après l'initialisation du RAG: la recherche de chaque
+    question est d'abord mise en cache (peu coûteux), puis les réponses
+    sont générées dans l'ordre de fréquence tant que le budget de temps le
+    permet. Une génération en cours n'est pas interrompue: le budget est
+    vérifié avant chaque étape.
+    """
+
+    def __init__(self, budget_seconds: float = 120.0, max_questions: int = 20):
+        self.budget_seconds = budget_seconds
+        self.max_questions = max_questions
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._report = self._empty_report()
+
+    @staticmethod
+    def _empty_report() -> dict:
+        return {
+            'state': 'idle',
+            'started_at': None,
+            'elapsed_s': 0.0,
+            'mined': 0,
+            'retrieval_warmed': 0,
+            'answers_warmed': 0,
+            'skipped': 0,
+            'errors': 0,
+            'budget_exhausted': False,
+            'questions': []
+        }
+
+    def start(self, mine, retrieve, answer) -> bool:
+        """Lance le préchauffage: mine(n) -> [(question, occurrences)],
+        retrieve(question) et answer(question) alimentent les caches
+        (answer=None: recherches seulement)"""
+        if self.max_questions <= 0 or self.budget_seconds <= 0:
+            return False
+        self.stop()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(mine, retrieve, answer, self._stop),
+            daemon=True,
+            name="cache-warmer"
+        )
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: float = 1.0):
+        self._stop.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self, mine, retrieve, answer, stop):
+        start = time.time()
+        deadline = start + self.budget_seconds
+        report = self._empty_report()
+        report.update({'state': 'running', 'started_at': start})
+        with self._lock:
+            self._report = report
+
+        def over_budget():
+            return stop.is_set() or time.time() >= deadline
+
+        try:
+            mined = mine(self.max_questions)
+        except Exception as e:
+            print(f"⚠️ Préchauffage des caches impossible (journal): {e}")
+            mined = []
+            report['errors'] += 1
+
+        items = [{'question': question, 'count': count, 'retrieval_ms': None, 'answer_ms': None}
+                 for question, count in mined[:self.max_questions]]
+        with self._lock:
+            report['mined'] = len(items)
+            report['questions'] = items
+
+        last_field = 'answer_ms' if answer is not None else 'retrieval_ms'
+        for step, field, counter in ((retrieve, 'retrieval_ms', 'retrieval_warmed'),
+                                     (answer, 'answer_ms', 'answers_warmed')):
+            if step is None:
+                continue
+            for item in items:
+                if over_budget():
+                    break
+                step_start = time.time()
+                try:
+                    step(item['question'])
+                except Exception as e:
+                    print(f"⚠️ Préchauffage de '{item['question'][:40]}': {e}")
+                    with self._lock:
+                        report['errors'] += 1
+                    continue
+                with self._lock:
+                    item[field] = round((time.time() - step_start) * 1000, 1)
+                    report[counter] += 1
+
+        with self._lock:
+            report['skipped'] = sum(1 for item in items if item[last_field] is None)
+            report['budget_exhausted'] = time.time() >= deadline
+            report['elapsed_s'] = round(time.time() - start, 2)
+            report['state'] = 'cancelled' if stop.is_set() else 'done'
+        print(f"🔥 Caches préchauffés: {report['retrieval_warmed']} recherches, "
+              f"{report['answers_warmed']}/{report['mined']} réponses en {report['elapsed_s']} s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            report = dict(self._report)
+            report['questions'] = [dict(item) for item in self._report['questions']]
+        if report['state'] == 'running':
+            report['elapsed_s'] = round(time.time() - report['started_at'], 2)
+        report['budget_seconds'] = self.budget_seconds
+        report['max_questions'] = self.max_questions
+        return report
@@ -0,0 +1,116 @@
+import base64
+import binascii
+import io
+import time
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Résolution utile de llava: 336 px par tuile, au plus 2x2 tuiles (llava 1.6)
+MAX_SIDE = 672
+MAX_BYTES = 10 * 1024 * 1024
+MAX_PIXELS = 50_000_000
+JPEG_QUALITY = 85
+# Métadonnées retirées au réencodage (orientation appliquée aux pixels)
+METADATA_KEYS = ("exif", "icc_profile", "xmp", "XML:com.adobe.xmp", "comment")
+EXIF_ORIENTATION = 0x0112
+
+
+class ImageError(ValueError):
+    """Image refusée (`status`: code HTTP à renvoyer)"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class ImagePreprocessor:
+    """Préparation des images envoyées à llava
+
+    L'image base64 du client est décodée une seule fois, réduite à la
+    résolution utile du modèle (`max_side`, côté le plus long), orientée
+    selon son EXIF puis réencodée en JPEG sans métadonnées; une image déjà
+    assez petite, sans métadonnées ni rotation, dont le réencodage ne gagne
+    rien est transmise telle quelle (pas de seconde compression avec
+    perte). Les images trop
+    lourdes (`max_bytes`) ou trop grandes (`max_pixels`, bombes de
+    décompression) sont refusées avant décodage complet.
+
+    Sans Pillow, seules les limites de taille s'appliquent et l'image est
+    transmise telle quelle.
+    """
+
+    def __init__(self, max_side: int = MAX_SIDE, max_bytes: int = MAX_BYTES,
+                 max_pixels: int = MAX_PIXELS, quality: int = JPEG_QUALITY):
+        self.max_side = max_side
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.quality = quality
+
+    def _decode(self, image_b64: str) -> bytes:
+        # Préfixe data URL éventuel ("data:image/png;base64,...")
+        if image_b64.startswith("data:"):
+            image_b64 = image_b64.partition(",")[2]
+        if len(image_b64) * 3 // 4 > self.max_bytes:
+            raise ImageError(f"Image trop volumineuse (max {self.max_bytes // (1024 * 1024)} Mo)", 413)
+        try:
+            return base64.b64decode(image_b64, validate=True)
+        except (binascii.Error, ValueError):
+            raise ImageError("Image invalide (base64 attendu)")
+
+    def process(self, image_b64: str):
+        """Retourne (image base64 à envoyer à Ollama, rapport)
+
+        Rapport: {'processed', 'bytes_in', 'bytes_out', 'bytes_saved',
+        'size_in', 'size_out', 'ms'}; processed vaut False si l'image
+        d'origine est transmise. Lève ImageError si l'image est refusée.
+        """
+        start = time.time()
+        raw = self._decode(image_b64)
+        report = {'processed': False, 'bytes_in': len(raw), 'bytes_out': len(raw), 'bytes_saved': 0,
+                  'size_in': None, 'size_out': None, 'ms': None}
+        if not PIL_AVAILABLE:
+            report['ms'] = round((time.time() - start) * 1000, 1)
+            return base64.b64encode(raw).decode("ascii"), report
+
+        try:
+            image = Image.open(io.BytesIO(raw))
+            width, height = image.size
+            if width * height > self.max_pixels:
+                raise ImageError(f"Image trop grande ({width}x{height} pixels)", 413)
+            report['size_in'] = [width, height]
+            has_metadata = (any(image.info.get(key) for key in METADATA_KEYS)
+                            or image.getexif().get(EXIF_ORIENTATION, 1) != 1)
+
+            # JPEG: décodage directement à échelle réduite (1/2, 1/4, 1/8)
+            image.draft("RGB", (self.max_side, self.max_side))
+            image = ImageOps.exif_transpose(image)
+            if image.mode != "RGB":
+                rgba = image.convert("RGBA")
+                image = Image.new("RGB", rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.getchannel("A"))
+            image.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=self.quality, optimize=True)
+        except ImageError:
+            raise
+        except Exception as e:
+            raise ImageError(f"Image illisible: {e}")
+
+        data = output.getvalue()
+        if max(width, height) <= self.max_side and len(data) >= len(raw) and not has_metadata:
+            report.update({'size_out': [width, height], 'ms': round((time.time() - start) * 1000, 1)})
+            return base64.b64encode(raw).decode("ascii"), report
+
+        report.update({
+            'processed': True,
+            'bytes_out': len(data),
+            'bytes_saved': len(raw) - len(data),
+            'size_out': list(image.size),
+            'ms': round((time.time() - start) * 1000, 1)
+        })
+        return base64.b64encode(data).decode("ascii"), report
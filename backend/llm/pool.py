@@ -0,0 +1,370 @@
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import itertools
+import math
+import threading
+import time
+
+import requests
+
+from .breaker import CircuitBreaker, CircuitOpenError, STATE_CLOSED
+from .warmup import _canonical
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
+# Requêtes en cours d'écart tolérées pour rester sur le backend d'une
+# session (cache de prompt d'Ollama) plutôt que sur le moins chargé
+AFFINITY_SLACK = 1
+
+
+class Backend:
+    """Un serveur Ollama du pool: disjoncteur, requêtes en cours, inventaire"""
+
+    def __init__(self, url: str, failure_threshold: int = 3, reset_timeout: float = 15.0,
+                 inventory_ttl: float = 30.0):
+        self.url = url.rstrip("/")
+        self.inventory_ttl = inventory_ttl
+        self.breaker = CircuitBreaker(
+            f"ollama {self.url}",
+            probe=self._probe,
+            failure_threshold=failure_threshold,
+            reset_timeout=reset_timeout
+        )
+        self._lock = threading.Lock()
+        self.outstanding = 0
+        self.requests = 0
+        self._models = None
+        self._fetched_at = 0.0
+
+    def _probe(self):
+        response = requests.get(f"{self.url}/api/version", timeout=2)
+        response.raise_for_status()
+
+    @property
+    def healthy(self) -> bool:
+        return self.breaker.state == STATE_CLOSED
+
+    def _release(self):
+        with self._lock:
+            self.outstanding -= 1
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Requête vers ce serveur; la réponse porte son URL (`response.backend`)
+
+        Avec stream=True, la requête reste comptée en cours jusqu'à la
+        fermeture de la réponse (fin de lecture ou annulation).
+        """
+        with self._lock:
+            self.outstanding += 1
+            self.requests += 1
+        try:
+            response = self.breaker.request(method, f"{self.url}{path}", **kwargs)
+        except Exception:
+            self._release()
+            raise
+        response.backend = self.url
+        if not kwargs.get("stream"):
+            self._release()
+            return response
+
+        close = response.close
+        released = threading.Event()
+
+        def close_and_release():
+            close()
+            if not released.is_set():
+                released.set()
+                self._release()
+
+        response.close = close_and_release
+        return response
+
+    def models(self, force: bool = False) -> list:
+        """Modèles installés sur ce serveur (inventaire mis en cache)"""
+        with self._lock:
+            if not force and self._models is not None and time.time() - self._fetched_at < self.inventory_ttl:
+                return list(self._models)
+
+        response = self.request("GET", "/api/tags", timeout=5)
+        if response.status_code != 200:
+            raise Exception(f"Ollama API HTTP {response.status_code}")
+        models = [model.get('name', '') for model in response.json().get('models', [])]
+        with self._lock:
+            self._models = models
+            self._fetched_at = time.time()
+        return list(models)
+
+    def has_model(self, model: str) -> bool:
+        try:
+            return _canonical(model) in {_canonical(name) for name in self.models()}
+        except Exception:
+            return False
+
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                'outstanding': self.outstanding,
+                'requests': self.requests,
+                'models': list(self._models) if self._models is not None else None
+            }
+        stats['breaker'] = self.breaker.stats()
+        return stats
+
+
+def _close_response(future):
+    """Ferme la réponse d'une requête doublée perdante"""
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class BackendPool:
+    """Pool de serveurs Ollama, répartition au moins de requêtes en cours
+
+    Chaque requête va au backend sain (disjoncteur fermé) qui a le modèle
+    demandé et le moins de requêtes en cours; à égalité, les backends sont
+    pris à tour de rôle. Avec `affinity` (id de session), la requête reste
+    sur le backend précédent tant qu'il n'a pas plus de AFFINITY_SLACK
+    requêtes d'avance, pour profiter de son cache de prompt. Une connexion
+    refusée est retentée une fois sur un autre backend; quand aucun backend
+    n'est sain, CircuitOpenError est levée immédiatement.
+    """
+
+    def __init__(self, name: str, urls: list, failure_threshold: int = 3, reset_timeout: float = 15.0,
+                 inventory_ttl: float = 30.0, max_affinities: int = 1000, hedge_workers: int = 8):
+        self.name = name
+        self.backends = [
+            Backend(url, failure_threshold, reset_timeout, inventory_ttl)
+            for url in dict.fromkeys(u.rstrip("/") for u in urls if u)
+        ]
+        if not self.backends:
+            raise ValueError(f"Pool {name}: aucun serveur Ollama configuré")
+        self.max_affinities = max_affinities
+        self._affinity = OrderedDict()  # clé -> url
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix=f"{name}-hedge")
+        self._stats = {'rejected': 0, 'retries': 0, 'hedged': 0, 'hedge_wins': 0, 'affinity_hits': 0}
+
+    @property
+    def url(self) -> str:
+        """Premier serveur du pool (diagnostics)"""
+        return self.backends[0].url
+
+    def healthy(self) -> list:
+        return [backend for backend in self.backends if backend.healthy]
+
+    def _unavailable(self) -> CircuitOpenError:
+        """Erreur levée quand aucun backend n'est sain (appel refusé)"""
+        with self._lock:
+            self._stats['rejected'] += 1
+        return CircuitOpenError(f"Ollama ({self.name})", self.retry_after())
+
+    def check(self):
+        """Lève CircuitOpenError si aucun backend n'est sain"""
+        if not self.healthy():
+            raise self._unavailable()
+
+    def retry_after(self) -> float:
+        """Délai avant la prochaine sonde du premier backend à revenir"""
+        if self.healthy():
+            return 0.0
+        return min(backend.breaker.retry_after() for backend in self.backends)
+
+    def serving(self, model: str = None, exclude=()) -> list:
+        """Backends sains ayant `model` (tous les sains si aucun ne l'a)"""
+        candidates = [backend for backend in self.healthy() if backend not in exclude]
+        if model:
+            candidates = [backend for backend in candidates if backend.has_model(model)] or candidates
+        return candidates
+
+    def choose(self, model: str = None, exclude=(), affinity: str = None) -> Backend:
+        candidates = self.serving(model, exclude)
+        if not candidates:
+            raise self._unavailable()
+
+        start = next(self._turn) % len(candidates)
+        ordered = candidates[start:] + candidates[:start]
+        best = min(ordered, key=lambda backend: backend.outstanding)
+
+        if affinity:
+            with self._lock:
+                preferred_url = self._affinity.get(affinity)
+                preferred = next((b for b in candidates if b.url == preferred_url), None)
+                if preferred and preferred.outstanding <= best.outstanding + AFFINITY_SLACK:
+                    best = preferred
+                    self._stats['affinity_hits'] += 1
+                self._affinity[affinity] = best.url
+                self._affinity.move_to_end(affinity)
+                while len(self._affinity) > self.max_affinities:
+                    self._affinity.popitem(last=False)
+        return best
+
+    def request(self, method: str, path: str, model: str = None, affinity: str = None,
+                **kwargs) -> requests.Response:
+        """requests.request vers le backend choisi (`path`: "/api/chat", ...)"""
+        backend = self.choose(model, affinity=affinity)
+        try:
+            return backend.request(method, path, **kwargs)
+        except requests.exceptions.ConnectionError:
+            # Rien n'a été traité: on peut réessayer ailleurs
+            if not any(other is not backend for other in self.healthy()):
+                raise
+            with self._lock:
+                self._stats['retries'] += 1
+            return self.choose(model, exclude=(backend,)).request(method, path, **kwargs)
+
+    def hedged_request(self, method: str, path: str, hedge_after: float, model: str = None,
+                       **kwargs) -> requests.Response:
+        """Requête idempotente doublée sur un second backend si la première
+        n'a pas répondu après `hedge_after` secondes (ou a échoué)
+
+        La première réponse valide l'emporte; l'autre requête se termine en
+        arrière-plan et sa réponse est fermée dès son arrivée (connexion
+        rendue, requête décomptée de son backend).
+        """
+        first = self.choose(model)
+        if hedge_after <= 0 or len(self.healthy()) < 2:
+            return first.request(method, path, **kwargs)
+
+        pending = {self._executor.submit(first.request, method, path, **kwargs): first}
+        used = [first]
+        hedged = False
+        last_error, last_response = None, None
+        while pending:
+            done, _ = wait(pending, timeout=None if hedged else hedge_after, return_when=FIRST_COMPLETED)
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if response.status_code < 500:
+                    if backend is not first:
+                        with self._lock:
+                            self._stats['hedge_wins'] += 1
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    if last_response is not None:
+                        last_response.close()
+                    return response
+                if last_response is not None:
+                    last_response.close()
+                last_response = response
+            if not hedged:
+                hedged = True
+                try:
+                    second = self.choose(model, exclude=used)
+                except CircuitOpenError:
+                    continue
+                used.append(second)
+                pending[self._executor.submit(second.request, method, path, **kwargs)] = second
+                with self._lock:
+                    self._stats['hedged'] += 1
+        if last_response is not None:
+            return last_response
+        raise last_error
+
+    def record_failure(self, url: str, error):
+        """Échec constaté après la réponse HTTP (génération coupée en streaming)"""
+        for backend in self.backends:
+            if backend.url == url:
+                backend.breaker.record_failure(error)
+
+    def models(self, force: bool = False) -> list:
+        """Union des inventaires des backends sains"""
+        healthy = self.healthy()
+        if not healthy:
+            raise self._unavailable()
+        models, errors = [], []
+        for backend in healthy:
+            try:
+                models.extend(backend.models(force))
+            except Exception as e:
+                errors.append(e)
+        if errors and len(errors) == len(healthy):
+            raise errors[-1]
+        return list(dict.fromkeys(models))
+
+    def invalidate(self):
+        for backend in self.backends:
+            backend.invalidate()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['affinities'] = len(self._affinity)
+        stats['healthy'] = len(self.healthy())
+        stats['backends'] = {backend.url: backend.stats() for backend in self.backends}
+        return stats
+
+
+class PoolEmbeddings(Embeddings):
+    """Embeddings Ollama (/api/embed) répartis sur un BackendPool
+
+    Remplace OllamaEmbeddings (mêmes vecteurs, même modèle). Un serveur
+    Ollama antérieur à 0.3 (sans /api/embed, réponse 404) est interrogé
+    via /api/embeddings, un texte par appel, vecteurs normalisés comme
+    ceux de /api/embed. Les requêtes de recherche (embed_query,
+    embed_queries) sont doublées sur un second backend après
+    `hedge_ms` millisecondes (0 = désactivé); les lots d'ingestion
+    (embed_documents) ne le sont pas.
+    """
+
+    def __init__(self, pool: BackendPool, model: str, hedge_ms: float = 0.0,
+                 keep_alive=None, timeout: float = 120.0):
+        self.pool = pool
+        self.model = model
+        self.hedge_ms = hedge_ms
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+
+    def _embed(self, texts: list, hedge: bool) -> list:
+        payload = {"model": self.model, "input": texts}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if hedge and self.hedge_ms > 0:
+            response = self.pool.hedged_request(
+                "POST", "/api/embed", self.hedge_ms / 1000, model=self.model,
+                json=payload, timeout=self.timeout
+            )
+        else:
+            response = self.pool.request("POST", "/api/embed", model=self.model, json=payload, timeout=self.timeout)
+        if response.status_code == 404:
+            # Ollama < 0.3 (ou modèle absent: l'ancienne API le signalera)
+            return [self._embed_legacy(text) for text in texts]
+        if response.status_code != 200:
+            raise Exception(f"Ollama embed HTTP {response.status_code}: {response.text[:200]}")
+        return response.json()["embeddings"]
+
+    def _embed_legacy(self, text: str) -> list:
+        payload = {"model": self.model, "prompt": text}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        response = self.pool.request("POST", "/api/embeddings", model=self.model, json=payload, timeout=self.timeout)
+        if response.status_code != 200:
+            raise Exception(f"Ollama embeddings HTTP {response.status_code}: {response.text[:200]}")
+        vector = response.json()["embedding"]
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed_documents(self, texts: list) -> list:
+        if not texts:
+            return []
+        return self._embed(list(texts), hedge=False)
+
+    def embed_query(self, text: str) -> list:
+        return self._embed([text], hedge=True)[0]
+
+    def embed_queries(self, texts: list) -> list:
+        """Plusieurs requêtes de recherche en un appel (doublé comme embed_query)"""
+        if not texts:
+            return []
+        return self._embed(list(texts), hedge=True)
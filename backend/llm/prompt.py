@@ -0,0 +1,276 @@
+import re
+import threading
+
+# Estimation grossière pour du français (même valeur que rag.retriever)
+CHARS_PER_TOKEN = 3.5
+
+# Marge de sécurité pour le gabarit de chat du modèle (rôles, balises)
+TEMPLATE_OVERHEAD_TOKENS = 64
+
+# Préambule stable: identique d'une requête à l'autre pour que le cache de
+# prompt d'Ollama réutilise son évaluation (ne pas y mettre de date ni d'id)
+SYSTEM_PROMPT = (
+    "Tu es l'assistant de l'Université Moulay Ismaïl. Tu réponds en français, "
+    "de façon précise et concise, aux questions sur les formations, les "
+    "conditions d'accès et l'organisation des études. Quand un contexte issu "
+    "des documents est fourni avec la question, réponds en utilisant "
+    "prioritairement ces informations."
+)
+
+RAG_TEMPLATE = """Contexte basé sur les documents disponibles:
+{context}
+
+Question de l'utilisateur: {question}"""
+
+# Paire question/réponse passée, rappelée par similarité (memory.recall)
+RECALL_TEMPLATE = """Réponse déjà donnée à la question « {user} »:
+{bot}"""
+
+# Résumé glissant des tours anciens d'une session (memory.summarizer),
+# placé après le préambule: il ne change qu'à chaque nouveau résumé
+SUMMARY_TEMPLATE = """Résumé de la conversation précédente avec cet utilisateur:
+{summary}"""
+
+SUMMARY_INSTRUCTIONS = (
+    "Tu résumes une conversation entre un utilisateur et l'assistant de "
+    "l'Université Moulay Ismaïl. Intègre les nouveaux échanges au résumé "
+    "existant en quelques phrases: sujets abordés, filières concernées, "
+    "informations données et préférences de l'utilisateur. Réponds "
+    "uniquement avec le résumé, en français."
+)
+
+# Caractères gardés par réponse dans une demande de résumé
+SUMMARY_TURN_CHARS = 600
+
+CHUNK_SEPARATOR = "\n---\n"
+
+_SENTENCE_END = re.compile(r"[.!?;:]\s")
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    """Coupe `text` à `max_chars` caractères, si possible en fin de phrase"""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    ends = [m.end() for m in _SENTENCE_END.finditer(cut)]
+    if ends and ends[-1] > max_chars // 2:
+        return cut[:ends[-1]].rstrip()
+    return cut.rsplit(" ", 1)[0].rstrip() + "…"
+
+
+def summary_request(summary: str, turns: list, turn_chars: int = SUMMARY_TURN_CHARS) -> list:
+    """Messages demandant de fondre `turns` [(question, réponse)] dans `summary`"""
+    exchanges = "\n".join(
+        f"Utilisateur: {_truncate(user, turn_chars)}\nAssistant: {_truncate(bot, turn_chars)}"
+        for user, bot in turns
+    )
+    content = f"Résumé existant:\n{summary or '(aucun)'}\n\nNouveaux échanges:\n{exchanges}"
+    return [
+        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+        {"role": "user", "content": content}
+    ]
+
+
+class PromptBuilder:
+    """Assemblage du prompt dans la fenêtre de contexte du modèle
+
+    Les messages sont ordonnés du plus stable au plus variable: préambule
+    système, résumé des tours anciens, historique récent de la session, puis
+    contexte RAG et question. Le
+    préfixe commun avec la requête précédente de la session n'est alors pas
+    réévalué par Ollama (cache de prompt / KV).
+
+    Le budget d'entrée est num_ctx moins la sortie réservée (num_predict) et
+    une marge pour le gabarit. Les chunks RAG, déjà triés par pertinence,
+    sont ajoutés tant qu'ils tiennent; un chunk trop long est sauté au profit
+    des suivants, et le meilleur est tronqué plutôt qu'abandonné. L'historique
+    prend la place restante, en abandonnant d'abord les tours les plus anciens.
+
+    Les prompt_eval_count renvoyés par Ollama sont relevés pour comparer
+    l'estimation à la réalité et détecter les débordements; ils excluent le
+    préfixe réutilisé, dont l'économie se mesure contre des requêtes sans
+    cache de prompt (voir `uncached`).
+    """
+
+    def __init__(self, num_ctx: int = 2048, num_predict: int = 512,
+                 overhead_tokens: int = TEMPLATE_OVERHEAD_TOKENS,
+                 chars_per_token: float = CHARS_PER_TOKEN,
+                 system_prompt: str = SYSTEM_PROMPT):
+        self.num_ctx = num_ctx
+        self.num_predict = num_predict
+        self.overhead_tokens = overhead_tokens
+        self.chars_per_token = chars_per_token
+        self.system_prompt = system_prompt
+        self._lock = threading.Lock()
+        self._stats = {
+            'prompts': 0,
+            'chunks_used': 0,
+            'chunks_dropped': 0,
+            'chunks_truncated': 0,
+            'measured': 0,
+            'overflows': 0,
+            'history_turns_used': 0,
+            'history_turns_dropped': 0,
+            'summaries_used': 0,
+            'estimated_prompt_tokens': 0,
+            'evaluated_prompt_tokens': 0,
+            'uncached_measured': 0,
+            'uncached_evaluated_tokens': 0,
+            'last_estimated_tokens': None,
+            'last_prompt_eval_count': None
+        }
+
+    @property
+    def input_budget(self) -> int:
+        """Tokens disponibles pour le prompt (hors sortie réservée)"""
+        return max(0, self.num_ctx - self.num_predict - self.overhead_tokens)
+
+    def estimate(self, text: str) -> int:
+        if not text:
+            return 0
+        return int(len(text) / self.chars_per_token) + 1
+
+    def _pack_context(self, chunks: list, remaining: int):
+        """Chunks retenus dans `remaining` tokens: (textes, abandonnés, tronqué)"""
+        separator_tokens = self.estimate(CHUNK_SEPARATOR)
+        selected = []
+        dropped = 0
+        truncated = False
+        for text in chunks:
+            cost = self.estimate(text) + (separator_tokens if selected else 0)
+            if cost <= remaining:
+                selected.append(text)
+                remaining -= cost
+            elif not selected and remaining > 0:
+                # Le meilleur chunk ne tient pas entier: on en garde le début
+                text = _truncate(text, int(remaining * self.chars_per_token))
+                if text:
+                    selected.append(text)
+                    remaining -= self.estimate(text)
+                    truncated = True
+                else:
+                    dropped += 1
+            else:
+                dropped += 1
+        return selected, dropped, truncated
+
+    def _fit_history(self, history: list, remaining: int) -> list:
+        """Tours les plus récents de `history` ([(question, réponse)]) tenant dans `remaining`"""
+        kept = []
+        for user, assistant in reversed(history):
+            cost = self.estimate(user) + self.estimate(assistant)
+            if cost > remaining:
+                break
+            kept.append((user, assistant))
+            remaining -= cost
+        kept.reverse()
+        return kept
+
+    def build(self, question: str, chunks: list = None, history: list = None,
+              max_context_tokens: int = None, summary: str = None) -> dict:
+        """Construit les messages: préambule, résumé, historique, puis contexte et question
+
+        `chunks`: textes triés du plus au moins pertinent. `history`: tours
+        précédents [(question, réponse)], du plus ancien au plus récent.
+        `summary`: résumé des tours plus anciens, tronqué à un quart du budget.
+        `max_context_tokens` plafonne en plus la part du contexte RAG (moins
+        de prompt_eval). Retourne {'messages', 'content', 'estimated_tokens',
+        'prefix_tokens', 'chunks_used', 'chunks_dropped', 'truncated',
+        'history_turns', 'summary_used', 'budget'}.
+        """
+        budget = self.input_budget
+        system_messages = [{"role": "system", "content": self.system_prompt}]
+        if summary:
+            summary = _truncate(summary, int(budget / 4 * self.chars_per_token))
+            system_messages.append({"role": "system", "content": SUMMARY_TEMPLATE.format(summary=summary)})
+        system_tokens = sum(self.estimate(m["content"]) for m in system_messages)
+        base_tokens = self.estimate(RAG_TEMPLATE.format(context="", question=question))
+        remaining = budget - system_tokens - base_tokens
+
+        context_budget = remaining
+        if max_context_tokens is not None:
+            context_budget = min(context_budget, max_context_tokens)
+        selected, dropped, truncated = self._pack_context(chunks or [], context_budget)
+
+        if selected:
+            content = RAG_TEMPLATE.format(context=CHUNK_SEPARATOR.join(selected), question=question)
+        else:
+            content = question
+        remaining = budget - system_tokens - self.estimate(content)
+
+        history = history or []
+        kept = self._fit_history(history, remaining)
+
+        messages = list(system_messages)
+        for user, assistant in kept:
+            messages.append({"role": "user", "content": user})
+            messages.append({"role": "assistant", "content": assistant})
+        prefix_tokens = sum(self.estimate(m["content"]) for m in messages)
+        messages.append({"role": "user", "content": content})
+
+        plan = {
+            'messages': messages,
+            'content': content,
+            'estimated_tokens': prefix_tokens + self.estimate(content),
+            'prefix_tokens': prefix_tokens,
+            'chunks_used': len(selected),
+            'chunks_dropped': dropped,
+            'truncated': truncated,
+            'history_turns': len(kept),
+            'summary_used': bool(summary),
+            'budget': budget
+        }
+        with self._lock:
+            self._stats['prompts'] += 1
+            self._stats['chunks_used'] += len(selected)
+            self._stats['chunks_dropped'] += dropped
+            self._stats['chunks_truncated'] += int(truncated)
+            self._stats['history_turns_used'] += len(kept)
+            self._stats['history_turns_dropped'] += len(history) - len(kept)
+            self._stats['summaries_used'] += int(bool(summary))
+        return plan
+
+    def record_usage(self, estimated_tokens: int, prompt_eval_count: int, uncached: bool = False) -> dict:
+        """Enregistre le nombre de tokens du prompt évalués par Ollama
+
+        Quand le préfixe est déjà en cache, Ollama n'évalue (et ne compte
+        dans prompt_eval_count) que la partie nouvelle. `uncached`: requête
+        dont le cache de prompt a été contourné (prompt entier évalué), base
+        de comparaison réelle pour mesurer l'économie.
+
+        Retourne {'overflow'}: prompt qui empiète sur la sortie réservée
+        (réponse coupée ou début du prompt tronqué silencieusement par
+        Ollama).
+        """
+        if not prompt_eval_count:
+            return {'overflow': False}
+        overflow = max(prompt_eval_count, estimated_tokens) >= self.num_ctx - self.num_predict
+        with self._lock:
+            if uncached:
+                self._stats['uncached_measured'] += 1
+                self._stats['uncached_evaluated_tokens'] += prompt_eval_count
+            else:
+                self._stats['measured'] += 1
+                self._stats['estimated_prompt_tokens'] += estimated_tokens
+                self._stats['evaluated_prompt_tokens'] += prompt_eval_count
+            self._stats['overflows'] += int(overflow)
+            self._stats['last_estimated_tokens'] = estimated_tokens
+            self._stats['last_prompt_eval_count'] = prompt_eval_count
+        return {'overflow': overflow}
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'num_ctx': self.num_ctx,
+                'num_predict': self.num_predict,
+                'input_budget': self.input_budget,
+                'evaluated_tokens_mean': round(
+                    stats['evaluated_prompt_tokens'] / stats['measured'], 1
+                ) if stats['measured'] else None,
+                'uncached_evaluated_tokens_mean': round(
+                    stats['uncached_evaluated_tokens'] / stats['uncached_measured'], 1
+                ) if stats['uncached_measured'] else None,
+                'chars_per_token': round(self.chars_per_token, 3)
+            })
+        return stats
@@ -0,0 +1,87 @@
+# Priorités des modèles llava (du meilleur au moins bon)
+PREFERRED_LLAVA_MODELS = [
+    'llava:latest',
+    'llava:13b',
+    'llava:7b',
+    'llava:34b',
+    'llava'
+]
+
+ROUTE_TEXT = "text"
+ROUTE_VISION = "vision"
+
+
+def _matches(configured: str, available: str) -> bool:
+    """Compare deux noms de modèle ("llama3.2" équivaut à "llama3.2:latest")"""
+    configured = configured.lower()
+    available = available.lower()
+    if configured == available:
+        return True
+    return ":" not in configured and available == f"{configured}:latest"
+
+
+class ModelRouter:
+    """Choisit le modèle Ollama selon le type de requête
+
+    Les questions texte (RAG) vont vers un modèle texte rapide, les requêtes
+    avec image vers llava. L'inventaire vient du pool de génération
+    (BackendPool): union des modèles installés sur les serveurs sains, mis
+    en cache par serveur pour ne pas interroger /api/tags à chaque message.
+    """
+
+    def __init__(self, pool, chat_model: str, vision_model: str):
+        self.pool = pool
+        self.chat_model = chat_model
+        self.vision_model = vision_model
+
+    def available_models(self, force: bool = False) -> list:
+        """Noms des modèles installés sur au moins un serveur sain"""
+        return self.pool.models(force)
+
+    def invalidate(self):
+        self.pool.invalidate()
+
+    def _find(self, configured: str, models: list):
+        for available in models:
+            if _matches(configured, available):
+                return available
+        return None
+
+    def best_llava_model(self, models: list = None):
+        """Modèle vision configuré, sinon le meilleur llava installé"""
+        models = self.available_models() if models is None else models
+
+        configured = self._find(self.vision_model, models)
+        if configured:
+            return configured
+
+        for preferred in PREFERRED_LLAVA_MODELS:
+            found = self._find(preferred, models)
+            if found:
+                return found
+
+        # Fallback: n'importe quel modèle contenant "llava"
+        for available in models:
+            if 'llava' in available.lower():
+                return available
+        return None
+
+    def route(self, has_image: bool) -> dict:
+        """Retourne {'route', 'model', 'fallback'} pour une requête
+
+        Si le modèle texte n'est pas installé, les questions texte retombent
+        sur llava (plus lent, mais fonctionnel).
+        """
+        models = self.available_models()
+
+        if not has_image:
+            text_model = self._find(self.chat_model, models)
+            if text_model:
+                return {'route': ROUTE_TEXT, 'model': text_model, 'fallback': False}
+
+        vision_model = self.best_llava_model(models)
+        return {
+            'route': ROUTE_VISION if has_image else ROUTE_TEXT,
+            'model': vision_model,
+            'fallback': not has_image and vision_model is not None
+        }
@@ -0,0 +1,99 @@
+import json
+import select
+import socket
+import time
+
+import requests
+
+# Clés WSGI exposant la socket du client (serveur de dev werkzeug, gunicorn)
+CLIENT_SOCKET_KEYS = ("werkzeug.socket", "gunicorn.socket")
+
+
+def client_disconnected(environ) -> bool:
+    """Vrai si le client HTTP a fermé sa connexion (onglet fermé, timeout)
+
+    Test non bloquant: une socket lisible dont la lecture (MSG_PEEK) ne
+    renvoie rien a été fermée par le client. Sans socket accessible (autre
+    serveur WSGI, TLS), la déconnexion n'est pas détectée.
+    """
+    sock = next((environ[key] for key in CLIENT_SOCKET_KEYS if environ.get(key) is not None), None)
+    if sock is None:
+        return False
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        if not readable:
+            return False
+        return sock.recv(1, socket.MSG_PEEK) == b""
+    except (BlockingIOError, InterruptedError, ValueError):
+        return False
+    except OSError:
+        return True
+
+
+class GenerationTimeout(requests.exceptions.Timeout):
+    """Génération plus longue que le délai total accordé"""
+
+
+class ChatStream:
+    """Réponse /api/chat d'Ollama en streaming (NDJSON), annulable
+
+    Itérer sur l'objet donne les fragments de texte au fil de la génération;
+    `result` contient ensuite le dernier message d'Ollama (done, champs de
+    timing) avec le contenu complet. `cancel()` ferme la connexion à
+    Ollama, qui arrête alors la génération et libère le slot du modèle.
+
+    Le timeout de requests ne borne que chaque lecture: `timeout` (secondes)
+    borne la durée totale, au-delà la génération est annulée et
+    GenerationTimeout levée. Une erreur d'Ollama en cours de génération
+    (connexion coupée, message d'erreur) est signalée à `on_failure(erreur)`,
+    par exemple le disjoncteur du serveur, la réponse HTTP étant déjà 200.
+    """
+
+    def __init__(self, response, timeout: float = None, on_failure=None):
+        self.response = response
+        self.deadline = time.time() + timeout if timeout else None
+        self.on_failure = on_failure
+        self.parts = []
+        self.tokens = 0
+        self.result = None
+        self.cancelled = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def __iter__(self):
+        try:
+            for line in self.response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise Exception(f"Ollama: {chunk['error']}")
+                if self.deadline and time.time() > self.deadline:
+                    self.cancel()
+                    raise GenerationTimeout(f"génération interrompue après {self.tokens} tokens (délai dépassé)")
+                content = (chunk.get('message') or {}).get('content', '')
+                if content:
+                    self.parts.append(content)
+                    self.tokens += 1
+                    yield content
+                if chunk.get('done'):
+                    chunk['message'] = dict(chunk.get('message') or {}, content=self.text)
+                    self.result = chunk
+                    return
+            if not self.cancelled:
+                raise Exception("Réponse Ollama interrompue avant la fin de la génération")
+        except GenerationTimeout:
+            raise
+        except Exception as e:
+            if not self.cancelled and self.on_failure:
+                self.on_failure(e)
+            raise
+        finally:
+            self.response.close()
+
+    def cancel(self):
+        """Abandonne la génération (connexion à Ollama fermée)"""
+        self.cancelled = True
+        self.response.close()
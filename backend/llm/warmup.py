@@ -0,0 +1,196 @@
+import threading
+import time
+
+# Au-delà de ce load_duration, une réponse a payé un chargement de modèle
+COLD_LOAD_THRESHOLD_MS = 1000
+
+
+def _canonical(name: str) -> str:
+    """Nom de modèle avec tag ("nomic-embed-text" -> "nomic-embed-text:latest")"""
+    return name if ":" in name else f"{name}:latest"
+
+
+class ModelWarmer:
+    """Préchargement des modèles Ollama et maintien en mémoire (keep_alive)
+
+    Au démarrage, chaque modèle est chargé par une requête vide sur chaque
+    serveur sain de son pool (`pools`: {'chat': BackendPool, 'embedding':
+    BackendPool}). Une tâche de fond vérifie ensuite périodiquement
+    (/api/ps de chaque serveur) que les modèles sont toujours en mémoire et
+    les recharge sinon, avant qu'un utilisateur ne paie le chargement. Les
+    chargements à froid sont détectés à partir du champ load_duration des
+    réponses.
+    """
+
+    def __init__(self, pools: dict, keep_alive="30m", refresh_interval: float = 60.0,
+                 cold_threshold_ms: float = COLD_LOAD_THRESHOLD_MS):
+        self.pools = pools
+        self.keep_alive = keep_alive
+        self.refresh_interval = refresh_interval
+        self.cold_threshold_ms = cold_threshold_ms
+        self.models = {}  # nom -> 'chat' | 'embedding'
+        self._state = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _model_state(self, model):
+        return self._state.setdefault(model, {
+            'last_warmup': None,
+            'warmups': 0,
+            'cold_loads': 0,
+            'last_load_ms': None,
+            'last_cold_load_at': None,
+            'error': None,
+            'backends': {}  # url -> préchauffé ou non
+        })
+
+    def _pool(self, model):
+        return self.pools[self.models.get(model, "chat")]
+
+    def _warm_backend(self, backend, model: str, kind: str) -> bool:
+        try:
+            if kind == "embedding":
+                response = backend.request(
+                    "POST",
+                    "/api/embed",
+                    json={"model": model, "input": "warmup", "keep_alive": self.keep_alive},
+                    timeout=120
+                )
+                if response.status_code == 404:
+                    # Ollama < 0.3: pas de /api/embed
+                    response = backend.request(
+                        "POST",
+                        "/api/embeddings",
+                        json={"model": model, "prompt": "warmup", "keep_alive": self.keep_alive},
+                        timeout=120
+                    )
+            else:
+                response = backend.request(
+                    "POST",
+                    "/api/generate",
+                    json={"model": model, "keep_alive": self.keep_alive, "stream": False},
+                    timeout=300
+                )
+            if response.status_code != 200:
+                raise Exception(f"HTTP {response.status_code}")
+
+            load_ms = response.json().get('load_duration', 0) / 1e6
+            with self._lock:
+                state = self._model_state(model)
+                state.update({
+                    'last_warmup': time.time(),
+                    'last_load_ms': round(load_ms, 1),
+                    'error': None
+                })
+                state['warmups'] += 1
+                state['backends'][backend.url] = True
+            print(f"🔥 Modèle {model} préchargé sur {backend.url} ({load_ms:.0f} ms)")
+            return True
+
+        except Exception as e:
+            with self._lock:
+                state = self._model_state(model)
+                state['backends'][backend.url] = False
+                state['error'] = f"{backend.url}: {e}"
+            print(f"⚠️ Préchargement {model} sur {backend.url} échoué: {e}")
+            return False
+
+    def warm(self, model: str, kind: str = "chat") -> bool:
+        """Charge un modèle (requête vide) sur chaque serveur sain de son pool
+        et l'y garde en mémoire `keep_alive`"""
+        backends = self.pools[kind].serving(model)
+        if not backends:
+            with self._lock:
+                self._model_state(model)['error'] = "aucun serveur Ollama disponible"
+            return False
+        results = [self._warm_backend(backend, model, kind) for backend in backends]
+        return all(results)
+
+    def loaded_models(self, backend) -> list:
+        """Modèles actuellement en mémoire selon un serveur Ollama (/api/ps)"""
+        response = backend.request("GET", "/api/ps", timeout=5)
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}")
+        return [m.get('name', '') for m in response.json().get('models', [])]
+
+    def refresh(self):
+        """Recharge les modèles évincés de la mémoire des serveurs Ollama"""
+        loaded = {}
+        for model, kind in list(self.models.items()):
+            for backend in self.pools[kind].serving(model):
+                if backend.url not in loaded:
+                    try:
+                        loaded[backend.url] = {_canonical(name) for name in self.loaded_models(backend)}
+                    except Exception as e:
+                        print(f"⚠️ /api/ps indisponible sur {backend.url}: {e}")
+                        loaded[backend.url] = set()
+                if _canonical(model) in loaded[backend.url]:
+                    with self._lock:
+                        self._model_state(model)['backends'][backend.url] = True
+                    continue
+                with self._lock:
+                    self._model_state(model)['backends'][backend.url] = False
+                self._warm_backend(backend, model, kind)
+
+    def start(self, models: dict):
+        """Précharge `models` ({nom: 'chat'|'embedding'}) puis lance la tâche de maintien"""
+        self.models.update({name: kind for name, kind in models.items() if name})
+        if self._thread and self._thread.is_alive():
+            return
+
+        def run():
+            for model, kind in list(self.models.items()):
+                if self._stop.is_set():
+                    return
+                self.warm(model, kind)
+            while not self._stop.wait(self.refresh_interval):
+                self.refresh()
+
+        self._thread = threading.Thread(target=run, name="model-warmer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def is_warm(self, model: str) -> bool:
+        """Modèle préchargé sur tous les serveurs sains susceptibles de le servir"""
+        urls = [backend.url for backend in self._pool(model).serving(model)]
+        with self._lock:
+            state = self._state.get(model)
+            return bool(state and urls and all(state['backends'].get(url) for url in urls))
+
+    def record_timing(self, model: str, result: dict, backend: str = None) -> bool:
+        """Analyse les champs de timing d'une réponse du serveur `backend` (URL);
+        retourne True si chargement à froid"""
+        load_ms = (result.get('load_duration') or 0) / 1e6
+        cold = load_ms >= self.cold_threshold_ms
+        with self._lock:
+            state = self._model_state(model)
+            state['last_load_ms'] = round(load_ms, 1)
+            if backend:
+                state['backends'][backend] = True
+            if cold:
+                state['cold_loads'] += 1
+                state['last_cold_load_at'] = time.time()
+        if cold:
+            print(f"🧊 Chargement à froid de {model} sur {backend or 'Ollama'}: {load_ms:.0f} ms")
+        return cold
+
+    def mark_failed(self, model: str, backend: str = None):
+        with self._lock:
+            backends = self._model_state(model)['backends']
+            for url in ([backend] if backend else list(backends)):
+                backends[url] = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            models = {}
+            for name, state in self._state.items():
+                models[name] = dict(state, backends=dict(state['backends']))
+                models[name]['warm'] = bool(state['backends']) and all(state['backends'].values())
+            return {
+                'keep_alive': self.keep_alive,
+                'refresh_interval_s': self.refresh_interval,
+                'models': models
+            }
@@ -0,0 +1,121 @@
+from collections import Counter
+from datetime import datetime
+import re
+import unicodedata
+
+# Questions distinctes suivies au plus (mémoire bornée, algorithme Misra-Gries)
+HEAVY_HITTERS_CAPACITY = 1000
+
+BUCKET_FORMATS = {
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+    "month": "%Y-%m"
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_question(text: str) -> str:
+    """Forme canonique d'une question (casse, accents, ponctuation, espaces)"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return _SPACES.sub(" ", _PUNCTUATION.sub(" ", text)).strip()
+
+
+class HeavyHitters:
+    """Éléments les plus fréquents d'un flux en mémoire bornée (Misra-Gries)
+
+    Au plus `capacity` compteurs: tout élément de fréquence supérieure à
+    n / capacity est garanti d'être retenu. Les comptes sont des minorants,
+    sous-estimés d'au plus n / capacity.
+    """
+
+    def __init__(self, capacity: int = HEAVY_HITTERS_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.examples = {}
+
+    def add(self, key: str, example: str = None):
+        if key in self.counts:
+            self.counts[key] += 1
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = 1
+            self.examples[key] = example or key
+            return
+        # Compteurs pleins: tous décrémentés, les nuls libérés
+        for other in list(self.counts):
+            self.counts[other] -= 1
+            if not self.counts[other]:
+                del self.counts[other]
+                del self.examples[other]
+
+    def top(self, n: int) -> list:
+        ranked = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [(self.examples[key], count) for key, count in ranked]
+
+
+class ConversationAnalytics:
+    """Statistiques du journal calculées en une passe sur un flux d'entrées
+
+    Mémoire bornée: compteurs par période, par modèle et par route, et
+    questions les plus fréquentes via HeavyHitters.
+    """
+
+    def __init__(self, bucket: str = "day", capacity: int = HEAVY_HITTERS_CAPACITY):
+        if bucket not in BUCKET_FORMATS:
+            raise ValueError(f"Période inconnue: {bucket} ({', '.join(BUCKET_FORMATS)})")
+        self.bucket = bucket
+        self.total = 0
+        self.rag_used = 0
+        self.with_image = 0
+        self.first = None
+        self.last = None
+        self.volume = Counter()
+        self.models = Counter()
+        self.routes = Counter()
+        self.questions = HeavyHitters(capacity)
+
+    def add(self, entry: dict):
+        metadata = entry.get("metadata") or {}
+        self.total += 1
+        self.rag_used += bool(metadata.get("rag_used"))
+        self.with_image += bool(metadata.get("has_image"))
+        self.models[metadata.get("model") or "inconnu"] += 1
+        if metadata.get("route"):
+            self.routes[metadata["route"]] += 1
+
+        timestamp = entry.get("timestamp")
+        try:
+            moment = datetime.fromisoformat(timestamp)
+        except (TypeError, ValueError):
+            moment = None
+        if moment is not None:
+            self.volume[moment.strftime(BUCKET_FORMATS[self.bucket])] += 1
+            self.first = timestamp if self.first is None or timestamp < self.first else self.first
+            self.last = timestamp if self.last is None or timestamp > self.last else self.last
+
+        question = entry.get("user") or ""
+        key = normalize_question(question)
+        if key:
+            self.questions.add(key, question.strip())
+
+    def consume(self, entries):
+        for entry in entries:
+            self.add(entry)
+        return self
+
+    def report(self, top: int = 10) -> dict:
+        total = self.total or 1
+        return {
+            'total': self.total,
+            'first': self.first,
+            'last': self.last,
+            'rag_rate': round(self.rag_used / total, 4),
+            'image_share': round(self.with_image / total, 4),
+            'volume': dict(sorted(self.volume.items())),
+            'models': dict(self.models.most_common()),
+            'routes': dict(self.routes.most_common()),
+            'top_questions': self.questions.top(top)
+        }
@@ -1,19 +1,91 @@
-import json
 from datetime import datetime
 from pathlib import Path
 import os
+import threading
+import time
+
+from .analytics import HeavyHitters, normalize_question
+from .recall import ConversationIndex
+from .sessions import SessionStore
+from .summarizer import SessionSummarizer, SUMMARY_BATCH_TURNS
+from .stores import JsonlStore, SqliteStore
+from .writer import ConversationWriter
+
+# Entrées du journal relues au démarrage pour reconstruire les sessions
+RESTORE_MAX_ENTRIES = 5000
+
+# Rotation du journal JSONL en segments compressés
+ROTATE_BYTES = 16 * 1024 * 1024
 
 class MemoryManager:
-    def __init__(self, storage_path="data/memory"):
+    def __init__(self, storage_path="data/memory", sessions: SessionStore = None,
+                 write_behind: bool = True, batch_size: int = 64, flush_interval: float = 1.0,
+                 fsync: str = "interval", backend: str = "jsonl",
+                 rotate_bytes: int = ROTATE_BYTES, rotate_age: float = None,
+                 embed_documents=None, embedding_model: str = None,
+                 summarize=None, summary_batch_turns: int = SUMMARY_BATCH_TURNS):
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(exist_ok=True)
-        
+
         # Check if directory is writable
         if not os.access(self.storage_path, os.W_OK):
             raise PermissionError(f"Cannot write to directory: {self.storage_path}")
-        
+
         self.conversations_file = self.storage_path / "conversations.json"
         self.facts_file = self.storage_path / "facts.json"
+        self.summaries_file = self.storage_path / "summaries.jsonl"
+        self.database_file = self.storage_path / "conversations.db"
+
+        # Moteur de stockage: JSON Lines (défaut) ou SQLite WAL
+        if backend == "sqlite":
+            self.store = SqliteStore(self.database_file, fsync=fsync)
+            imported = self.store.import_jsonl(self.conversations_file)
+            if imported:
+                print(f"📥 {imported} conversations importées du journal JSONL dans SQLite")
+        elif backend == "jsonl":
+            self.store = JsonlStore(self.conversations_file, max_bytes=rotate_bytes, max_age=rotate_age)
+        else:
+            raise ValueError(f"Stockage inconnu: {backend} (jsonl ou sqlite)")
+
+        # Historique par session en mémoire, reconstruit depuis le journal
+        self.sessions = sessions if sessions is not None else SessionStore()
+
+        # Résumé glissant des tours sortis de la fenêtre des sessions (optionnel)
+        self.summarizer = None
+        if summarize:
+            self.summarizer = SessionSummarizer(
+                self.sessions, summarize, self.summaries_file, batch_turns=summary_batch_turns
+            )
+
+        # Journal écrit par un thread dédié, hors du chemin des requêtes
+        self.writer = None
+        if write_behind:
+            self.writer = ConversationWriter(
+                self.store,
+                batch_size=batch_size,
+                flush_interval=flush_interval,
+                fsync=fsync
+            )
+
+        # Rappel sémantique des paires question/réponse passées (optionnel)
+        self.recall = None
+        if embed_documents:
+            self.recall = ConversationIndex(self.storage_path / "recall", embed_documents, model=embedding_model)
+            self._backfill_recall()
+
+    def _backfill_recall(self):
+        """Indexe en tâche de fond le journal écrit depuis la dernière indexation"""
+        since, until = self.recall.last_indexed(), time.time()
+
+        def run():
+            try:
+                queued = self.recall.backfill(self.store.iter_entries(since, until))
+                if queued:
+                    print(f"🧠 {queued} conversations du journal en cours d'indexation pour le rappel")
+            except Exception as e:
+                print(f"⚠️ Rattrapage de l'index de rappel impossible: {e}")
+
+        threading.Thread(target=run, daemon=True, name="recall-backfill").start()
 
     def add_conversation(self, user_message: str, bot_response: str, metadata: dict = None):
         entry = {
@@ -22,20 +94,115 @@ class MemoryManager:
             "bot": bot_response,
             "metadata": metadata or {}
         }
-        
-        with open(self.conversations_file, "a") as f:
-            f.write(json.dumps(entry) + "\n")
-
-    def generate_context(self, current_message: str, limit: int = 3) -> str:
-        try:
-            with open(self.conversations_file, "r") as f:
-                lines = f.readlines()[-limit:]
-                conversations = [json.loads(line) for line in lines]
-                
-                context = "Historique récent:\n"
-                for conv in conversations:
-                    context += f"User: {conv['user']}\nBot: {conv['bot']}\n---\n"
-                
-                return context
-        except FileNotFoundError:
-            return "Aucun historique disponible"
\ No newline at end of file
+
+        session_id = entry["metadata"].get("session_id")
+        if session_id and user_message:
+            self.sessions.append(session_id, user_message, bot_response)
+            if self.summarizer:
+                self.summarizer.notify(session_id)
+
+        if self.writer:
+            self.writer.write(entry)
+        else:
+            self.store.append_many([entry])
+
+        if self.recall:
+            self.recall.add(entry)
+
+    def flush(self):
+        """Attend l'écriture des entrées encore en file"""
+        if self.writer:
+            self.writer.flush()
+
+    def close(self):
+        if self.summarizer:
+            self.summarizer.close()
+        if self.recall:
+            self.recall.close()
+        if self.writer:
+            self.writer.close()
+        self.store.close()
+
+    def writer_stats(self) -> dict:
+        return self.writer.stats() if self.writer else None
+
+    def storage_stats(self) -> dict:
+        return self.store.stats()
+
+    def summarizer_stats(self) -> dict:
+        return self.summarizer.stats() if self.summarizer else None
+
+    def recall_stats(self) -> dict:
+        return self.recall.stats() if self.recall else None
+
+    def recall_conversations(self, embedding, k: int = 2, min_score: float = 0.8,
+                             exclude_session: str = None) -> list:
+        """Paires question/réponse passées proches d'un embedding de requête"""
+        if not self.recall:
+            return []
+        return self.recall.search(embedding, k=k, min_score=min_score, exclude_session=exclude_session)
+
+    def iter_entries(self, start: float = None, end: float = None):
+        """Toutes les entrées du journal (segments compris), en streaming"""
+        self.flush()
+        return self.store.iter_entries(start, end)
+
+    def recent_entries(self, limit: int = RESTORE_MAX_ENTRIES) -> list:
+        """Dernières entrées du journal, dans l'ordre chronologique"""
+        self.flush()
+        return self.store.recent(limit)
+
+    def frequent_questions(self, limit: int = 20, start: float = None, min_count: int = 2) -> list:
+        """Questions texte les plus posées [(question, occurrences)], en une passe
+
+        Les questions sont regroupées par forme normalisée; l'exemple retourné
+        est la première formulation rencontrée.
+        """
+        questions = HeavyHitters()
+        for entry in self.iter_entries(start):
+            if (entry.get("metadata") or {}).get("has_image"):
+                continue
+            question = (entry.get("user") or "").strip()
+            key = normalize_question(question)
+            if key:
+                questions.add(key, question)
+        return [(question, count) for question, count in questions.top(limit) if count >= min_count]
+
+    def restore_sessions(self, limit: int = RESTORE_MAX_ENTRIES) -> int:
+        """Recharge l'historique des sessions récentes depuis le journal
+
+        Avec le résumeur, les résumés enregistrés sont rechargés et seuls les
+        tours qu'ils ne couvrent pas sont rejoués (puis résumés si besoin).
+        """
+        summaries = self.summarizer.load() if self.summarizer else None
+        restored = self.sessions.restore(self.recent_entries(limit), summaries)
+        if self.summarizer:
+            self.summarizer.notify_all()
+        return restored
+
+    def get_history(self, session_id: str, limit: int = None) -> list:
+        """Derniers tours [(question, réponse)] d'une session, sans accès disque"""
+        turns = self.sessions.turns(session_id, include_pending=True)
+        return turns[-limit:] if limit else turns
+
+    def generate_context(self, current_message: str, limit: int = 3, session_id: str = None) -> str:
+        if session_id:
+            turns = self.get_history(session_id, limit)
+            summary = self.sessions.summary(session_id)
+            if not turns and not summary:
+                return "Aucun historique disponible"
+
+            context = f"Résumé: {summary}\n" if summary else ""
+            context += "Historique récent:\n"
+            for user, bot in turns:
+                context += f"User: {user}\nBot: {bot}\n---\n"
+            return context
+
+        conversations = self.recent_entries(limit)
+        if not conversations:
+            return "Aucun historique disponible"
+
+        context = "Historique récent:\n"
+        for conv in conversations:
+            context += f"User: {conv['user']}\nBot: {conv['bot']}\n---\n"
+        return context
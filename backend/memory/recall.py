@@ -0,0 +1,299 @@
+from datetime import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from .analytics import normalize_question
+
+VECTORS_FILE = "vectors.f16"
+ENTRIES_FILE = "entries.jsonl"
+META_FILE = "meta.json"
+
+# Texte conservé par paire (la réponse complète reste dans le journal)
+QUESTION_CHARS = 500
+ANSWER_CHARS = 2000
+
+_STOP = object()
+
+
+def indexable(entry: dict) -> bool:
+    """Paire question/réponse texte, hors réponses servies depuis le cache"""
+    metadata = entry.get("metadata") or {}
+    return bool(
+        (entry.get("user") or "").strip()
+        and (entry.get("bot") or "").strip()
+        and not metadata.get("has_image")
+        and not metadata.get("cached")
+    )
+
+
+class ConversationIndex:
+    """Index sémantique incrémental des paires question/réponse du journal
+
+    Stockage compact dans un dossier dédié:
+    - vectors.f16: embeddings normalisés des questions en float16, ajoutés
+      en fin de fichier (dimension fixe);
+    - entries.jsonl: une ligne par vecteur (horodatage, session, question et
+      réponse tronquées), relue par offset seulement pour les résultats;
+    - meta.json: modèle d'embedding, dimension, dernier horodatage indexé.
+
+    Les paires sont embeddées par lots (embed_documents) dans un thread
+    dédié, hors du chemin des requêtes: un ajout n'est qu'une écriture en
+    fin de fichier, jamais une reconstruction. Au chargement, les deux
+    fichiers sont ramenés au même nombre de lignes (ajout interrompu).
+
+    En mémoire, la matrice est gardée en float32: la conversion depuis
+    float16 coûterait plus que le produit matrice-vecteur à chaque recherche.
+    """
+
+    def __init__(self, directory, embed_documents, model: str = None,
+                 batch_size: int = 32, max_queue: int = 10000):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, VECTORS_FILE)
+        self.entries_path = os.path.join(self.directory, ENTRIES_FILE)
+        self.meta_path = os.path.join(self.directory, META_FILE)
+        self.embed_documents = embed_documents
+        self.model = model
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_queue)
+        self.indexed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_batch_ms = None
+        self._load()
+
+        self._thread = threading.Thread(target=self._run, daemon=True, name="conversation-index")
+        self._thread.start()
+
+    def _load(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            meta = {}
+        if meta and meta.get("model") != self.model:
+            # Vecteurs d'un autre modèle: incomparables, l'index repart de zéro
+            print(f"♻️ Index de rappel recréé (modèle {meta.get('model')} → {self.model})")
+            for path in (self.vectors_path, self.entries_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            meta = {}
+        self.meta = {
+            "model": self.model,
+            "dim": meta.get("dim"),
+            "last_timestamp": meta.get("last_timestamp")
+        }
+
+        offsets = []
+        end = 0
+        if os.path.exists(self.entries_path):
+            with open(self.entries_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    offsets.append(end)
+                    end += len(line)
+
+        dim = self.meta["dim"]
+        vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        if dim and os.path.exists(self.vectors_path):
+            data = np.fromfile(self.vectors_path, dtype=np.float16)
+            vectors = data[:len(data) // dim * dim].reshape(-1, dim)
+
+        count = min(len(vectors), len(offsets))
+        if dim and os.path.exists(self.vectors_path):
+            os.truncate(self.vectors_path, count * dim * 2)
+        if os.path.exists(self.entries_path):
+            os.truncate(self.entries_path, offsets[count] if count < len(offsets) else end)
+
+        self._matrix = np.array(vectors[:count], dtype=np.float32)
+        self._count = count
+        self._offsets = offsets[:count]
+
+    def _save_meta(self):
+        partial = f"{self.meta_path}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(partial, self.meta_path)
+
+    def last_indexed(self) -> float:
+        """Horodatage (epoch) de la dernière paire indexée, None si vide"""
+        try:
+            return datetime.fromisoformat(self.meta["last_timestamp"]).timestamp()
+        except (TypeError, ValueError):
+            return None
+
+    def add(self, entry: dict) -> bool:
+        """Met une paire en file d'indexation (jamais bloquant)"""
+        if not indexable(entry):
+            return False
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def backfill(self, entries) -> int:
+        """Indexe les entrées du journal postérieures à la dernière indexée"""
+        last = self.meta["last_timestamp"]
+        queued = 0
+        for entry in entries:
+            if last and (entry.get("timestamp") or "") <= last:
+                continue
+            if indexable(entry):
+                self._queue.put(entry)
+                queued += 1
+        return queued
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            stop = item is _STOP
+            batch = [] if stop else [item]
+            while len(batch) < self.batch_size and not stop:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                else:
+                    batch.append(item)
+            if batch:
+                self._index(batch)
+            if stop:
+                return
+
+    def _index(self, batch: list):
+        start = time.time()
+        try:
+            vectors = np.asarray(
+                self.embed_documents([e["user"][:QUESTION_CHARS] for e in batch]),
+                dtype=np.float32
+            )
+        except Exception as e:
+            self.errors += 1
+            print(f"⚠️ Indexation des conversations impossible: {e}")
+            return
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        records = [
+            (json.dumps({
+                "timestamp": e.get("timestamp"),
+                "session_id": (e.get("metadata") or {}).get("session_id"),
+                "user": e["user"][:QUESTION_CHARS],
+                "bot": e["bot"][:ANSWER_CHARS]
+            }, ensure_ascii=False) + "\n").encode("utf-8")
+            for e in batch
+        ]
+
+        with self._lock:
+            dim = self.meta["dim"] or vectors.shape[1]
+            if vectors.shape[1] != dim:
+                self.errors += 1
+                print(f"⚠️ Dimension d'embedding inattendue: {vectors.shape[1]} (index: {dim})")
+                return
+            if not self.meta["dim"]:
+                self.meta["dim"] = dim
+                self._matrix = np.zeros((0, dim), dtype=np.float32)
+
+            rows = vectors.astype(np.float16)
+            with open(self.vectors_path, "ab") as f:
+                f.write(rows.tobytes())
+            with open(self.entries_path, "ab") as f:
+                position = f.tell()
+                for record in records:
+                    self._offsets.append(position)
+                    f.write(record)
+                    position += len(record)
+
+            # Matrice agrandie par doublement: ajout amorti en O(lot)
+            needed = self._count + len(rows)
+            if needed > len(self._matrix):
+                grown = np.zeros((max(needed, 2 * len(self._matrix), 1024), dim), dtype=np.float32)
+                grown[:self._count] = self._matrix[:self._count]
+                self._matrix = grown
+            self._matrix[self._count:needed] = rows
+            self._count = needed
+
+            timestamps = [e.get("timestamp") for e in batch if e.get("timestamp")]
+            if timestamps:
+                self.meta["last_timestamp"] = max(timestamps + [self.meta["last_timestamp"] or ""])
+            self._save_meta()
+            self.indexed += len(batch)
+            self.last_batch_ms = round((time.time() - start) * 1000, 1)
+
+    def search(self, embedding, k: int = 3, min_score: float = 0.8, exclude_session: str = None) -> list:
+        """Paires passées les plus proches d'un embedding de requête
+
+        Retourne au plus `k` dicts {timestamp, session_id, user, bot, score}
+        de similarité cosinus >= `min_score`, une seule par question
+        normalisée, hors session `exclude_session` (déjà dans l'historique).
+        """
+        with self._lock:
+            matrix = self._matrix[:self._count]
+            offsets = self._offsets[:self._count]
+        if not len(matrix) or k <= 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32)
+        if query.shape[0] != matrix.shape[1]:
+            return []
+        query /= max(np.linalg.norm(query), 1e-12)
+
+        scores = matrix @ query
+
+        # Quelques candidats de plus pour absorber exclusions et doublons
+        candidates = min(len(scores), 4 * k + 16)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        # Score décroissant, puis la paire la plus récente d'abord
+        top = top[np.lexsort((-top, -scores[top]))]
+
+        results = []
+        seen = set()
+        with open(self.entries_path, "rb") as f:
+            for row in top:
+                score = float(scores[row])
+                if score < min_score:
+                    break
+                f.seek(offsets[row])
+                record = json.loads(f.readline())
+                key = normalize_question(record["user"])
+                if key in seen or (exclude_session and record.get("session_id") == exclude_session):
+                    continue
+                seen.add(key)
+                record["score"] = round(score, 4)
+                results.append(record)
+                if len(results) >= k:
+                    break
+        return results
+
+    def close(self, timeout: float = 10.0):
+        """Indexe les paires encore en file puis arrête le thread"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        sizes = [os.path.getsize(p) for p in (self.vectors_path, self.entries_path) if os.path.exists(p)]
+        with self._lock:
+            return {
+                'records': self._count,
+                'model': self.model,
+                'dimension': self.meta["dim"],
+                'last_timestamp': self.meta["last_timestamp"],
+                'queue_depth': self._queue.qsize(),
+                'indexed': self.indexed,
+                'dropped': self.dropped,
+                'errors': self.errors,
+                'last_batch_ms': self.last_batch_ms,
+                'disk_bytes': sum(sizes)
+            }
@@ -0,0 +1,162 @@
+from datetime import datetime
+import gzip
+import json
+import os
+import threading
+
+INDEX_FILE = "index.json"
+
+
+def entry_time(line: str):
+    """Horodatage (epoch) d'une ligne du journal, None si illisible"""
+    try:
+        return datetime.fromisoformat(json.loads(line)["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def compress_segment(source, destination) -> dict:
+    """Compresse un segment JSONL en gzip et relève ses bornes temporelles
+
+    Retourne {'records', 'first_ts', 'last_ts', 'bytes', 'compressed_bytes'}.
+    """
+    records = 0
+    first_ts = last_ts = None
+    partial = f"{destination}.tmp"
+    with open(source, "r", encoding="utf-8") as src, gzip.open(partial, "wt", encoding="utf-8") as dst:
+        for line in src:
+            if not line.strip():
+                continue
+            dst.write(line if line.endswith("\n") else line + "\n")
+            records += 1
+            ts = entry_time(line)
+            if ts is not None:
+                first_ts = ts if first_ts is None else min(first_ts, ts)
+                last_ts = ts if last_ts is None else max(last_ts, ts)
+    os.replace(partial, destination)
+    return {
+        'records': records,
+        'first_ts': first_ts,
+        'last_ts': last_ts,
+        'bytes': os.path.getsize(source),
+        'compressed_bytes': os.path.getsize(destination)
+    }
+
+
+def read_segment(path):
+    """Lignes d'un segment compressé, dans l'ordre"""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+class SegmentIndex:
+    """Index des segments fermés du journal (segments/index.json)
+
+    Chaque segment y est décrit par son fichier, ses bornes temporelles et
+    son nombre d'entrées: une requête ne décompresse que les segments qui
+    recouvrent la période demandée. L'index est réécrit de façon atomique.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILE)
+        self._lock = threading.Lock()
+        self._segments = self._load()
+
+    def _load(self) -> list:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("segments", [])
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def _save(self):
+        partial = f"{self.path}.tmp"
+        with open(partial, "w", encoding="utf-8") as f:
+            json.dump({"segments": self._segments}, f, indent=2)
+        os.replace(partial, self.path)
+
+    def next_id(self) -> int:
+        with self._lock:
+            return max((s['id'] for s in self._segments), default=0) + 1
+
+    def add(self, segment: dict):
+        with self._lock:
+            self._segments.append(segment)
+            self._segments.sort(key=lambda s: s['id'])
+            self._save()
+
+    def segments(self) -> list:
+        """Segments du plus ancien au plus récent"""
+        with self._lock:
+            return [dict(s) for s in self._segments]
+
+    def file_path(self, segment: dict) -> str:
+        return os.path.join(self.directory, segment['file'])
+
+    def overlapping(self, start: float = None, end: float = None) -> list:
+        """Segments dont la période recoupe [start, end)"""
+        selected = []
+        for segment in self.segments():
+            first, last = segment.get('first_ts'), segment.get('last_ts')
+            if first is not None and end is not None and first >= end:
+                continue
+            if last is not None and start is not None and last < start:
+                continue
+            selected.append(segment)
+        return selected
+
+    def stats(self) -> dict:
+        segments = self.segments()
+        return {
+            'segments': len(segments),
+            'records': sum(s['records'] for s in segments),
+            'bytes': sum(s['bytes'] for s in segments),
+            'compressed_bytes': sum(s['compressed_bytes'] for s in segments)
+        }
+
+
+def seal(active_path, directory, index: SegmentIndex) -> dict:
+    """Ferme le fichier actif: renommage, compression, ajout à l'index
+
+    Chaque étape laisse un état récupérable (voir recover): le fichier
+    renommé reste jusqu'à ce que le segment compressé soit indexé.
+    """
+    segment_id = index.next_id()
+    name = f"conversations-{segment_id:06d}.jsonl"
+    raw_path = os.path.join(directory, name)
+    os.replace(active_path, raw_path)
+    return _compress_and_index(raw_path, segment_id, index)
+
+
+def _compress_and_index(raw_path, segment_id, index: SegmentIndex) -> dict:
+    compressed_name = os.path.basename(raw_path) + ".gz"
+    meta = compress_segment(raw_path, os.path.join(index.directory, compressed_name))
+    segment = {'id': segment_id, 'file': compressed_name}
+    segment.update(meta)
+    index.add(segment)
+    os.remove(raw_path)
+    return segment
+
+
+def recover(directory, index: SegmentIndex) -> int:
+    """Termine les rotations interrompues (segments renommés mais non indexés)"""
+    known = {s['id'] for s in index.segments()}
+    recovered = 0
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith("conversations-") and name.endswith(".jsonl")):
+            continue
+        try:
+            segment_id = int(name[len("conversations-"):-len(".jsonl")])
+        except ValueError:
+            continue
+        raw_path = os.path.join(directory, name)
+        if segment_id in known:
+            os.remove(raw_path)
+            continue
+        _compress_and_index(raw_path, segment_id, index)
+        recovered += 1
+    return recovered
+
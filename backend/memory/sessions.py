@@ -0,0 +1,212 @@
+from collections import OrderedDict, deque
+from datetime import datetime
+import threading
+import time
+
+# Tours sortis de la fenêtre gardés au plus en attente de résumé, en
+# multiple de max_turns (résumeur absent ou en retard)
+PENDING_FACTOR = 4
+
+
+def _timestamp(entry, default):
+    """Horodatage (epoch) d'une entrée du journal (champ ISO timestamp)"""
+    try:
+        return datetime.fromisoformat(entry['timestamp']).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+class _Session:
+    __slots__ = ('last_seen', 'turns', 'pending', 'summary', 'summarized_through')
+
+    def __init__(self, last_seen):
+        self.last_seen = last_seen
+        self.turns = deque()        # (question, réponse, horodatage)
+        self.pending = deque()      # tours sortis de la fenêtre, pas encore résumés
+        self.summary = None
+        self.summarized_through = None
+
+
+class SessionStore:
+    """Historique récent de chaque session, en mémoire
+
+    Chaque session garde ses `max_turns` derniers tours dans un tampon
+    circulaire: assembler le contexte multi-tours coûte O(tours), sans accès
+    disque. Les tours qui sortent de la fenêtre passent en attente de résumé
+    (voir SessionSummarizer) et restent dans le prompt jusqu'à ce que le
+    résumé glissant les remplace: sa taille reste bornée quelle que soit la
+    longueur de la session.
+
+    Les sessions sont rangées par dernier accès; au-delà de `max_sessions`,
+    ou après `idle_ttl` secondes d'inactivité, les plus anciennes sont
+    évincées. Le journal persistant des conversations sert à reconstruire
+    les sessions au redémarrage (voir MemoryManager.restore_sessions).
+    """
+
+    def __init__(self, max_sessions: int = 1000, max_turns: int = 6, idle_ttl: float = 3600.0):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_pending = PENDING_FACTOR * max_turns
+        self._sessions = OrderedDict()  # id -> _Session
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'recovered_turns': 0,
+            'summaries': 0,
+            'pending_dropped': 0
+        }
+
+    def _expire(self, now):
+        """Retire les sessions inactives (les plus anciennes sont en tête)"""
+        if not self.idle_ttl:
+            return
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_seen <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self._stats['expirations'] += 1
+
+    def _touch(self, session_id, now):
+        session = self._sessions[session_id]
+        session.last_seen = now
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def turns(self, session_id: str, include_pending: bool = False) -> list:
+        """Tours [(question, réponse)] de la session, du plus ancien au plus récent
+
+        `include_pending`: précédés des tours sortis de la fenêtre pas encore
+        résumés, qui ne figurent sinon ni dans la fenêtre ni dans le résumé.
+        """
+        if not session_id:
+            return []
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if session_id not in self._sessions:
+                self._stats['misses'] += 1
+                return []
+            self._stats['hits'] += 1
+            session = self._touch(session_id, now)
+            turns = list(session.pending) + list(session.turns) if include_pending else session.turns
+            return [(user, bot) for user, bot, _ in turns]
+
+    def summary(self, session_id: str) -> str:
+        """Résumé glissant des tours sortis de la fenêtre, None s'il n'y en a pas"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return session.summary if session else None
+
+    def append(self, session_id: str, user_message: str, bot_response: str, timestamp: float = None):
+        if not session_id:
+            return
+        now = time.time() if timestamp is None else timestamp
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session(now)
+            session.last_seen = max(now, session.last_seen)
+            self._sessions.move_to_end(session_id)
+            session.turns.append((user_message, bot_response, now))
+            while len(session.turns) > self.max_turns:
+                session.pending.append(session.turns.popleft())
+            while len(session.pending) > self.max_pending:
+                session.pending.popleft()
+                self._stats['pending_dropped'] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def pending_turns(self, session_id: str) -> int:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            return len(session.pending) if session else 0
+
+    def pending_sessions(self) -> list:
+        """Sessions ayant des tours en attente de résumé"""
+        with self._lock:
+            return [sid for sid, session in self._sessions.items() if session.pending]
+
+    def summary_input(self, session_id: str, limit: int = None):
+        """(résumé courant, `limit` plus anciens tours en attente [(question, réponse)],
+        horodatage du dernier)
+
+        None si la session n'existe plus ou n'a rien à résumer.
+        """
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if not session or not session.pending:
+                return None
+            pending = list(session.pending)[:limit]
+            return session.summary, [(user, bot) for user, bot, _ in pending], pending[-1][2]
+
+    def commit_summary(self, session_id: str, summary: str, consumed: int, through: float) -> bool:
+        """Remplace le résumé et retire les `consumed` premiers tours en attente"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if not session:
+                return False
+            for _ in range(min(consumed, len(session.pending))):
+                session.pending.popleft()
+            session.summary = summary
+            session.summarized_through = through
+            self._stats['summaries'] += 1
+            return True
+
+    def restore(self, entries, summaries: dict = None):
+        """Reconstruit les sessions à partir d'entrées du journal, dans l'ordre chronologique
+
+        Les entrées sans session_id ou trop anciennes (idle_ttl) sont ignorées.
+        `summaries`: {session_id: {'summary', 'through'}}; les tours déjà
+        couverts par le résumé d'une session ne sont pas rejoués.
+        """
+        now = time.time()
+        summaries = summaries or {}
+        with self._lock:
+            for session_id, saved in sorted(summaries.items(), key=lambda item: item[1]['through']):
+                session = self._sessions.setdefault(session_id, _Session(saved['through']))
+                session.summary = saved['summary']
+                session.summarized_through = saved['through']
+
+        restored = 0
+        for entry in entries:
+            session_id = (entry.get('metadata') or {}).get('session_id')
+            if not session_id or not entry.get('user'):
+                continue
+            timestamp = _timestamp(entry, now)
+            if self.idle_ttl and now - timestamp > self.idle_ttl:
+                continue
+            saved = summaries.get(session_id)
+            if saved and timestamp <= saved['through']:
+                continue
+            self.append(session_id, entry['user'], entry.get('bot', ''), timestamp=timestamp)
+            restored += 1
+        with self._lock:
+            # Résumés de sessions sans tour récent: expirées
+            for session_id, session in list(self._sessions.items()):
+                if self.idle_ttl and now - session.last_seen > self.idle_ttl:
+                    del self._sessions[session_id]
+            self._stats['recovered_turns'] += restored
+        return restored
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'sessions': len(self._sessions),
+                'summarized_sessions': sum(1 for s in self._sessions.values() if s.summary),
+                'pending_turns': sum(len(s.pending) for s in self._sessions.values()),
+                'max_sessions': self.max_sessions,
+                'max_turns': self.max_turns,
+                'idle_ttl_s': self.idle_ttl
+            })
+        return stats
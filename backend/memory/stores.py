@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Moteurs de stockage du journal des conversations
+
+- JsonlStore : une entrée JSON par ligne (conversations.json, historique),
+  archivé en segments gzip par rotation (segments/, index.json)
+- SqliteStore : SQLite en mode WAL, indexé par date, session et modèle;
+  lectures concurrentes pendant qu'un seul écrivain ajoute des lots
+
+Import ponctuel d'un journal JSONL existant (depuis backend/) :
+    python -m memory.stores import --jsonl data/memory/conversations.json --db data/memory/conversations.db
+"""
+
+from collections import deque
+from datetime import datetime
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .segments import SegmentIndex, entry_time, read_segment, recover, seal
+from .tail import tail_lines
+
+
+class JsonlStore:
+    """Journal JSON Lines (ajout en fin de fichier), avec rotation
+
+    Quand le fichier actif dépasse `max_bytes` octets ou `max_age` secondes
+    (depuis sa première entrée), il est fermé en segment numéroté et
+    compressé (gzip) dans `segments/`, décrit dans segments/index.json
+    (bornes temporelles, nombre d'entrées). Les lectures traversent les
+    segments de façon transparente et ne décompressent que ceux nécessaires.
+    """
+
+    def __init__(self, path, max_bytes: int = None, max_age: float = None, read_only: bool = False):
+        self.path = str(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.segments_dir = os.path.join(os.path.dirname(self.path), "segments")
+        self._lock = threading.Lock()
+        if not read_only:
+            os.makedirs(self.segments_dir, exist_ok=True)
+        self.index = SegmentIndex(self.segments_dir)
+        if not read_only and os.path.isdir(self.segments_dir):
+            recovered = recover(self.segments_dir, self.index)
+            if recovered:
+                print(f"🗜️ {recovered} segment(s) du journal finalisé(s) après une rotation interrompue")
+        self._active_since = self._first_timestamp()
+
+    def _first_timestamp(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return entry_time(f.readline())
+        except FileNotFoundError:
+            return None
+
+    def append_many(self, entries: list, sync: bool = False):
+        data = "".join(json.dumps(entry) + "\n" for entry in entries)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(data)
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+                size = f.tell()
+            if self._active_since is None:
+                self._active_since = _epoch(entries[0]["timestamp"]) if entries else time.time()
+            if self._should_rotate(size):
+                self._rotate()
+
+    def sync(self):
+        """fsync du fichier actif (lots écrits sans sync)"""
+        with self._lock:
+            try:
+                with open(self.path, "rb") as f:
+                    os.fsync(f.fileno())
+            except FileNotFoundError:
+                pass
+
+    def _should_rotate(self, size: int) -> bool:
+        if self.max_bytes and size >= self.max_bytes:
+            return True
+        return bool(self.max_age and self._active_since and time.time() - self._active_since >= self.max_age)
+
+    def _rotate(self):
+        if not os.path.exists(self.path) or not os.path.getsize(self.path):
+            return None
+        segment = seal(self.path, self.segments_dir, self.index)
+        self._active_since = None
+        print(f"🗜️ Journal archivé: {segment['file']} ({segment['records']} entrées, "
+              f"{segment['bytes'] // 1024} Ko -> {segment['compressed_bytes'] // 1024} Ko)")
+        return segment
+
+    def rotate(self):
+        """Ferme le fichier actif en segment compressé (rotation forcée)"""
+        with self._lock:
+            return self._rotate()
+
+    def recent(self, limit: int) -> list:
+        """Dernières entrées, dans l'ordre chronologique
+
+        Le fichier actif est lu depuis la fin; les segments ne sont
+        décompressés, du plus récent au plus ancien, que s'il manque encore
+        des entrées.
+        """
+        with self._lock:
+            try:
+                lines = tail_lines(self.path, limit)
+            except FileNotFoundError:
+                lines = []
+
+            for segment in reversed(self.index.segments()):
+                missing = limit - len(lines)
+                if missing <= 0:
+                    break
+                older = deque(read_segment(self.index.file_path(segment)), maxlen=missing)
+                lines = list(older) + lines
+
+        return self._parse(lines)
+
+    @staticmethod
+    def _parse(lines) -> list:
+        entries = []
+        for line in lines:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return entries
+
+    def iter_entries(self, start: float = None, end: float = None):
+        """Parcourt les entrées dans l'ordre, en streaming, sur [start, end) (epoch)
+
+        Seuls les segments dont la période recoupe l'intervalle sont lus.
+        """
+        sources = [self.index.file_path(s) for s in self.index.overlapping(start, end)]
+        for path in sources:
+            yield from self._filter(read_segment(path), start, end)
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                yield from self._filter(f, start, end)
+        except FileNotFoundError:
+            return
+
+    @staticmethod
+    def _filter(lines, start, end):
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if start is not None or end is not None:
+                ts = _epoch(entry.get("timestamp"))
+                if (start is not None and ts < start) or (end is not None and ts >= end):
+                    continue
+            yield entry
+
+    def stats(self) -> dict:
+        stats = self.index.stats()
+        stats['active_bytes'] = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        stats['max_bytes'] = self.max_bytes
+        stats['max_age_s'] = self.max_age
+        return stats
+
+    def close(self):
+        pass
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    ts REAL NOT NULL,
+    session_id TEXT,
+    model TEXT,
+    route TEXT,
+    user TEXT NOT NULL,
+    bot TEXT NOT NULL,
+    metadata TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_ts ON conversations (ts);
+CREATE INDEX IF NOT EXISTS idx_conversations_session ON conversations (session_id, ts);
+CREATE INDEX IF NOT EXISTS idx_conversations_model ON conversations (model, ts);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    entries INTEGER NOT NULL,
+    imported_at TEXT NOT NULL
+);
+"""
+
+# "always" / "interval" / "never" (politique fsync du writer) -> PRAGMA synchronous
+SYNCHRONOUS = {"always": "FULL", "interval": "NORMAL", "never": "OFF"}
+
+
+def _epoch(timestamp):
+    try:
+        return datetime.fromisoformat(timestamp).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def _row_to_entry(row) -> dict:
+    return {
+        "timestamp": row[0],
+        "user": row[1],
+        "bot": row[2],
+        "metadata": json.loads(row[3] or "{}")
+    }
+
+
+class SqliteStore:
+    """Journal des conversations dans SQLite (WAL)
+
+    Une connexion par thread: les lecteurs ne bloquent pas l'écrivain
+    (journal WAL), et les ajouts arrivent par lots d'une seule transaction
+    depuis le thread du ConversationWriter. Un lot `sync` est validé en
+    synchronous=FULL (WAL synchronisé sur disque) quel que soit le réglage
+    courant; `close()` ferme les connexions de tous les threads.
+
+    `read_only`: lecture seule (outils d'analyse), sans créer ni modifier
+    la base; une base absente se lit comme vide.
+    """
+
+    COLUMNS = "timestamp, user, bot, metadata"
+
+    def __init__(self, path, fsync: str = "interval", read_only: bool = False):
+        self.path = str(path)
+        self.synchronous = SYNCHRONOUS.get(fsync, "NORMAL")
+        self.read_only = read_only
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._generation = 0
+        if not read_only:
+            with self._conn() as conn:
+                conn.executescript(SCHEMA)
+
+    def _connect(self, **kwargs) -> sqlite3.Connection:
+        if not self.read_only:
+            return sqlite3.connect(self.path, timeout=10, **kwargs)
+        if not os.path.exists(self.path):
+            conn = sqlite3.connect(":memory:", **kwargs)
+            conn.executescript(SCHEMA)
+            return conn
+        return sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True, timeout=10, **kwargs)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # Connexion fermée par close() depuis un autre thread: rouverte
+        if conn is None or self._local.generation != self._generation:
+            # check_same_thread=False: close() peut la fermer depuis un autre thread
+            conn = self._connect(check_same_thread=False)
+            if not self.read_only:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.execute("PRAGMA busy_timeout=5000")
+            with self._lock:
+                self._connections.append(conn)
+                self._local.generation = self._generation
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _insert(conn, entries: list):
+        rows = []
+        for entry in entries:
+            metadata = entry.get("metadata") or {}
+            rows.append((
+                entry["timestamp"],
+                _epoch(entry["timestamp"]),
+                metadata.get("session_id"),
+                metadata.get("model"),
+                metadata.get("route"),
+                entry.get("user", ""),
+                entry.get("bot", ""),
+                json.dumps(metadata)
+            ))
+        conn.executemany(
+            "INSERT INTO conversations (timestamp, ts, session_id, model, route, user, bot, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+
+    def append_many(self, entries: list, sync: bool = False):
+        """Ajoute un lot en une transaction (durabilité réglée par PRAGMA
+        synchronous, forcée à FULL pour un lot `sync`)"""
+        conn = self._conn()
+        if not sync or self.synchronous in ("FULL", "EXTRA"):
+            with conn:
+                self._insert(conn, entries)
+            return
+        conn.execute("PRAGMA synchronous=FULL")
+        try:
+            with conn:
+                self._insert(conn, entries)
+        finally:
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+
+    def sync(self):
+        """Reporte le WAL dans la base, synchronisée sur disque (lots écrits sans sync)"""
+        self._conn().execute("PRAGMA wal_checkpoint(FULL)")
+
+    def recent(self, limit: int) -> list:
+        rows = self._conn().execute(
+            f"SELECT {self.COLUMNS} FROM conversations ORDER BY id DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [_row_to_entry(row) for row in reversed(rows)]
+
+    def by_session(self, session_id: str, limit: int = 20) -> list:
+        rows = self._conn().execute(
+            f"SELECT {self.COLUMNS} FROM conversations WHERE session_id = ? ORDER BY ts DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+        return [_row_to_entry(row) for row in reversed(rows)]
+
+    def between(self, start: float, end: float = None, model: str = None) -> list:
+        """Entrées entre deux dates (epoch), éventuellement pour un modèle"""
+        query = f"SELECT {self.COLUMNS} FROM conversations WHERE ts >= ? AND ts < ?"
+        params = [start, end if end is not None else time.time() + 1]
+        if model:
+            query += " AND model = ?"
+            params.append(model)
+        rows = self._conn().execute(query + " ORDER BY ts", params).fetchall()
+        return [_row_to_entry(row) for row in rows]
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def iter_entries(self, start: float = None, end: float = None):
+        """Parcourt les entrées dans l'ordre, en streaming, sur [start, end) (epoch)"""
+        query = f"SELECT {self.COLUMNS} FROM conversations WHERE ts >= ? AND ts < ? ORDER BY ts"
+        params = (start if start is not None else 0, end if end is not None else float("inf"))
+        # Connexion dédiée: le curseur reste ouvert pendant tout le parcours
+        conn = self._connect()
+        try:
+            for row in conn.execute(query, params):
+                yield _row_to_entry(row)
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        return {
+            'records': self.count(),
+            'bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        }
+
+    def import_jsonl(self, jsonl_path, batch_size: int = 1000) -> int:
+        """Importe un journal JSONL une seule fois (source et taille mémorisées)
+
+        Retourne le nombre d'entrées importées (0 si déjà fait).
+        """
+        jsonl_path = str(jsonl_path)
+        if not os.path.exists(jsonl_path):
+            return 0
+        size = os.path.getsize(jsonl_path)
+        source = os.path.abspath(jsonl_path)
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM imports WHERE source = ?", (source,)).fetchone():
+            return 0
+
+        # Segments archivés compris, en une seule transaction: un import
+        # interrompu ne laisse rien
+        imported = 0
+        batch = []
+        with conn:
+            for entry in JsonlStore(jsonl_path, read_only=True).iter_entries():
+                if "timestamp" not in entry:
+                    continue
+                batch.append(entry)
+                if len(batch) >= batch_size:
+                    self._insert(conn, batch)
+                    imported += len(batch)
+                    batch = []
+            if batch:
+                self._insert(conn, batch)
+                imported += len(batch)
+            conn.execute(
+                "INSERT INTO imports (source, size, entries, imported_at) VALUES (?, ?, ?, ?)",
+                (source, size, imported, datetime.now().isoformat())
+            )
+        return imported
+
+    def close(self):
+        """Ferme les connexions de tous les threads"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+            self._generation += 1
+        for conn in connections:
+            conn.close()
+        self._local.conn = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import du journal JSONL dans SQLite")
+    parser.add_argument("command", choices=["import"])
+    parser.add_argument("--jsonl", default="data/memory/conversations.json")
+    parser.add_argument("--db", default="data/memory/conversations.db")
+    args = parser.parse_args()
+
+    store = SqliteStore(args.db)
+    start = time.perf_counter()
+    imported = store.import_jsonl(args.jsonl)
+    if imported:
+        print(f"✅ {imported} entrées importées dans {args.db} ({time.perf_counter() - start:.2f}s)")
+    else:
+        print(f"ℹ️ Rien à importer ({args.jsonl} absent ou déjà importé)")
+    print(f"📊 {store.count()} conversations dans {args.db}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from collections import OrderedDict
+import json
+import os
+import threading
+import time
+
+from .sessions import SessionStore
+
+# Tours en attente déclenchant un nouveau résumé (un appel au modèle par lot)
+SUMMARY_BATCH_TURNS = 3
+
+# Réécriture du fichier de résumés quand il contient plus de lignes que de
+# sessions distinctes, dans ce rapport
+COMPACT_RATIO = 4
+
+
+class SessionSummarizer:
+    """Résumé glissant des sessions longues, calculé en tâche de fond
+
+    Quand une session a au moins `batch_turns` tours sortis de sa fenêtre
+    (SessionStore), un thread dédié appelle `summarize(résumé, tours)` pour
+    fondre ces tours dans le résumé courant, `batch_turns` à la fois pour
+    que la demande tienne dans la fenêtre du modèle. Rien n'est fait sur le chemin
+    des requêtes: en attendant, le prompt utilise l'ancien résumé.
+
+    Les résumés sont ajoutés à summaries.jsonl, à côté du journal des
+    conversations ({session_id, summary, through, timestamp}); au
+    redémarrage, le dernier résumé de chaque session est rechargé et seuls
+    les tours postérieurs à `through` sont rejoués.
+    """
+
+    def __init__(self, sessions: SessionStore, summarize, path, batch_turns: int = SUMMARY_BATCH_TURNS):
+        self.sessions = sessions
+        self.summarize = summarize
+        self.path = str(path)
+        self.batch_turns = batch_turns
+        self._queue = OrderedDict()  # sessions à résumer, sans doublon
+        self._cond = threading.Condition()
+        self._closed = False
+        self._file_lock = threading.Lock()
+        self._stats = {
+            'summaries': 0,
+            'errors': 0,
+            'summarized_turns': 0,
+            'last_ms': None,
+            'total_ms': 0.0
+        }
+        self._thread = threading.Thread(target=self._run, daemon=True, name="session-summarizer")
+        self._thread.start()
+
+    def load(self) -> dict:
+        """Dernier résumé de chaque session: {session_id: {'summary', 'through'}}"""
+        latest = {}
+        lines = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        latest[record['session_id']] = {
+                            'summary': record['summary'],
+                            'through': record['through']
+                        }
+                        lines += 1
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+        except FileNotFoundError:
+            return {}
+        if lines > COMPACT_RATIO * max(len(latest), 1):
+            self._compact(latest)
+        return latest
+
+    def _compact(self, latest: dict):
+        partial = f"{self.path}.tmp"
+        with self._file_lock:
+            with open(partial, "w", encoding="utf-8") as f:
+                for session_id, saved in latest.items():
+                    f.write(json.dumps({'session_id': session_id, **saved}, ensure_ascii=False) + "\n")
+            os.replace(partial, self.path)
+
+    def notify(self, session_id: str):
+        """À appeler après chaque tour: programme un résumé si assez de tours attendent"""
+        if not session_id or self.sessions.pending_turns(session_id) < self.batch_turns:
+            return
+        with self._cond:
+            if session_id not in self._queue:
+                self._queue[session_id] = True
+                self._cond.notify()
+
+    def notify_all(self):
+        for session_id in self.sessions.pending_sessions():
+            self.notify(session_id)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                session_id, _ = self._queue.popitem(last=False)
+            self._summarize(session_id)
+
+    def _summarize(self, session_id: str):
+        job = self.sessions.summary_input(session_id, limit=self.batch_turns)
+        if job is None:
+            return
+        previous, turns, through = job
+        start = time.time()
+        try:
+            summary = (self.summarize(previous, turns) or "").strip()
+            if not summary:
+                raise ValueError("résumé vide")
+        except Exception as e:
+            self._stats['errors'] += 1
+            print(f"⚠️ Résumé de la session {session_id[:8]} impossible: {e}")
+            return
+        elapsed_ms = (time.time() - start) * 1000
+
+        if not self.sessions.commit_summary(session_id, summary, len(turns), through):
+            return
+        record = {
+            'session_id': session_id,
+            'summary': summary,
+            'through': through,
+            'timestamp': time.time()
+        }
+        with self._file_lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._stats['summaries'] += 1
+        self._stats['summarized_turns'] += len(turns)
+        self._stats['last_ms'] = round(elapsed_ms, 1)
+        self._stats['total_ms'] += elapsed_ms
+        # Tours arrivés pendant le résumé
+        self.notify(session_id)
+
+    def close(self, timeout: float = 1.0):
+        """Arrête le thread; les tours non résumés le seront après redémarrage"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        with self._cond:
+            stats['queue_depth'] = len(self._queue)
+        stats['total_ms'] = round(stats['total_ms'], 1)
+        stats['batch_turns'] = self.batch_turns
+        return stats
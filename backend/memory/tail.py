@@ -0,0 +1,36 @@
+import os
+
+BLOCK_SIZE = 64 * 1024
+
+
+def tail_lines(path, limit: int, block_size: int = BLOCK_SIZE) -> list:
+    """Dernières `limit` lignes d'un fichier, lues par blocs depuis la fin
+
+    Le coût dépend de la taille des dernières lignes, pas de celle du
+    fichier: latence et mémoire restent constantes quand le journal grossit.
+    Retourne les lignes (sans fin de ligne) dans l'ordre du fichier; les
+    lignes vides sont ignorées.
+    """
+    if limit <= 0:
+        return []
+
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        lines = []
+        # Lecture jusqu'à `limit` lignes non vides complètes (ou début du fichier)
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+            lines = data.split(b"\n")
+            if position > 0:
+                # La première ligne du tampon peut être incomplète
+                lines = lines[1:]
+            lines = [line for line in lines if line.strip()]
+            if len(lines) >= limit:
+                break
+
+    return [line.decode("utf-8", errors="replace") for line in lines[-limit:]]
@@ -1,32 +1,154 @@
 from tabulate import tabulate
 from pathlib import Path
-import json
+import argparse
+
+from .analytics import ConversationAnalytics
+from .stores import JsonlStore, SqliteStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Lignes accumulées avant écriture d'un groupe Parquet (mémoire bornée)
+EXPORT_BATCH_SIZE = 10000
+
+EXPORT_COLUMNS = [
+    "timestamp", "session_id", "model", "route", "rag_used",
+    "has_image", "user", "bot", "user_chars", "bot_chars"
+]
 
 class MemoryVisualizer:
-    def __init__(self, memory_dir="data/memory"):
+    def __init__(self, memory_dir="data/memory", backend="jsonl"):
         self.memory_dir = Path(memory_dir)
-    
+        self.backend = backend
+
+    def _store(self):
+        if self.backend == "sqlite":
+            return SqliteStore(self.memory_dir / "conversations.db", read_only=True)
+        return JsonlStore(self.memory_dir / "conversations.json", read_only=True)
+
     def show_conversations(self, limit=5):
-        conv_file = self.memory_dir / "conversations.json"
-        if not conv_file.exists():
+        # Fichier actif lu depuis la fin, puis segments archivés si nécessaire
+        conversations = self._store().recent(limit)
+        if not conversations:
+            print("Aucune conversation enregistrée")
+            return
+
+        table = []
+        for i, conv in enumerate(reversed(conversations), 1):
+            table.append([
+                i,
+                conv["timestamp"],
+                conv["user"][:30] + "...",
+                conv["bot"][:30] + "..."
+            ])
+
+        print(tabulate(
+            table,
+            headers=["#", "Timestamp", "User", "Bot"],
+            tablefmt="pretty"
+        ))
+
+    def analyze(self, start: float = None, end: float = None, bucket: str = "day", top: int = 10) -> dict:
+        """Statistiques sur tout l'historique (segments compris), en une passe"""
+        analytics = ConversationAnalytics(bucket=bucket)
+        analytics.consume(self._store().iter_entries(start, end))
+        return analytics.report(top)
+
+    def show_analytics(self, start: float = None, end: float = None, bucket: str = "day", top: int = 10):
+        report = self.analyze(start, end, bucket, top)
+        if not report['total']:
             print("Aucune conversation enregistrée")
             return
-        
-        with open(conv_file, "r") as f:
-            lines = f.readlines()[-limit:]
-            conversations = [json.loads(line) for line in lines]
-            
-            table = []
-            for i, conv in enumerate(reversed(conversations), 1):
-                table.append([
-                    i,
-                    conv["timestamp"],
-                    conv["user"][:30] + "...",
-                    conv["bot"][:30] + "..."
-                ])
-            
-            print(tabulate(
-                table,
-                headers=["#", "Timestamp", "User", "Bot"],
-                tablefmt="pretty"
-            ))
\ No newline at end of file
+
+        print(f"📊 {report['total']} conversations du {report['first']} au {report['last']}")
+        print(f"   RAG utilisé: {report['rag_rate']:.1%} - avec image: {report['image_share']:.1%}")
+        print(tabulate(report['volume'].items(), headers=["Période", "Requêtes"], tablefmt="pretty"))
+        print(tabulate(report['models'].items(), headers=["Modèle", "Requêtes"], tablefmt="pretty"))
+        if report['routes']:
+            print(tabulate(report['routes'].items(), headers=["Route", "Requêtes"], tablefmt="pretty"))
+        print(tabulate(
+            [(question[:60], count) for question, count in report['top_questions']],
+            headers=["Question fréquente", "≥ Occurrences"],
+            tablefmt="pretty"
+        ))
+
+    def export_columnar(self, path, start: float = None, end: float = None) -> int:
+        """Exporte l'historique en Parquet, par groupes de lignes (mémoire bornée)
+
+        Retourne le nombre de lignes écrites. Nécessite pyarrow.
+        """
+        if pa is None:
+            raise RuntimeError("L'export Parquet nécessite pyarrow: pip install pyarrow")
+
+        schema = pa.schema([
+            ("timestamp", pa.string()),
+            ("session_id", pa.string()),
+            ("model", pa.string()),
+            ("route", pa.string()),
+            ("rag_used", pa.bool_()),
+            ("has_image", pa.bool_()),
+            ("user", pa.string()),
+            ("bot", pa.string()),
+            ("user_chars", pa.int32()),
+            ("bot_chars", pa.int32())
+        ])
+        columns = {name: [] for name in EXPORT_COLUMNS}
+        written = 0
+
+        def flush(writer):
+            writer.write_table(pa.table(columns, schema=schema))
+            for values in columns.values():
+                values.clear()
+
+        with pq.ParquetWriter(str(path), schema, compression="zstd") as writer:
+            for entry in self._store().iter_entries(start, end):
+                metadata = entry.get("metadata") or {}
+                user, bot = entry.get("user") or "", entry.get("bot") or ""
+                row = {
+                    "timestamp": entry.get("timestamp"),
+                    "session_id": metadata.get("session_id"),
+                    "model": metadata.get("model"),
+                    "route": metadata.get("route"),
+                    "rag_used": bool(metadata.get("rag_used")),
+                    "has_image": bool(metadata.get("has_image")),
+                    "user": user,
+                    "bot": bot,
+                    "user_chars": len(user),
+                    "bot_chars": len(bot)
+                }
+                for name in EXPORT_COLUMNS:
+                    columns[name].append(row[name])
+                written += 1
+                if len(columns["timestamp"]) >= EXPORT_BATCH_SIZE:
+                    flush(writer)
+            if columns["timestamp"]:
+                flush(writer)
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historique et statistiques des conversations")
+    parser.add_argument("--memory-dir", default="data/memory")
+    parser.add_argument("--backend", choices=["jsonl", "sqlite"], default="jsonl")
+    parser.add_argument("--last", type=int, default=5, help="Nombre de conversations récentes affichées")
+    parser.add_argument("--analytics", action="store_true", help="Statistiques sur tout l'historique")
+    parser.add_argument("--bucket", choices=["hour", "day", "month"], default="day")
+    parser.add_argument("--top", type=int, default=10, help="Questions fréquentes affichées")
+    parser.add_argument("--export", help="Exporte l'historique dans ce fichier Parquet")
+    args = parser.parse_args()
+
+    viz = MemoryVisualizer(args.memory_dir, backend=args.backend)
+    if args.export:
+        rows = viz.export_columnar(args.export)
+        print(f"✅ {rows} conversations exportées dans {args.export}")
+    elif args.analytics:
+        viz.show_analytics(bucket=args.bucket, top=args.top)
+    else:
+        viz.show_conversations(args.last)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+from collections import deque
+import atexit
+import queue
+import threading
+import time
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class ConversationWriter:
+    """Écriture différée (write-behind) du journal des conversations
+
+    Les requêtes ne font que déposer l'entrée dans une file; un thread
+    unique regroupe les entrées et les écrit en un seul append, dès que
+    `batch_size` entrées attendent ou au plus tard après `flush_interval`
+    secondes. Avoir un seul écrivain évite que des lignes de threads
+    concurrents s'entremêlent dans le fichier.
+
+    Politique fsync: "always" après chaque lot, "interval" au plus toutes
+    les `fsync_interval` secondes, "never" (laissé au système). La file est
+    vidée à l'arrêt (close(), appelé aussi par atexit) et le journal
+    synchronisé quelle que soit la politique. Si la file est pleine,
+    l'entrée est écrite directement plutôt que perdue.
+
+    `store` est le moteur de stockage (JsonlStore ou SqliteStore, voir
+    memory.stores) qui reçoit les lots via append_many(entries, sync) et
+    synchronise les lots déjà écrits via sync().
+    """
+
+    def __init__(self, store, batch_size: int = 64, flush_interval: float = 1.0,
+                 fsync: str = "interval", fsync_interval: float = 5.0, max_queue: int = 10000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync doit valoir {', '.join(FSYNC_POLICIES)}")
+        self.store = store
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._write_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+        self._flush_ms = deque(maxlen=256)
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'fsyncs': 0,
+            'direct_writes': 0,
+            'errors': 0,
+            'max_queue_depth': 0
+        }
+        self._thread = threading.Thread(target=self._run, name="conversation-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, entry: dict):
+        """Dépose une entrée; retour immédiat sauf si la file est pleine"""
+        if self._closed.is_set():
+            self._write_direct(entry)
+            return
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._write_direct(entry)
+            return
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats['enqueued'] += 1
+            if depth > self._stats['max_queue_depth']:
+                self._stats['max_queue_depth'] = depth
+
+    def _write_direct(self, entry):
+        with self._stats_lock:
+            self._stats['direct_writes'] += 1
+        self._flush([entry], force_fsync=self._closed.is_set())
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                entry = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                entry = None
+            else:
+                if entry is None:  # réveil de close()
+                    self._queue.task_done()
+
+            if entry is not None:
+                batch.append(entry)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            stopping = self._closed.is_set() and self._queue.empty()
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline or stopping):
+                self._flush(batch, force_fsync=stopping)
+                for _ in batch:
+                    self._queue.task_done()
+                batch = []
+                deadline = None
+
+            if stopping:
+                return
+
+    def _flush(self, entries, force_fsync=False):
+        if not entries:
+            return
+        start = time.perf_counter()
+        synced = False
+        try:
+            with self._write_lock:
+                now = time.monotonic()
+                synced = force_fsync or self.fsync == "always" or (
+                    self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval
+                )
+                self.store.append_many(entries, sync=synced)
+                if synced:
+                    self._last_fsync = now
+                self._unsynced = not synced
+        except Exception as e:
+            print(f"⚠️ Écriture du journal des conversations échouée: {e}")
+            with self._stats_lock:
+                self._stats['errors'] += 1
+            return
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._stats_lock:
+            self._stats['fsyncs'] += int(synced)
+            self._stats['written'] += len(entries)
+            self._stats['batches'] += 1
+            self._flush_ms.append(elapsed_ms)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Attend que les entrées en file soient écrites"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._queue.unfinished_tasks
+
+    def close(self, timeout: float = 10.0):
+        """Vide la file, synchronise le fichier et arrête le thread écrivain"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        # Réveille le thread s'il attend sans échéance
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+        # Entrées déposées pendant l'arrêt
+        leftover = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None:
+                leftover.append(entry)
+            self._queue.task_done()
+        self._flush(leftover, force_fsync=True)
+        if self._unsynced:
+            self._sync()
+
+    def _sync(self):
+        """Synchronise les lots écrits sans fsync (arrêt)"""
+        try:
+            with self._write_lock:
+                self.store.sync()
+                self._last_fsync = time.monotonic()
+                self._unsynced = False
+        except Exception as e:
+            print(f"⚠️ Synchronisation du journal des conversations échouée: {e}")
+            with self._stats_lock:
+                self._stats['errors'] += 1
+            return
+        with self._stats_lock:
+            self._stats['fsyncs'] += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+            flush_ms = sorted(self._flush_ms)
+        stats.update({
+            'queue_depth': self._queue.qsize(),
+            'fsync_policy': self.fsync,
+            'batch_size': self.batch_size,
+            'flush_interval_s': self.flush_interval,
+            'flush_ms': {
+                'p50': round(flush_ms[len(flush_ms) // 2], 3),
+                'p95': round(flush_ms[min(len(flush_ms) - 1, int(len(flush_ms) * 0.95))], 3),
+                'max': round(flush_ms[-1], 3)
+            } if flush_ms else None
+        })
+        return stats
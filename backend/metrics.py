@@ -0,0 +1,77 @@
+"""
+Métriques en mémoire du serveur (compteurs, jauges, latences)
+"""
+
+from collections import deque
+import math
+import threading
+import time
+
+# Nombre d'échantillons conservés par série de latence
+MAX_SAMPLES = 1000
+
+
+def _percentile(ordered, pct):
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Metrics:
+    """Registre de métriques thread-safe, exposé par /api/metrics"""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._samples = {}
+        self._totals = {}
+
+    def incr(self, name: str, value: float = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """Ajoute un échantillon (ex. latence en ms) à une série"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.max_samples)
+            samples.append(value)
+            count, total = self._totals.get(name, (0, 0.0))
+            self._totals[name] = (count + 1, total + value)
+
+    def summary(self, name: str) -> dict:
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+            count, total = self._totals.get(name, (0, 0.0))
+        if not samples:
+            return None
+        return {
+            'count': count,
+            'mean': round(total / count, 2),
+            'p50': round(_percentile(samples, 50), 2),
+            'p95': round(_percentile(samples, 95), 2),
+            'p99': round(_percentile(samples, 99), 2),
+            'max': round(samples[-1], 2)
+        }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            names = list(self._samples)
+        return {
+            'uptime_s': round(time.time() - self.started_at, 1),
+            'counters': counters,
+            'gauges': gauges,
+            'latencies': {name: self.summary(name) for name in names}
+        }
+
+
+metrics = Metrics()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Profileur de débit Ollama (tokens/s, TTFT, balayage de concurrence)
+
+Lance des charges de génération et d'embedding contrôlées contre l'Ollama
+configuré, en faisant varier la concurrence, num_ctx et num_predict, et
+relève les champs de timing renvoyés par Ollama (prompt_eval_duration,
+eval_count, eval_duration, load_duration). Sert à choisir num_ctx et les
+tailles de lots de chat() et de VectorDB à partir de mesures. Chaque
+prompt reçoit un préfixe unique (pas de cache de prompt) et le modèle est
+préchargé pour chaque num_ctx, hors mesures.
+
+Exemples (depuis backend/) :
+    python profile_ollama.py --model llava:latest --concurrency 1 2 4
+    python profile_ollama.py --num-ctx 2048 4096 --num-predict 128 512 --output profil.json
+    python profile_ollama.py --skip-generation --embed-batch 1 8 32 64
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+import requests
+from tabulate import tabulate
+
+DEFAULT_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+DEFAULT_PROMPT = (
+    "Contexte basé sur les documents disponibles:\n"
+    "Une licence en Sciences et Techniques est un cursus de formation comprenant un "
+    "ensemble cohérent de modules pris dans un ou plusieurs champs disciplinaires. "
+    "L'accès à la première année du tronc commun a lieu sur étude de dossier et/ou "
+    "par voie de test ou de concours, ouvert aux titulaires d'un baccalauréat.\n\n"
+    "Question de l'utilisateur: Quelles sont les conditions d'accès à la LST ?\n\n"
+    "Réponds en utilisant prioritairement les informations du contexte fourni."
+)
+
+EMBED_TEXT = (
+    "Un module est validé si sa note est supérieure ou égale à 10 sur 20 et si "
+    "aucune note de l'un des éléments le composant n'est inférieure à 6 sur 20."
+)
+
+
+def print_section(title):
+    print(f"\n{'='*60}", file=sys.stderr)
+    print(f"  {title}", file=sys.stderr)
+    print(f"{'='*60}", file=sys.stderr)
+
+
+def print_status(message, status="INFO"):
+    symbols = {"INFO": "ℹ️", "OK": "✅", "ERROR": "❌", "WARNING": "⚠️"}
+    print(f"{symbols.get(status, 'ℹ️')} {message}", file=sys.stderr)
+
+
+def ns_to_s(value):
+    return (value or 0) / 1e9
+
+
+def median(values):
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 2) if values else None
+
+
+def pick_model(host):
+    """Premier modèle llava installé (comme get_best_llava_model de app.py)"""
+    response = requests.get(f"{host}/api/tags", timeout=10)
+    response.raise_for_status()
+    names = [m.get('name', '') for m in response.json().get('models', [])]
+    llava = [n for n in names if 'llava' in n.lower()]
+    return (llava or names or [None])[0]
+
+
+def unique_prompt(prompt):
+    """Préfixe unique: le cache de prompt d'Ollama ne sert pas, chaque
+    requête évalue le prompt entier"""
+    return f"[{uuid.uuid4().hex[:12]}] {prompt}"
+
+
+def generate_once(host, model, prompt, num_ctx, num_predict, timeout):
+    """Une génération en streaming: TTFT mesuré côté client + champs de timing Ollama"""
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": True,
+        "options": {"temperature": 0.7, "num_ctx": num_ctx, "num_predict": num_predict}
+    }
+    start = time.perf_counter()
+    ttft = None
+    final = {}
+
+    with requests.post(f"{host}/api/chat", json=payload, stream=True, timeout=timeout) as response:
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}: {response.text[:200]}")
+        for line in response.iter_lines():
+            if not line:
+                continue
+            chunk = json.loads(line)
+            if ttft is None and chunk.get('message', {}).get('content'):
+                ttft = time.perf_counter() - start
+            if chunk.get('done'):
+                final = chunk
+
+    return {
+        'wall_s': time.perf_counter() - start,
+        'ttft_s': ttft,
+        'load_s': ns_to_s(final.get('load_duration')),
+        'prompt_eval_count': final.get('prompt_eval_count', 0),
+        'prompt_eval_s': ns_to_s(final.get('prompt_eval_duration')),
+        'eval_count': final.get('eval_count', 0),
+        'eval_s': ns_to_s(final.get('eval_duration'))
+    }
+
+
+def embed_once(host, model, batch_size, timeout):
+    payload = {"model": model, "input": [f"{EMBED_TEXT} ({i})" for i in range(batch_size)]}
+    start = time.perf_counter()
+    response = requests.post(f"{host}/api/embed", json=payload, timeout=timeout)
+    if response.status_code != 200:
+        raise Exception(f"HTTP {response.status_code}: {response.text[:200]}")
+    count = len(response.json().get('embeddings', []))
+    return {'wall_s': time.perf_counter() - start, 'texts': count}
+
+
+def run_concurrent(concurrency, total, func):
+    """Exécute `total` appels de `func` avec `concurrency` threads; retourne (résultats, erreurs, durée)"""
+    results, errors = [], []
+    lock = threading.Lock()
+    remaining = {'n': total}
+
+    def worker():
+        while True:
+            with lock:
+                if remaining['n'] <= 0:
+                    return
+                remaining['n'] -= 1
+            try:
+                result = func()
+                with lock:
+                    results.append(result)
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors, time.perf_counter() - start
+
+
+def profile_generation(args, model):
+    rows = []
+    for num_ctx in args.num_ctx:
+        if not args.no_warmup:
+            # Changer num_ctx recharge le modèle: chargement exclu des mesures
+            print_status(f"Préchargement du modèle (num_ctx={num_ctx}, exclu des mesures)...")
+            generate_once(args.host, model, "OK", num_ctx, 1, args.timeout)
+        for num_predict in args.num_predict:
+            for concurrency in args.concurrency:
+                total = max(args.requests, concurrency)
+                print_status(f"Génération num_ctx={num_ctx} num_predict={num_predict} concurrence={concurrency} ({total} requêtes)...")
+                results, errors, wall = run_concurrent(
+                    concurrency,
+                    total,
+                    lambda: generate_once(args.host, model, unique_prompt(args.prompt), num_ctx, num_predict, args.timeout)
+                )
+
+                prompt_rates = [r['prompt_eval_count'] / r['prompt_eval_s'] for r in results if r['prompt_eval_s']]
+                eval_rates = [r['eval_count'] / r['eval_s'] for r in results if r['eval_s']]
+                rows.append({
+                    'num_ctx': num_ctx,
+                    'num_predict': num_predict,
+                    'concurrency': concurrency,
+                    'requests': total,
+                    'errors': len(errors),
+                    'ttft_ms': median([r['ttft_s'] * 1000 for r in results if r['ttft_s'] is not None]),
+                    'server_ttft_ms': median([(r['load_s'] + r['prompt_eval_s']) * 1000 for r in results]),
+                    'load_ms': median([r['load_s'] * 1000 for r in results]),
+                    'prompt_tokens': median([r['prompt_eval_count'] for r in results]),
+                    'prompt_tok_s': median(prompt_rates),
+                    'eval_tok_s': median(eval_rates),
+                    'aggregate_tok_s': round(sum(r['eval_count'] for r in results) / wall, 2) if wall else None,
+                    'latency_ms': median([r['wall_s'] * 1000 for r in results])
+                })
+                if errors:
+                    print_status(f"{len(errors)} erreur(s): {errors[0]}", "WARNING")
+    return rows
+
+
+def profile_embeddings(args):
+    rows = []
+    for batch_size in args.embed_batch:
+        for concurrency in args.concurrency:
+            total = max(args.requests, concurrency)
+            print_status(f"Embeddings lot={batch_size} concurrence={concurrency} ({total} requêtes)...")
+            results, errors, wall = run_concurrent(
+                concurrency,
+                total,
+                lambda: embed_once(args.host, args.embedding_model, batch_size, args.timeout)
+            )
+            texts = sum(r['texts'] for r in results)
+            rows.append({
+                'batch_size': batch_size,
+                'concurrency': concurrency,
+                'requests': total,
+                'errors': len(errors),
+                'latency_ms': median([r['wall_s'] * 1000 for r in results]),
+                'texts_per_s': round(texts / wall, 2) if wall else None
+            })
+            if errors:
+                print_status(f"{len(errors)} erreur(s): {errors[0]}", "WARNING")
+    return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Profileur de débit Ollama")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--model", help="Modèle de génération (défaut: premier llava installé)")
+    parser.add_argument("--embedding-model", default="nomic-embed-text")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--num-ctx", type=int, nargs="+", default=[2048])
+    parser.add_argument("--num-predict", type=int, nargs="+", default=[128, 512])
+    parser.add_argument("--embed-batch", type=int, nargs="+", default=[1, 10, 32])
+    parser.add_argument("--requests", type=int, default=4, help="Requêtes par réglage (au moins la concurrence)")
+    parser.add_argument("--prompt", default=DEFAULT_PROMPT)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--no-warmup", action="store_true", help="Ne pas précharger les modèles avant les mesures")
+    parser.add_argument("--skip-generation", action="store_true")
+    parser.add_argument("--skip-embeddings", action="store_true")
+    parser.add_argument("--output", help="Écrit les résultats bruts en JSON dans ce fichier")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.host = args.host.rstrip("/")
+    report = {'host': args.host, 'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    if not args.skip_generation:
+        model = args.model or pick_model(args.host)
+        if not model:
+            print_status("Aucun modèle installé", "ERROR")
+            return False
+        report['model'] = model
+
+        print_section(f"GÉNÉRATION - {model}")
+        report['generation'] = profile_generation(args, model)
+        print(tabulate(report['generation'], headers="keys", tablefmt="pretty"))
+
+    if not args.skip_embeddings:
+        report['embedding_model'] = args.embedding_model
+        print_section(f"EMBEDDINGS - {args.embedding_model}")
+        if not args.no_warmup:
+            embed_once(args.host, args.embedding_model, 1, args.timeout)
+
+        report['embeddings'] = profile_embeddings(args)
+        print(tabulate(report['embeddings'], headers="keys", tablefmt="pretty"))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print_status(f"Résultats écrits dans {args.output}", "OK")
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from collections import OrderedDict
+import json
+import re
+import threading
+import time
+
+
+def normalize_query(query: str) -> str:
+    """Normalise une question pour la clé de cache (casse, espaces, ponctuation finale)"""
+    query = " ".join(query.lower().split())
+    return re.sub(r"[\s?!.…]+$", "", query)
+
+
+class LRUCache:
+    """Cache LRU borné et thread-safe, avec compteurs de hits/misses"""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+class RetrievalCache(LRUCache):
+    """Cache (requête normalisée, k, filtres, version d'index) -> ids des chunks classés
+
+    Seuls les ids et scores sont conservés: le contenu est relu depuis Chroma
+    par id, sans embedding ni recherche ANN. Le cache est vidé dès que la
+    version de l'index change.
+    """
+
+    def __init__(self, max_entries: int = 512):
+        super().__init__(max_entries)
+        self.index_version = None
+
+    def sync_version(self, index_version):
+        """Invalide le cache si l'index a été reconstruit depuis le dernier appel"""
+        if index_version != self.index_version:
+            self.clear()
+            self.index_version = index_version
+
+    @staticmethod
+    def make_key(query: str, k: int, filters: dict, index_version, **params) -> tuple:
+        filters_key = json.dumps(filters, sort_keys=True, default=list) if filters else None
+        params_key = tuple(sorted(params.items()))
+        return (normalize_query(query), k, filters_key, index_version, params_key)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats['index_version'] = self.index_version
+        return stats
+
+
+class AnswerCache(LRUCache):
+    """Cache (question normalisée, modèle, version d'index) -> réponse générée
+
+    Réservé aux premières questions d'une conversation (sans historique ni
+    image), dont la réponse ne dépend que de la question et des documents.
+    Les réponses expirent après `ttl` secondes (0 = cache désactivé) et le
+    cache est vidé quand l'index change.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600):
+        super().__init__(max_entries)
+        self.ttl = ttl
+        self.index_version = None
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def sync_version(self, index_version):
+        if index_version != self.index_version:
+            self.clear()
+            self.index_version = index_version
+
+    @staticmethod
+    def make_key(question: str, model: str, index_version) -> tuple:
+        return (normalize_query(question), model, index_version)
+
+    def get(self, key):
+        value = super().get(key)
+        if value is not None and time.time() - value['created'] > self.ttl:
+            with self._lock:
+                self._entries.pop(key, None)
+                self.hits -= 1
+                self.misses += 1
+                self.expirations += 1
+            return None
+        return value
+
+    def put(self, key, answer: str, **details):
+        value = {'answer': answer, 'created': time.time()}
+        value.update(details)
+        super().put(key, value)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update({
+            'ttl': self.ttl,
+            'expirations': self.expirations,
+            'index_version': self.index_version
+        })
+        return stats
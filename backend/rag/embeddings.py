@@ -0,0 +1,53 @@
+import hashlib
+import math
+import re
+import unicodedata
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
+
+class HashingEmbeddings(Embeddings):
+    """Embeddings locaux déterministes (hachage de mots et trigrammes)
+
+    Remplace OllamaEmbeddings pour les benchmarks et les tests hors ligne:
+    aucun appel réseau, mêmes vecteurs d'une exécution à l'autre. La qualité
+    sémantique est faible, mais suffisante pour comparer des réglages de
+    découpage ou d'index entre deux exécutions.
+    """
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+        self.model = f"hashing-{dimension}"
+
+    @staticmethod
+    def _features(text: str) -> list:
+        text = unicodedata.normalize("NFKD", text.lower())
+        text = "".join(c for c in text if not unicodedata.combining(c))
+        words = re.findall(r"\w+", text)
+
+        features = [f"w:{w}" for w in words]
+        for word in words:
+            padded = f"#{word}#"
+            features.extend(f"t:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def _embed(self, text: str) -> list:
+        vector = [0.0] * self.dimension
+        for feature in self._features(text):
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimension
+            sign = 1.0 if digest[4] & 1 else -1.0
+            # Les mots entiers pèsent plus que les trigrammes
+            vector[index] += sign * (2.0 if feature.startswith("w:") else 1.0)
+
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: list) -> list:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list:
+        return self._embed(text)
@@ -16,13 +16,13 @@ logger = logging.getLogger(__name__)
 class DocumentLoader:
     """Chargeur de documents multi-formats"""
     
-    def __init__(self, data_dir="data/documents"):
+    def __init__(self, data_dir="data/documents", chunk_size=1000, chunk_overlap=200):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
             separators=["\n\n", "\n", " ", ""]
         )
         
@@ -1,9 +1,450 @@
+import json
+import re
+import unicodedata
+
+import numpy as np
+
+try:
+    from langchain_core.documents import Document
+except ImportError:
+    from langchain.schema import Document
+
+from .cache import LRUCache, RetrievalCache, normalize_query
 from .vector_db import VectorDB
 
+# Sélection adaptative des chunks
+FETCH_K = 12                # candidats récupérés avant filtrage
+MIN_RELEVANCE = 0.45        # similarité cosinus minimale avec la requête
+MMR_LAMBDA = 0.7            # 1.0 = pertinence pure, 0.0 = diversité pure
+DUPLICATE_SIMILARITY = 0.95 # au-delà, deux chunks sont considérés comme doublons
+CHARS_PER_TOKEN = 3.5       # estimation grossière pour du français
+
+# Routage des requêtes: mention d'une filière -> document source correspondant.
+# Les sigles courts (CI, LE, MS) sont sensibles à la casse pour ne pas
+# confondre "le" ou "ms" avec une filière.
+PROGRAM_ROUTES = {
+    "LST.pdf": {
+        "acronyms": ["LST"],
+        "phrases": ["licence en sciences et techniques", "licence sciences et techniques"],
+    },
+    "MST.pdf": {
+        "acronyms": ["MST"],
+        "phrases": ["master en sciences et techniques", "master sciences et techniques"],
+    },
+    "DUT.pdf": {
+        "acronyms": ["DUT"],
+        "phrases": ["diplome universitaire de technologie"],
+    },
+    "CI.pdf": {
+        "acronyms": ["CI"],
+        "phrases": ["cycle ingenieur", "filiere ingenieur", "diplome d'ingenieur"],
+    },
+    "LE.pdf": {
+        "acronyms": ["LE"],
+        "phrases": ["licence d'education", "licence education"],
+    },
+    "MS.pdf": {
+        "acronyms": ["MS"],
+        "phrases": ["master specialise"],
+    },
+    "DENCG.pdf": {
+        "acronyms": ["DENCG", "ENCG"],
+        "phrases": ["diplome de l'encg"],
+    },
+    "2APCI.pdf": {
+        "acronyms": ["2APCI", "2AP"],
+        "phrases": ["annees preparatoires au cycle ingenieur", "classes preparatoires au cycle ingenieur",
+                    "annees preparatoires", "classes preparatoires"],
+    },
+    "Formation Continue.pdf": {
+        "acronyms": [],
+        "phrases": ["formation continue"],
+    },
+}
+
+
+def _normalize(text: str) -> str:
+    """Minuscules sans accents, apostrophes unifiées"""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return text.lower().replace("’", "'")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation du nombre de tokens d'un texte (sans tokenizer)"""
+    if not text:
+        return 0
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def _cosine(matrix, vector):
+    """Similarité cosinus entre chaque ligne de `matrix` et `vector`"""
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(vector)
+    norms[norms == 0] = 1e-12
+    return (matrix @ vector) / norms
+
+
+def mmr_select(query_embedding, embeddings, k, lambda_mult=MMR_LAMBDA,
+               min_relevance=MIN_RELEVANCE, duplicate_similarity=DUPLICATE_SIMILARITY):
+    """Sélection par maximal marginal relevance
+
+    Retourne les indices choisis et leur score de pertinence. Les candidats
+    sous `min_relevance` sont écartés, ainsi que ceux quasi identiques à un
+    chunk déjà retenu (chevauchement du découpage).
+    """
+    if len(embeddings) == 0 or k <= 0:
+        return []
+
+    query = np.asarray(query_embedding, dtype=np.float32)
+    candidates = np.asarray(embeddings, dtype=np.float32)
+    relevance = _cosine(candidates, query)
+
+    unit = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    pairwise = unit @ unit.T
+
+    remaining = [i for i in np.argsort(-relevance) if relevance[i] >= min_relevance]
+    selected = []
+
+    while remaining and len(selected) < k:
+        if selected:
+            redundancy = pairwise[remaining][:, selected].max(axis=1)
+        else:
+            redundancy = np.zeros(len(remaining))
+
+        scores = lambda_mult * relevance[remaining] - (1 - lambda_mult) * redundancy
+        best_pos = int(np.argmax(scores))
+        best = remaining.pop(best_pos)
+
+        if redundancy[best_pos] >= duplicate_similarity:
+            continue
+        selected.append(best)
+
+    return [(int(i), float(relevance[i])) for i in selected]
+
+
+def _blank(match) -> str:
+    return " " * len(match.group(0))
+
+
+def _compile_routes():
+    """Prépare les motifs de routage, du plus long au plus court"""
+    patterns = []
+    for source_file, route in PROGRAM_ROUTES.items():
+        for acronym in route["acronyms"]:
+            # Les sigles de 3 caractères ou plus sont reconnus quelle que soit la casse
+            flags = re.IGNORECASE if len(acronym) >= 3 else 0
+            patterns.append((len(acronym), source_file, re.compile(rf"\b{re.escape(acronym)}\b", flags), False))
+        for phrase in route["phrases"]:
+            patterns.append((len(phrase), source_file, re.compile(rf"\b{re.escape(phrase)}\b"), True))
+    patterns.sort(key=lambda p: p[0], reverse=True)
+    return patterns
+
+
+_ROUTE_PATTERNS = _compile_routes()
+
+
+def detect_programs(query: str) -> list:
+    """Retourne les documents sources des filières mentionnées dans la requête"""
+    raw = query.replace("’", "'")
+    normalized = _normalize(query)
+    detected = []
+
+    for _, source_file, pattern, on_normalized in _ROUTE_PATTERNS:
+        text = normalized if on_normalized else raw
+        if pattern.search(text):
+            if source_file not in detected:
+                detected.append(source_file)
+            # Masquer la correspondance pour qu'une expression plus courte
+            # ("cycle ingénieur" dans "années préparatoires au cycle ingénieur")
+            # ne déclenche pas une seconde route
+            if on_normalized:
+                normalized = pattern.sub(_blank, normalized)
+            else:
+                raw = pattern.sub(_blank, raw)
+
+    return detected
+
+
+def build_filter(filters: dict = None):
+    """Convertit un dictionnaire de filtres en clause `where` Chroma"""
+    if not filters:
+        return None
+
+    clauses = []
+    for key, value in filters.items():
+        if isinstance(value, (list, tuple, set)):
+            values = list(value)
+            if len(values) == 1:
+                clauses.append({key: values[0]})
+            else:
+                clauses.append({key: {"$in": values}})
+        else:
+            clauses.append({key: value})
+
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
+
+
 class RagRetriever:
-    def __init__(self):
-        self.vector_db = VectorDB()
+    def __init__(self, vector_db: VectorDB = None, cache_size: int = 512):
+        self.vector_db = vector_db or VectorDB()
+        self.cache = RetrievalCache(max_entries=cache_size)
+        self.embedding_cache = LRUCache(max_entries=cache_size)
+
+    def embed_query(self, query: str) -> list:
+        """Embedding d'une requête, mis en cache (partagé avec le rappel des conversations)"""
+        key = normalize_query(query)
+        embedding = self.embedding_cache.get(key)
+        if embedding is None:
+            embedding = self.vector_db.embeddings.embed_query(query)
+            self.embedding_cache.put(key, embedding)
+        return embedding
+
+    def embed_queries(self, queries: list) -> list:
+        """Embeddings de plusieurs requêtes: cache d'abord, les autres en un appel"""
+        keys = [normalize_query(query) for query in queries]
+        embeddings = {key: self.embedding_cache.get(key) for key in keys}
+        missing = {}  # clé -> requête (doublons embeddés une fois)
+        for key, query in zip(keys, queries):
+            if embeddings[key] is None:
+                missing.setdefault(key, query)
+        if missing:
+            embedder = self.vector_db.embeddings
+            texts = list(missing.values())
+            if hasattr(embedder, "embed_queries"):
+                vectors = embedder.embed_queries(texts)
+            else:
+                vectors = [embedder.embed_query(text) for text in texts]
+            for key, vector in zip(missing, vectors):
+                embeddings[key] = vector
+                self.embedding_cache.put(key, vector)
+        return [embeddings[key] for key in keys]
+
+    def route(self, query: str) -> dict:
+        """Déduit les filtres de métadonnées à partir de la requête"""
+        programs = detect_programs(query)
+        if not programs:
+            return None
+        return {"source_file": programs}
+
+    def _query(self, embedding, n_results: int, where=None) -> dict:
+        """Requête Chroma brute: documents, métadonnées et vecteurs"""
+        return self._query_many([embedding], n_results, where=where)
+
+    def _query_many(self, embeddings: list, n_results: int, where=None) -> dict:
+        """Top-k vectorisé: une seule requête Chroma pour plusieurs vecteurs"""
+        collection = self.vector_db.vectorstore._collection
+        return collection.query(
+            query_embeddings=list(embeddings),
+            n_results=n_results,
+            where=where,
+            include=["documents", "metadatas", "embeddings"]
+        )
+
+    @staticmethod
+    def _row(results: dict, position: int) -> dict:
+        return {
+            field: results[field][position]
+            for field in ("ids", "documents", "metadatas", "embeddings")
+        }
+
+    def _fetch(self, ranked: list) -> list:
+        """Relit les chunks classés depuis Chroma par id (chemin du cache)"""
+        if not ranked:
+            return []
+
+        ids = [chunk_id for chunk_id, _ in ranked]
+        collection = self.vector_db.vectorstore._collection
+        rows = collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: (content, metadata)
+            for chunk_id, content, metadata in zip(rows["ids"], rows["documents"], rows["metadatas"])
+        }
+
+        if len(by_id) != len(ids):
+            # Chunk supprimé entre-temps: le classement n'est plus fiable
+            return None
+        return [(chunk_id, score) + by_id[chunk_id] for chunk_id, score in ranked]
+
+    def _rank(self, embedding, results: dict, k: int, min_relevance: float,
+              lambda_mult: float, token_budget: int = None) -> list:
+        """Sélectionne les chunks d'un résultat Chroma: [(id, score, contenu, métadonnées)]"""
+        if not results["ids"]:
+            return []
+
+        picked = mmr_select(
+            embedding,
+            results["embeddings"],
+            k,
+            lambda_mult=lambda_mult,
+            min_relevance=min_relevance
+        )
+
+        selected = []
+        used_tokens = 0
+        for index, score in picked:
+            content = results["documents"][index]
+            tokens = estimate_tokens(content)
+            if token_budget is not None and selected and used_tokens + tokens > token_budget:
+                break
+            used_tokens += tokens
+            selected.append((results["ids"][index], score, content, results["metadatas"][index]))
+
+        return selected
+
+    @staticmethod
+    def _to_documents(rows: list) -> list:
+        documents = []
+        for chunk_id, score, content, metadata in rows:
+            metadata = dict(metadata or {})
+            metadata["chunk_id"] = chunk_id
+            documents.append((Document(page_content=content, metadata=metadata), score))
+        return documents
+
+    def retrieve(self, query: str, k: int = 3, filters: dict = None, routing: bool = True,
+                 fetch_k: int = FETCH_K, min_relevance: float = MIN_RELEVANCE,
+                 lambda_mult: float = MMR_LAMBDA, token_budget: int = None) -> list:
+        """Recherche adaptative: retourne une liste de (Document, score)
+
+        Sans filtres explicites, la requête est routée vers les documents des
+        filières mentionnées. Si ce filtre automatique ne donne rien (document
+        absent de l'index), la recherche est relancée sur toute la collection.
+
+        Jusqu'à `fetch_k` candidats sont récupérés, puis au plus `k` sont
+        retenus par MMR au-dessus de `min_relevance`. Avec `token_budget`,
+        la sélection s'arrête dès que le budget de contexte serait dépassé
+        (le meilleur chunk est toujours conservé).
+
+        Le classement est mis en cache par (requête normalisée, paramètres,
+        version d'index): une question répétée ne refait ni embedding ni ANN.
+        """
+        if not query.strip():
+            return []
+
+        index_version = self.vector_db.index_version
+        self.cache.sync_version(index_version)
+        key = self.cache.make_key(
+            query, k, filters, index_version,
+            routing=routing, fetch_k=fetch_k, min_relevance=min_relevance,
+            lambda_mult=lambda_mult, token_budget=token_budget
+        )
+
+        ranked = self.cache.get(key)
+        if ranked is not None:
+            rows = self._fetch(ranked)
+            if rows is not None:
+                return self._to_documents(rows)
+
+        routed = False
+        if filters is None and routing:
+            filters = self.route(query)
+            routed = filters is not None
+
+        embedding = self.embed_query(query)
+        n_results = max(k, fetch_k)
+
+        results = self._query(embedding, n_results, where=build_filter(filters))
+        if not results["ids"][0] and routed:
+            results = self._query(embedding, n_results)
+
+        rows = self._rank(
+            embedding,
+            self._row(results, 0),
+            k,
+            min_relevance,
+            lambda_mult,
+            token_budget
+        )
+        self.cache.put(key, [(chunk_id, score) for chunk_id, score, _, _ in rows])
+        return self._to_documents(rows)
+
+    def search_batch(self, queries: list, k: int = 3, filters: dict = None, routing: bool = True,
+                     fetch_k: int = FETCH_K, min_relevance: float = MIN_RELEVANCE,
+                     lambda_mult: float = MMR_LAMBDA, token_budget: int = None) -> list:
+        """Recherche groupée: une liste de (Document, score) par requête
+
+        Les requêtes absentes du cache sont embeddées en un seul appel (cache
+        des embeddings de requêtes partagé avec `embed_query`), puis
+        interrogées en une requête Chroma par jeu de filtres (en pratique une
+        ou quelques-unes). Les classements alimentent le cache partagé avec
+        `retrieve`, ce qui sert aussi au préchauffage.
+        """
+        index_version = self.vector_db.index_version
+        self.cache.sync_version(index_version)
+        params = dict(
+            routing=routing, fetch_k=fetch_k, min_relevance=min_relevance,
+            lambda_mult=lambda_mult, token_budget=token_budget
+        )
+
+        outputs = [[] for _ in queries]
+        pending = []  # (position, clé de cache)
+
+        for position, query in enumerate(queries):
+            if not query or not query.strip():
+                continue
+            key = self.cache.make_key(query, k, filters, index_version, **params)
+            ranked = self.cache.get(key)
+            rows = self._fetch(ranked) if ranked is not None else None
+            if rows is not None:
+                outputs[position] = self._to_documents(rows)
+            else:
+                pending.append((position, key))
+
+        if not pending:
+            return outputs
+
+        embeddings = self.embed_queries([queries[p] for p, _ in pending])
+        n_results = max(k, fetch_k)
+
+        # Regroupement par filtre effectif pour vectoriser la recherche
+        groups = {}
+        for (position, key), embedding in zip(pending, embeddings):
+            effective = filters
+            routed = False
+            if filters is None and routing:
+                effective = self.route(queries[position])
+                routed = effective is not None
+            group_key = json.dumps(effective, sort_keys=True, default=list) if effective else None
+            group = groups.setdefault(group_key, {'filters': effective, 'items': []})
+            group['items'].append((position, key, embedding, routed))
+
+        for group in groups.values():
+            items = group['items']
+            results = self._query_many(
+                [embedding for _, _, embedding, _ in items],
+                n_results,
+                where=build_filter(group['filters'])
+            )
+
+            fallback = []
+            for offset, (position, key, embedding, routed) in enumerate(items):
+                row = self._row(results, offset)
+                if not row["ids"] and routed:
+                    fallback.append((position, key, embedding))
+                    continue
+                rows = self._rank(embedding, row, k, min_relevance, lambda_mult, token_budget)
+                self.cache.put(key, [(chunk_id, score) for chunk_id, score, _, _ in rows])
+                outputs[position] = self._to_documents(rows)
+
+            if fallback:
+                results = self._query_many([embedding for _, _, embedding in fallback], n_results)
+                for offset, (position, key, embedding) in enumerate(fallback):
+                    rows = self._rank(embedding, self._row(results, offset), k, min_relevance, lambda_mult, token_budget)
+                    self.cache.put(key, [(chunk_id, score) for chunk_id, score, _, _ in rows])
+                    outputs[position] = self._to_documents(rows)
+
+        return outputs
+
+    def search_documents(self, query: str, k: int = 3, filters: dict = None, routing: bool = True, **kwargs) -> list:
+        """Recherche les chunks pertinents, restreinte par filtres de métadonnées"""
+        return [doc for doc, _ in self.retrieve(query, k=k, filters=filters, routing=routing, **kwargs)]
+
+    def search(self, query: str, k: int = 3, filters: dict = None, routing: bool = True, **kwargs) -> str:
+        docs = self.search_documents(query, k=k, filters=filters, routing=routing, **kwargs)
+        return "\n---\n".join([d.page_content for d in docs])
 
-    def search(self, query: str, k: int = 3) -> str:
-        docs = self.vector_db.vectorstore.similarity_search(query, k=k)
-        return "\n---\n".join([d.page_content for d in docs])
\ No newline at end of file
+    def cache_stats(self) -> dict:
+        stats = self.cache.stats()
+        stats['query_embeddings'] = self.embedding_cache.stats()
+        return stats
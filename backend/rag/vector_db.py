@@ -11,22 +11,29 @@ except ImportError:
         raise
 
 from .loader import DocumentLoader
+from collections import Counter
+from datetime import datetime
+import json
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
+MANIFEST_FILE = "manifest.json"
+
 class VectorDB:
-    def __init__(self):
+    def __init__(self, persist_dir="data/vector_db", embeddings=None):
         try:
             # Utiliser un modèle d'embedding plus léger et plus fiable
-            self.embeddings = OllamaEmbeddings(
+            # (un autre modèle peut être injecté, ex. HashingEmbeddings hors
+            # ligne ou PoolEmbeddings réparti sur plusieurs serveurs Ollama)
+            self.embeddings = embeddings or OllamaEmbeddings(
                 model="nomic-embed-text",
-                base_url="http://localhost:11434"  # URL explicite
+                base_url=os.getenv("OLLAMA_HOST", "http://localhost:11434")
             )
             
             # Créer le dossier de persistance si nécessaire
-            persist_dir = "data/vector_db"
+            self.persist_dir = persist_dir
             os.makedirs(persist_dir, exist_ok=True)
             
             self.vectorstore = Chroma(
@@ -34,12 +41,73 @@ class VectorDB:
                 embedding_function=self.embeddings
             )
             
+            self.manifest_path = os.path.join(persist_dir, MANIFEST_FILE)
+            self.manifest = self._load_manifest()
+            
             print("✅ VectorDB initialisé avec succès")
             
         except Exception as e:
             print(f"❌ Erreur initialisation VectorDB: {e}")
             raise
 
+    @property
+    def index_version(self):
+        """Version de l'index, incrémentée à chaque ingestion"""
+        return self.manifest.get('index_version', 0)
+
+    def _load_manifest(self):
+        """Charge le manifeste d'ingestion (version, date de dernière ingestion)"""
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'index_version': 0, 'last_ingestion': None, 'files': {}}
+        except Exception as e:
+            print(f"⚠️ Manifeste illisible, réinitialisé: {e}")
+            return {'index_version': 0, 'last_ingestion': None, 'files': {}}
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _count_sources(self, page_size=5000):
+        """Chunks par fichier source, recomptés depuis la collection
+        (métadonnées seules, par pages)"""
+        counts = Counter()
+        collection = self.vectorstore._collection
+        offset = 0
+        while True:
+            page = collection.get(limit=page_size, offset=offset, include=["metadatas"])
+            metadatas = page.get('metadatas') or []
+            for metadata in metadatas:
+                counts[(metadata or {}).get('source_file', 'unknown')] += 1
+            if len(metadatas) < page_size:
+                return dict(counts)
+            offset += page_size
+
+    def _bump_version(self):
+        """Marque une modification de l'index (invalide les caches de recherche)
+
+        Met aussi à jour les statistiques coûteuses du manifeste (chunks par
+        source, taille sur disque), lues ensuite telles quelles par get_stats.
+        """
+        self.manifest['index_version'] = self.index_version + 1
+        self.manifest['last_ingestion'] = datetime.now().isoformat()
+        self.manifest['embedding_model'] = getattr(self.embeddings, 'model', None)
+        if not self.manifest.get('embedding_dimension'):
+            self.manifest['embedding_dimension'] = self._read_dimension()
+        try:
+            self.manifest['files'] = self._count_sources()
+        except Exception as e:
+            print(f"⚠️ Comptage des chunks par source impossible: {e}")
+        self.manifest['disk_size_bytes'] = self._disk_size()
+        try:
+            self._save_manifest()
+        except Exception as e:
+            print(f"⚠️ Erreur sauvegarde manifeste: {e}")
+
     def initialize(self):
         """Initialise la base vectorielle avec les documents"""
         try:
@@ -67,6 +135,8 @@ class VectorDB:
                 except AttributeError:
                     # Les nouvelles versions de Chroma persistent automatiquement
                     print("✅ Base vectorielle sauvegardée automatiquement")
+                
+                self._bump_version()
                     
                 print(f"✅ {len(loaded_files)} fichiers chargés avec succès")
                 if failed_files:
@@ -85,7 +155,7 @@ class VectorDB:
             import shutil
             
             # Supprimer l'ancienne base si elle existe
-            persist_dir = "data/vector_db"
+            persist_dir = self.persist_dir
             if os.path.exists(persist_dir):
                 shutil.rmtree(persist_dir)
                 print("🗑️ Ancienne base vectorielle supprimée")
@@ -96,6 +166,8 @@ class VectorDB:
                 persist_directory=persist_dir,
                 embedding_function=self.embeddings
             )
+            self.manifest['embedding_dimension'] = None
+            self._bump_version()
             
             print("🆕 Nouvelle base vectorielle créée")
             
@@ -126,19 +198,21 @@ class VectorDB:
                     print(f"⚠️ Erreur ajout lot: {e}")
                     continue
             
+            if added_count:
+                self._bump_version()
             print(f"✅ {added_count} documents ajoutés à la base")
             
         except Exception as e:
             print(f"❌ Erreur ajout documents: {e}")
             raise
 
-    def search(self, query, k=3):
-        """Recherche dans la base vectorielle"""
+    def search(self, query, k=3, filter=None):
+        """Recherche dans la base vectorielle (filtre de métadonnées Chroma optionnel)"""
         try:
             if not query.strip():
                 return []
                 
-            results = self.vectorstore.similarity_search(query, k=k)
+            results = self.vectorstore.similarity_search(query, k=k, filter=filter)
             print(f"🔍 Recherche '{query[:30]}...': {len(results)} résultats")
             
             return results
@@ -147,19 +221,61 @@ class VectorDB:
             print(f"❌ Erreur recherche: {e}")
             return []
 
+    def _read_dimension(self):
+        """Dimension des embeddings, lue sur un seul vecteur stocké"""
+        try:
+            sample = self.vectorstore._collection.get(limit=1, include=["embeddings"])
+            embeddings = sample.get('embeddings')
+            if embeddings is not None and len(embeddings) > 0:
+                return len(embeddings[0])
+        except Exception as e:
+            print(f"⚠️ Lecture dimension impossible: {e}")
+        return None
+
+    def _disk_size(self):
+        """Taille sur disque du dossier de persistance (octets)"""
+        total = 0
+        for root, _, files in os.walk(self.persist_dir):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+        return total
+
     def get_stats(self):
-        """Retourne des statistiques sur la base vectorielle"""
+        """Retourne des statistiques sur la base vectorielle
+
+        Lit uniquement le compteur de la collection et le manifeste
+        d'ingestion (taille sur disque comprise, mesurée à chaque ingestion):
+        aucun embedding, recherche ni parcours du disque n'est effectué.
+        """
         try:
-            # Essayer de compter les documents (méthode approximative)
-            test_search = self.vectorstore.similarity_search("", k=1000)
-            doc_count = len(test_search)
-            
+            doc_count = self.vectorstore._collection.count()
+            dimension = self.manifest.get('embedding_dimension') or self._read_dimension()
+            if self.manifest.get('disk_size_bytes') is None:
+                # Manifeste antérieur: mesurée une fois, puis à chaque ingestion
+                self.manifest['disk_size_bytes'] = self._disk_size()
+
+            # Estimation mémoire de l'index HNSW: vecteurs float32 +
+            # liens du graphe (M=16 voisins par défaut, 2*M au niveau 0)
+            memory_estimate = None
+            if dimension:
+                memory_estimate = doc_count * (dimension * 4 + 2 * 16 * 4)
+
             return {
                 'document_count': doc_count,
+                'chunks_by_source': dict(self.manifest.get('files', {})),
+                'embedding_model': self.manifest.get('embedding_model') or getattr(self.embeddings, 'model', None),
+                'embedding_dimension': dimension,
+                'disk_size_bytes': self.manifest['disk_size_bytes'],
+                'memory_size_bytes_estimate': memory_estimate,
+                'index_version': self.index_version,
+                'last_ingestion': self.manifest.get('last_ingestion'),
                 'status': 'operational'
             }
         except Exception as e:
             return {
                 'document_count': 0,
                 'status': f'error: {e}'
-            }
\ No newline at end of file
+            }
@@ -165,7 +165,8 @@ def main():
     
     # Importer et lancer l'app
     try:
-        from app import app
+        from app import app, start_model_warmup
+        start_model_warmup()
         print("\n🌐 Serveur disponible sur:")
         print("   - Frontend: http://localhost:5000")
         print("   - API Test: http://localhost:5000/api/test")
@@ -10,8 +10,11 @@ import sys
 import subprocess
 import requests
 import json
+import os
 from pathlib import Path
 
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434").rstrip("/")
+
 def print_section(title):
     print(f"\n{'='*60}")
     print(f"  {title}")
@@ -27,7 +30,7 @@ def check_ollama_service():
     
     try:
         # Vérifier via HTTP directement
-        response = requests.get("http://localhost:11434/api/version", timeout=5)
+        response = requests.get(f"{OLLAMA_HOST}/api/version", timeout=5)
         if response.status_code == 200:
             version_info = response.json()
             print_status(f"Service Ollama actif - Version: {version_info.get('version', 'N/A')}", "OK")
@@ -36,7 +39,7 @@ def check_ollama_service():
             print_status(f"Service Ollama répond mais erreur HTTP {response.status_code}", "WARNING")
             return False
     except requests.exceptions.ConnectionError:
-        print_status("Service Ollama non accessible sur localhost:11434", "ERROR")
+        print_status(f"Service Ollama non accessible sur {OLLAMA_HOST}", "ERROR")
         print_status("Solutions:", "INFO")
         print("   1. Démarrer Ollama: ollama serve")
         print("   2. Ou si déjà démarré: pkill ollama puis ollama serve")
@@ -51,7 +54,7 @@ def check_ollama_models():
     
     try:
         # Utiliser directement l'API REST pour plus de fiabilité
-        response = requests.get("http://localhost:11434/api/tags", timeout=10)
+        response = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=10)
         
         if response.status_code != 200:
             print_status(f"Erreur récupération modèles: HTTP {response.status_code}", "ERROR")
@@ -117,7 +120,7 @@ def test_model_generation(model_name):
         }
         
         response = requests.post(
-            "http://localhost:11434/api/chat",
+            f"{OLLAMA_HOST}/api/chat",
             json=payload,
             timeout=30
         )
@@ -170,7 +173,7 @@ def test_image_processing(model_name):
         }
         
         response = requests.post(
-            "http://localhost:11434/api/chat",
+            f"{OLLAMA_HOST}/api/chat",
             json=payload,
             timeout=45
         )
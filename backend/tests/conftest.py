@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Modules du backend importables depuis tests/ (python -m pytest depuis backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
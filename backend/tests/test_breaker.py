@@ -0,0 +1,60 @@
+import threading
+import time
+
+import pytest
+
+from llm.breaker import CircuitBreaker, CircuitOpenError, STATE_CLOSED, STATE_OPEN
+
+
+def failing():
+    raise ConnectionError("refusée")
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker("test", probe=failing, failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+    assert breaker.state == STATE_CLOSED
+
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+    assert breaker.state == STATE_OPEN
+
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.call(lambda: "jamais appelé")
+    assert 0 < error.value.retry_after <= 60
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker("test", probe=failing, failure_threshold=2, reset_timeout=60)
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+    assert breaker.call(lambda: "ok") == "ok"
+    with pytest.raises(ConnectionError):
+        breaker.call(failing)
+    assert breaker.state == STATE_CLOSED
+
+
+def test_background_probe_closes_circuit():
+    recovered = threading.Event()
+
+    def probe():
+        if not recovered.is_set():
+            raise ConnectionError("toujours en panne")
+
+    breaker = CircuitBreaker("test", probe=probe, failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure("panne")
+    assert breaker.is_open()
+
+    time.sleep(0.2)
+    assert breaker.is_open()
+    assert breaker.stats()["probes"] >= 1
+
+    recovered.set()
+    deadline = time.time() + 2
+    while breaker.is_open() and time.time() < deadline:
+        time.sleep(0.01)
+    assert breaker.state == STATE_CLOSED
+    assert breaker.retry_after() == 0.0
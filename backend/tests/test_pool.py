@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from llm.pool import BackendPool
+
+
+class FakeResponse:
+    def __init__(self, status_code, backend):
+        self.status_code = status_code
+        self.backend = backend
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+
+def pool_with(behaviours):
+    """Pool dont chaque backend répond selon `behaviours[url]` (délai, statut ou exception)"""
+    pool = BackendPool("test", list(behaviours))
+    responses = {url: [] for url in behaviours}
+    for backend in pool.backends:
+        delay, outcome = behaviours[backend.url]
+
+        def request(method, path, delay=delay, outcome=outcome, url=backend.url, **kwargs):
+            time.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            response = FakeResponse(outcome, url)
+            responses[url].append(response)
+            return response
+
+        backend.request = request
+    pool._turn = iter(range(0, 10 ** 6, len(behaviours)))  # premier backend choisi en premier
+    return pool, responses
+
+
+def test_hedge_wins_and_loser_is_closed():
+    pool, responses = pool_with({"http://lent": (0.3, 200), "http://rapide": (0.0, 200)})
+    response = pool.hedged_request("POST", "/api/embed", hedge_after=0.05)
+    assert response.backend == "http://rapide"
+    assert pool.stats()["hedge_wins"] == 1
+
+    deadline = time.time() + 2
+    while not responses["http://lent"] and time.time() < deadline:
+        time.sleep(0.01)
+    assert responses["http://lent"][0].closed.wait(1)
+    assert not response.closed.is_set()
+
+
+def test_fast_first_backend_is_not_hedged():
+    pool, responses = pool_with({"http://a": (0.0, 200), "http://b": (0.0, 200)})
+    response = pool.hedged_request("POST", "/api/embed", hedge_after=0.5)
+    assert response.backend == "http://a"
+    assert pool.stats()["hedged"] == 0
+    assert responses["http://b"] == []
+
+
+def test_server_error_is_hedged_and_closed():
+    pool, responses = pool_with({"http://a": (0.0, 503), "http://b": (0.0, 200)})
+    response = pool.hedged_request("POST", "/api/embed", hedge_after=0.5)
+    assert response.status_code == 200
+    assert responses["http://a"][0].closed.is_set()
+
+
+def test_all_backends_failing_raises_last_error():
+    error = requests.exceptions.ConnectionError("refusée")
+    pool, _ = pool_with({"http://a": (0.0, error), "http://b": (0.0, error)})
+    with pytest.raises(requests.exceptions.ConnectionError):
+        pool.hedged_request("POST", "/api/embed", hedge_after=0.01)
+
+
+def test_least_outstanding_backend_is_chosen():
+    pool = BackendPool("test", ["http://a", "http://b"])
+    pool.backends[0].outstanding = 2
+    assert pool.choose().url == "http://b"
+
+
+def test_affinity_sticks_within_slack():
+    pool = BackendPool("test", ["http://a", "http://b"])
+    first = pool.choose(affinity="session")
+    first.outstanding = 1
+    assert pool.choose(affinity="session") is first
+    first.outstanding = 3
+    assert pool.choose(affinity="session") is not first
@@ -0,0 +1,56 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("langchain_core")
+retriever = pytest.importorskip("rag.retriever")
+
+
+def test_mmr_orders_by_relevance_and_respects_k():
+    query = [1.0, 0.0, 0.0]
+    embeddings = [[0.6, 0.8, 0.0], [1.0, 0.0, 0.0], [0.8, 0.0, 0.6]]
+    selected = retriever.mmr_select(query, embeddings, k=2, lambda_mult=1.0, min_relevance=0.0)
+    assert [i for i, _ in selected] == [1, 2]
+    assert selected[0][1] == pytest.approx(1.0)
+
+
+def test_mmr_drops_irrelevant_and_duplicate_chunks():
+    query = [1.0, 0.0]
+    embeddings = [[1.0, 0.0], [1.0, 0.001], [0.0, 1.0], [0.7, 0.7]]
+    selected = retriever.mmr_select(query, embeddings, k=4, min_relevance=0.5)
+    # [1] doublon de [0], [2] orthogonal à la requête
+    assert [i for i, _ in selected] == [0, 3]
+
+
+def test_mmr_prefers_diversity_when_lambda_is_low():
+    query = [1.0, 0.0, 0.0]
+    embeddings = [[1.0, 0.0, 0.0], [0.95, 0.3, 0.0], [0.8, 0.0, 0.6]]
+    selected = retriever.mmr_select(query, embeddings, k=2, lambda_mult=0.3, min_relevance=0.0,
+                                    duplicate_similarity=1.1)
+    assert [i for i, _ in selected] == [0, 2]
+
+
+def test_mmr_edge_cases():
+    assert retriever.mmr_select([1.0, 0.0], [], k=3) == []
+    assert retriever.mmr_select([1.0, 0.0], [[1.0, 0.0]], k=0) == []
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Quelles sont les conditions d'accès au MST ?", ["MST.pdf"]),
+    ("inscription en lst ou en dut", ["LST.pdf", "DUT.pdf"]),
+    ("Le cycle ingénieur dure combien ?", ["CI.pdf"]),
+    ("Je veux des infos sur la Licence d’Éducation", ["LE.pdf"]),
+    ("Les années préparatoires au cycle ingénieur", ["2APCI.pdf"]),
+    ("le master spécialisé en finance", ["MS.pdf"]),
+    ("le ms et le le ci", []),
+    ("Horaires de la bibliothèque", []),
+])
+def test_detect_programs(query, expected):
+    assert retriever.detect_programs(query) == expected
+
+
+def test_build_filter():
+    assert retriever.build_filter(None) is None
+    assert retriever.build_filter({"source_file": ["MST.pdf"]}) == {"source_file": "MST.pdf"}
+    assert retriever.build_filter({"source_file": ["A", "B"], "page": 2}) == {
+        "$and": [{"source_file": {"$in": ["A", "B"]}}, {"page": 2}]
+    }
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+import gzip
+import json
+import os
+import threading
+
+from memory.segments import SegmentIndex, read_segment, recover, seal
+from memory.stores import JsonlStore
+from memory.writer import ConversationWriter
+
+START = datetime(2026, 1, 1, 12, 0, 0)
+
+
+def entry(i):
+    timestamp = (START + timedelta(seconds=i)).isoformat()
+    return {"timestamp": timestamp, "user": f"question {i}", "bot": f"réponse {i}", "metadata": {"n": i}}
+
+
+def numbers(entries):
+    return [e["metadata"]["n"] for e in entries]
+
+
+def make_store(tmp_path, **kwargs):
+    return JsonlStore(tmp_path / "conversations.json", **kwargs)
+
+
+def test_rotation_keeps_every_entry_in_order(tmp_path):
+    store = make_store(tmp_path, max_bytes=500)
+    for i in range(0, 60, 3):
+        store.append_many([entry(i), entry(i + 1), entry(i + 2)])
+
+    segments = store.index.segments()
+    assert len(segments) > 1
+    assert sum(s["records"] for s in segments) + len(store.recent(1000)) >= 60
+    assert numbers(store.iter_entries()) == list(range(60))
+    assert numbers(store.recent(7)) == list(range(53, 60))
+    # Aucun segment brut ni fichier temporaire laissé derrière
+    assert not [n for n in os.listdir(store.segments_dir) if n.endswith((".jsonl", ".tmp"))]
+
+
+def test_rotation_during_concurrent_writes(tmp_path):
+    store = make_store(tmp_path, max_bytes=2000)
+    writer = ConversationWriter(store, batch_size=5, flush_interval=0.01, fsync="never")
+    per_thread = 50
+
+    def produce(offset):
+        for i in range(per_thread):
+            writer.write(entry(offset + i))
+
+    threads = [threading.Thread(target=produce, args=(t * per_thread,)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    written = numbers(store.iter_entries())
+    assert sorted(written) == list(range(4 * per_thread))
+    assert len(store.index.segments()) > 1
+
+
+def test_segment_bounds_and_overlapping(tmp_path):
+    store = make_store(tmp_path)
+    store.append_many([entry(i) for i in range(10)])
+    store.rotate()
+    store.append_many([entry(i) for i in range(100, 110)])
+    store.rotate()
+
+    first, second = store.index.segments()
+    assert first["records"] == 10 and second["records"] == 10
+    assert first["first_ts"] == (START).timestamp()
+    assert first["last_ts"] == (START + timedelta(seconds=9)).timestamp()
+
+    middle = (START + timedelta(seconds=50)).timestamp()
+    assert store.index.overlapping(end=middle) == [first]
+    assert store.index.overlapping(start=middle) == [second]
+    assert store.index.overlapping() == [first, second]
+    assert numbers(store.iter_entries(start=middle)) == list(range(100, 110))
+
+
+def test_recover_renamed_but_unindexed_segment(tmp_path):
+    store = make_store(tmp_path)
+    store.append_many([entry(i) for i in range(5)])
+    store.rotate()
+    store.append_many([entry(i) for i in range(5, 8)])
+
+    # Arrêt brutal juste après le renommage du fichier actif
+    raw = os.path.join(store.segments_dir, f"conversations-{store.index.next_id():06d}.jsonl")
+    os.replace(store.path, raw)
+
+    reopened = make_store(tmp_path)
+    segments = reopened.index.segments()
+    assert [s["id"] for s in segments] == [1, 2]
+    assert segments[1]["records"] == 3
+    assert not os.path.exists(raw)
+    assert numbers(reopened.iter_entries()) == list(range(8))
+
+
+def test_recover_indexed_segment_with_leftover_raw_file(tmp_path):
+    directory = tmp_path / "segments"
+    directory.mkdir()
+    active = tmp_path / "conversations.json"
+    active.write_text("".join(json.dumps(entry(i)) + "\n" for i in range(4)), encoding="utf-8")
+    index = SegmentIndex(str(directory))
+    segment = seal(str(active), str(directory), index)
+
+    # Arrêt entre l'ajout à l'index et la suppression du fichier brut
+    raw = directory / "conversations-000001.jsonl"
+    with gzip.open(index.file_path(segment), "rt", encoding="utf-8") as f:
+        raw.write_text(f.read(), encoding="utf-8")
+
+    assert recover(str(directory), SegmentIndex(str(directory))) == 0
+    assert not raw.exists()
+    reloaded = SegmentIndex(str(directory))
+    assert len(reloaded.segments()) == 1
+    assert len(list(read_segment(reloaded.file_path(reloaded.segments()[0])))) == 4
+
+
+def test_recover_after_interrupted_compression(tmp_path):
+    directory = tmp_path / "segments"
+    directory.mkdir()
+    raw = directory / "conversations-000001.jsonl"
+    raw.write_text("".join(json.dumps(entry(i)) + "\n" for i in range(3)), encoding="utf-8")
+    # Compression interrompue: fichier temporaire tronqué
+    (directory / "conversations-000001.jsonl.gz.tmp").write_bytes(b"\x1f\x8b")
+
+    index = SegmentIndex(str(directory))
+    assert recover(str(directory), index) == 1
+    assert index.segments()[0]["records"] == 3
+    assert not raw.exists()
+    assert not (directory / "conversations-000001.jsonl.gz.tmp").exists()
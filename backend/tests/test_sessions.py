@@ -0,0 +1,76 @@
+from datetime import datetime
+import time
+
+from memory.sessions import SessionStore
+
+
+def fill(store, session_id, count, start=0):
+    for i in range(start, start + count):
+        store.append(session_id, f"q{i}", f"r{i}")
+
+
+def questions(turns):
+    return [user for user, _ in turns]
+
+
+def test_window_and_pending_turns():
+    store = SessionStore(max_turns=3)
+    fill(store, "s", 5)
+    assert questions(store.turns("s")) == ["q2", "q3", "q4"]
+    assert store.pending_turns("s") == 2
+    assert questions(store.turns("s", include_pending=True)) == ["q0", "q1", "q2", "q3", "q4"]
+    assert store.pending_sessions() == ["s"]
+
+
+def test_commit_summary_consumes_pending_turns():
+    store = SessionStore(max_turns=2)
+    fill(store, "s", 5)
+    summary, turns, through = store.summary_input("s", limit=2)
+    assert summary is None and questions(turns) == ["q0", "q1"]
+
+    assert store.commit_summary("s", "résumé", consumed=len(turns), through=through)
+    assert store.summary("s") == "résumé"
+    assert questions(store.turns("s", include_pending=True)) == ["q2", "q3", "q4"]
+    assert store.summary_input("s")[1] == [("q2", "r2")]
+
+
+def test_pending_turns_are_bounded():
+    store = SessionStore(max_turns=1)
+    fill(store, "s", 10)
+    assert store.pending_turns("s") == store.max_pending == 4
+    assert store.stats()["pending_dropped"] == 5
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(max_sessions=2)
+    fill(store, "a", 1)
+    fill(store, "b", 1)
+    store.turns("a")
+    fill(store, "c", 1)
+    assert store.turns("b") == []
+    assert questions(store.turns("a")) == ["q0"]
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_sessions_expire():
+    store = SessionStore(idle_ttl=60)
+    store.append("old", "q", "r", timestamp=time.time() - 120)
+    store.append("new", "q", "r")
+    assert store.turns("old") == []
+    assert store.turns("new") == [("q", "r")]
+    assert store.stats()["expirations"] == 1
+
+
+def test_restore_skips_turns_covered_by_summary():
+    now = float(int(time.time()))
+    entries = [
+        {"timestamp": datetime.fromtimestamp(now - 30 + i).isoformat(), "user": f"q{i}", "bot": f"r{i}",
+         "metadata": {"session_id": "s"}}
+        for i in range(4)
+    ]
+    entries.append({"timestamp": datetime.fromtimestamp(now).isoformat(), "user": "x", "bot": "y", "metadata": {}})
+    store = SessionStore()
+    restored = store.restore(entries, {"s": {"summary": "déjà résumé", "through": now - 29}})
+    assert restored == 2
+    assert store.summary("s") == "déjà résumé"
+    assert questions(store.turns("s")) == ["q2", "q3"]
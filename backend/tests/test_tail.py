@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+from memory.tail import tail_lines
+
+
+def write(tmp_path, text):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def expected(text, limit):
+    return [line for line in text.split("\n") if line.strip()][-limit:] if limit > 0 else []
+
+
+@pytest.mark.parametrize("block_size", [1, 3, 7, 64])
+def test_lines_across_block_boundaries(tmp_path, block_size):
+    text = "".join(f"ligne {i}\n" for i in range(20))
+    path = write(tmp_path, text)
+    assert tail_lines(path, 5, block_size=block_size) == [f"ligne {i}" for i in range(15, 20)]
+
+
+def test_blank_lines_do_not_count_towards_limit(tmp_path):
+    text = "a\n\n\nb\n   \nc\n\n"
+    path = write(tmp_path, text)
+    assert tail_lines(path, 3, block_size=2) == ["a", "b", "c"]
+
+
+def test_limit_larger_than_file(tmp_path):
+    path = write(tmp_path, "a\nb")
+    assert tail_lines(path, 10, block_size=1) == ["a", "b"]
+    assert tail_lines(path, 0) == []
+
+
+def test_empty_file(tmp_path):
+    assert tail_lines(write(tmp_path, ""), 3) == []
+
+
+def test_multibyte_characters_split_by_blocks(tmp_path):
+    text = "première\nélève\nréponse\n"
+    path = write(tmp_path, text)
+    assert tail_lines(path, 2, block_size=3) == ["élève", "réponse"]
+
+
+def test_matches_naive_reading(tmp_path):
+    rng = random.Random(7)
+    for _ in range(300):
+        lines = [rng.choice(["", " ", "x" * rng.randint(1, 20)]) for _ in range(rng.randint(0, 40))]
+        text = "\n".join(lines) + ("\n" if rng.random() < 0.5 else "")
+        path = write(tmp_path, text)
+        limit = rng.randint(0, 15)
+        assert tail_lines(path, limit, block_size=rng.randint(1, 32)) == expected(text, limit)
@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from memory.writer import ConversationWriter
+
+
+class RecordingStore:
+    """Moteur factice: relève les lots, leur sync et les appels à sync()"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def append_many(self, entries, sync=False):
+        time.sleep(self.delay)
+        with self.lock:
+            self.calls.append(("append", [e["n"] for e in entries], sync))
+
+    def sync(self):
+        with self.lock:
+            self.calls.append(("sync",))
+
+    def written(self):
+        return [n for call in self.calls if call[0] == "append" for n in call[1]]
+
+
+def test_close_drains_queue_with_forced_fsync():
+    store = RecordingStore()
+    writer = ConversationWriter(store, batch_size=100, flush_interval=60, fsync="interval")
+    for n in range(3):
+        writer.write({"n": n})
+    writer.close()
+
+    assert store.calls == [("append", [0, 1, 2], True)]
+    assert writer.stats()["fsyncs"] == 1
+
+
+def test_close_syncs_batches_written_without_fsync():
+    store = RecordingStore()
+    writer = ConversationWriter(store, batch_size=2, flush_interval=60, fsync="interval", fsync_interval=3600)
+    for n in range(4):
+        writer.write({"n": n})
+    assert writer.flush()
+    assert all(not call[2] for call in store.calls)
+
+    writer.close()
+    assert store.calls[-1] == ("sync",)
+    assert store.written() == [0, 1, 2, 3]
+
+
+def test_close_without_pending_writes_does_not_sync():
+    store = RecordingStore()
+    writer = ConversationWriter(store, fsync="interval")
+    writer.close()
+    assert store.calls == []
+
+
+@pytest.mark.parametrize("policy", ["always", "never"])
+def test_fsync_policy(policy):
+    store = RecordingStore()
+    writer = ConversationWriter(store, batch_size=1, flush_interval=60, fsync=policy)
+    writer.write({"n": 0})
+    assert writer.flush()
+    assert store.calls[0] == ("append", [0], policy == "always")
+    writer.close()
+
+
+def test_batches_by_size_and_keeps_order_under_concurrency():
+    store = RecordingStore(delay=0.001)
+    writer = ConversationWriter(store, batch_size=8, flush_interval=0.05, fsync="never")
+
+    def produce(offset):
+        for n in range(offset, offset + 100):
+            writer.write({"n": n})
+
+    threads = [threading.Thread(target=produce, args=(t * 100,)) for t in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+
+    written = store.written()
+    assert sorted(written) == list(range(300))
+    for t in range(3):
+        own = [n for n in written if t * 100 <= n < (t + 1) * 100]
+        assert own == sorted(own)
+    assert all(len(call[1]) <= 8 for call in store.calls if call[0] == "append")
+
+
+def test_write_after_close_is_direct_and_synced():
+    store = RecordingStore()
+    writer = ConversationWriter(store, fsync="never")
+    writer.close()
+    writer.write({"n": 1})
+    assert store.calls == [("append", [1], True)]
+    assert writer.stats()["direct_writes"] == 1
+
+
+def test_full_queue_falls_back_to_direct_write():
+    store = RecordingStore(delay=0.05)
+    writer = ConversationWriter(store, batch_size=1, flush_interval=60, fsync="never", max_queue=1)
+    for n in range(5):
+        writer.write({"n": n})
+    writer.close()
+    assert sorted(store.written()) == list(range(5))
+    assert writer.stats()["direct_writes"] >= 1
+
+
+def test_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        ConversationWriter(RecordingStore(), fsync="sometimes")